@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль показывает, сколько памяти занимает конструкция:
+байт на узел, на элемент и на нагрузку
+Запуск: py builds/memory_benchmark.py [количество стержней]
+"""
+import sys
+import tracemalloc
+from pathlib import Path
+# Абсолютной путь до основной директории
+main_dir = Path(__file__).resolve().parent.parent
+# Добавляем её в путь поиска модулей
+sys.path.append(str(main_dir))
+
+from fem import Force
+from fem import Distance
+from fem import LineStructure
+from fem import ColumnarStructure
+from fem.structure import Node
+
+
+def measure(build):
+    """Сколько байт занимает то, что вернула функция build"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def chain(cls, n):
+    """Цепочка из n стержней: n+1 узлов, n элементов"""
+    ls = cls()
+    rod = ls.add_rod(E=1, A=1, D=Distance(1))
+    for _ in range(n - 1):
+        rod = ls.add_rod(E=1, A=1, n1=rod.n2, D=Distance(1, 1))
+    return ls
+
+
+def nodes(n):
+    """n отдельных узлов"""
+    return [Node(x=float(i), y=0.0) for i in range(n)]
+
+
+def forces(n):
+    """n отдельных сил"""
+    return [Force(i, 1) for i in range(n)]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    size, _ = measure(lambda: nodes(n))
+    print(f'Узел (Node):        {size/n:8.1f} байт')
+    size, _ = measure(lambda: forces(n))
+    print(f'Сила (Force):       {size/n:8.1f} байт')
+    for cls in (LineStructure, ColumnarStructure):
+        size, _ = measure(lambda: chain(cls, n))
+        print(f'{cls.__name__ + ":":19} {size/n:8.1f} байт на узел и стержень')
@@ -4,9 +4,10 @@ fem - пакет предоставляющий полезные функции
 для метода конечных элементов (МКЭ)
 """
 from .structure import LineStructure, Force, Distance
+from .columnar import ColumnarStructure
 from .calc import FEMComput
 from .fio import save_model
 from .fio import load_model
 
-__all__ = ['LineStructure', 'Force', 'Distance',
+__all__ = ['LineStructure', 'ColumnarStructure', 'Force', 'Distance',
            'FEMComput', 'save_model', 'load_model']
@@ -4,7 +4,9 @@ calc - отдельный модуль для расчёта конструкц
 отличается от matan тем, что завязан именно на конструкции
 """
 import sys
+from array import array
 from copy import deepcopy
+from dataclasses import dataclass
 
 # Модели конструкций
 from . import structure as s
@@ -12,25 +14,214 @@ from . import structure as s
 from . import matan as m
 
 
+class ElementOperator:
+    """
+    Глобальная матрица жёсткости без её сборки (matrix-free):
+    произведение K*x считается поэлементно. Хранится только
+    O(элементов + узлов) чисел, поэтому решать можно только
+    итерационно (matan.cg_solve)
+    """
+
+    def __init__(self, line_struct: s.LineStructure):
+        """line_struct : конструкция из линейных КЭ"""
+        # Размер системы - по две степени свободы на узел
+        self.size = 2*len(line_struct.grid)
+        # Для каждого элемента номер первой степени свободы в узлах
+        # и три числа его матрицы жёсткости: у простой матрицы
+        # жёсткости блоки 2x2 отличаются только знаком
+        #   | a  b -a -b |
+        #   | b  d -b -d |
+        #   |-a -b  a  b |
+        #   |-b -d  b  d |
+        self._dofs = array('l')
+        self._coeffs = array('d')
+        for el in line_struct.items:
+            k = el.stiffness
+            simple_K = el.get_simple_K()
+            self._dofs.extend((2*el.n1.pos, 2*el.n2.pos))
+            self._coeffs.extend((k*simple_K[0, 0], k*simple_K[0, 1], k*simple_K[1, 1]))
+        # Степени свободы, в которых K*x = x: закреплённые
+        # методом Пиана-Айронса и нулевые строки
+        self._identity = bytearray(self.size)
+
+    @property
+    def rows(self):
+        """Количество строк"""
+        return self.size
+
+    @property
+    def cols(self):
+        """Количество столбцов"""
+        return self.size
+
+    def constrain(self, i):
+        """
+        Метод Пиана-Айронса в i-ой строке и i-ом столбце:
+        строка и столбец нулевые, на диагонали единица
+        """
+        self._identity[i] = 1
+
+    def constrain_null(self):
+        """
+        Единица на диагонали в нулевых строках
+        Матрицы жёсткости элементов неотрицательно определены,
+        поэтому строка нулевая, если на её диагонали ноль
+        """
+        for i, d in enumerate(self.diagonal()):
+            if d == 0:
+                self._identity[i] = 1
+
+    def diagonal(self):
+        """Список диагональных элементов"""
+        diag = [0]*self.size
+        dofs, coeffs = self._dofs, self._coeffs
+        for e in range(len(dofs)//2):
+            i, j = dofs[2*e], dofs[2*e+1]
+            a, d = coeffs[3*e], coeffs[3*e+2]
+            diag[i] += a
+            diag[i+1] += d
+            diag[j] += a
+            diag[j+1] += d
+        for i in range(self.size):
+            if self._identity[i]:
+                diag[i] = 1
+        return diag
+
+    def matvec(self, x):
+        """
+        Умножить K на вектор
+        x : последовательность из size чисел
+        Возвращает список из size чисел
+        """
+        identity = self._identity
+        # Закреплённые компоненты x в элементы не попадают
+        x_free = [0 if identity[i] else x[i] for i in range(self.size)]
+        res = [0]*self.size
+        dofs, coeffs = self._dofs, self._coeffs
+        for e in range(len(dofs)//2):
+            i, j = dofs[2*e], dofs[2*e+1]
+            a, b, d = coeffs[3*e], coeffs[3*e+1], coeffs[3*e+2]
+            # Удлинение элемента в проекциях на оси
+            dx = x_free[i] - x_free[j]
+            dy = x_free[i+1] - x_free[j+1]
+            fx = a*dx + b*dy
+            fy = b*dx + d*dy
+            res[i] += fx
+            res[i+1] += fy
+            res[j] -= fx
+            res[j+1] -= fy
+        # В закреплённых строках единица на диагонали
+        for i in range(self.size):
+            if identity[i]:
+                res[i] = x[i]
+        return res
+
+    def __str__(self):
+        """Матрица не хранится - выводим только её размер"""
+        return f'K: {self.size}x{self.size} (matrix-free)'
+
+
+@dataclass
+class CaseResult:
+    """Результаты расчёта одного случая нагружения"""
+    # Имя случая
+    name: str
+    # Узловые перемещения: u1, v1, u2, v2, ...
+    q: list
+    # Продольные усилия в элементах по порядку items (как aprox_Fx)
+    N: list
+
+    @property
+    def u(self):
+        """Перемещения узлов вдоль оси x"""
+        return self.q[0::2]
+
+    @property
+    def v(self):
+        """Перемещения узлов вдоль оси y"""
+        return self.q[1::2]
+
+
+@dataclass
+class Envelope:
+    """Огибающие: наименьшие и наибольшие значения по всем сочетаниям"""
+    # Узловые перемещения u1, v1, u2, v2, ...
+    q_min: list
+    q_max: list
+    # Продольные усилия в элементах по порядку items
+    N_min: list
+    N_max: list
+    # Количество сочетаний
+    count: int
+
+
 class FEMComput:
     """Класс для вычислений МКЭ - одномерный случай"""
 
-    def __init__(self, line_struct: s.LineStructure):
+    def __init__(self, line_struct: s.LineStructure, fmt='sparse', copy=True):
         """
         Вызывается при создании экземпляра
         line_struct : объект конструкции состоящих
                       из конечных элементов
+        fmt         : формат матрицы жёсткости (см. LineStructure.get_K)
+                      для цепочек стержней выгоден 'skyline',
+                      'matrix-free' - K не собирается вовсе (ElementOperator),
+                      система решается только методом CG
+        copy        : True  - расчёт идёт на копии конструкции,
+                              перемещения наносятся на её узлы
+                      False - снимок без копирования: конструкция только
+                              читается (K, f и q всё равно свои), перемещения
+                              хранятся в массивах self.u и self.v;
+                              пока идёт расчёт, конструкцию менять нельзя
         """
         # Делаем копию конструкции для изменений
-        self.line_struct = deepcopy(line_struct)
+        # (в режиме снимка конструкция не меняется - копия не нужна)
+        self.line_struct = deepcopy(line_struct) if copy else line_struct
+        self.snapshot = not copy
+        # Узловые перемещения вдоль осей x и y по номерам узлов,
+        # заполняются в apply_q_to_structure
+        self.u = None
+        self.v = None
         # Глобальная матрица жескости конструкции
-        self.K = self.line_struct.K
+        if fmt == 'matrix-free':
+            self.K = ElementOperator(self.line_struct)
+        elif fmt == 'sparse':
+            # Уже собранная матрица конструкции (копия)
+            self.K = self.line_struct.K
+        else:
+            self.K = self.line_struct.get_K(fmt)
         # Вектор известных узловых усилий
         self.f = self.line_struct.f
         # Вектор НЕизвестных узловых перемещенией
         self.q = self.line_struct.q
+        # Закреплённые степени свободы: номер -> заданное перемещение
+        # (в q вместо имени неизвестного стоит число)
+        self._prescribed = {i: value for i, value in enumerate(self.q.to_list())
+                            if not isinstance(value, str)}
+        # K_fc*u_c - вклад ненулевых заданных перемещений, который
+        # переносится в правую часть для свободных степеней свободы
+        self._lift = None
         # Вычисялемые перемещения для ускорения вычислений
         self.res_q = []
+        # Разложение матрицы K, чтобы решать систему для новых
+        # векторов усилий без повторного разложения
+        self._factor = None
+        # Метод, которым получено разложение
+        self._solver = None
+        # Параметры итерационного решателя (solver='cg', см. matan.cg_solve)
+        self.cg_precond = 'jacobi'
+        self.cg_tol = 1e-10
+        self.cg_maxiter = None
+        # Граничные условия исключением закреплённых степеней свободы
+        # (enter_boundary_conditions(method='reduce')): номера свободных
+        # степеней свободы и матрица жёсткости только для них
+        self._free = None
+        self.K_free = None
+        # Результаты случаев нагружения (solve_cases): имя -> CaseResult
+        self.case_results = {}
+        # Перемещения и усилия только от осадки опор (solve_cases),
+        # None, если все заданные перемещения нулевые
+        self.settlement = None
 
     @property
     def height(self):
@@ -46,6 +237,8 @@ class FEMComput:
         """Показать уравнение в матричном виде"""
         # Строки матрицы жёсткости представляем в виде строк python
         K = str(self.K).split('\n')
+        # Матрица без сборки выводится одной строкой - дополняем пустыми
+        K += [' '*len(K[0])]*(self.height - len(K))
         # Строки столбца сил также как строки python
         q = str(self.q).split('\n')
         # Строки вектора неизвестных усзловых перемещений как строки python
@@ -84,20 +277,17 @@ class FEMComput:
             # Печатаем эту строку уравнения
             print(res_row)
 
-    def piano_ayrons(self, i):
-        """Метод Пиано-Айронса в i-ом строке i-ом столбце"""
-        # Согласно методу Пиана-Айронса
-        # Остальные элементы в i-ой строке приравниваем нулю
-        for col in range(self.K[i].cols):
-            self.K[i, col] = 0
-
-        # остальные элементы в i-ом столбце приравниваем нулю
-        # Обходим элементы выбранного столбца
-        for row in range(self.height):
-            self.K[row, i] = 0
-
-        # В i-ой строке и i-ом ставим единицу
-        self.K[i, i] = 1
+    def piano_ayrons(self, i, value=0):
+        """
+        Метод Пиано-Айронса в i-ом строке i-ом столбце
+        value : заданное перемещение в этой степени свободы
+        Матрица сама обходит только свои хранимые элементы строки
+        и столбца (см. constrain у SparseMatrix, SkylineMatrix)
+        """
+        # Согласно методу Пиана-Айронса остальные элементы в i-ой строке
+        # и i-ом столбце приравниваем нулю, на диагонали ставим единицу
+        # (без сборки K просто запоминаем закреплённую степень свободы)
+        self.K.constrain(i)
 
         # То есть меняем матрицу K так (пусть закрепили в 0-ом узле):
         #  1  2  3  4      1  0  0  0
@@ -106,71 +296,377 @@ class FEMComput:
         # 13 14 15 16      0 14 15 16
 
         # Осталось изменить вектор известных узловых усилий
-        self.f[i] = 0
+        self.f[i] = value
 
         # То есть изменили вектор f(для примера закрепили в 0-ом узле)
         #  1    0
         #  2    2
         #  3 => 3
         #  4    4
+        # Вклад K[:, i]*value в остальные строки f переносится
+        # заранее, до зануления столбца (см. enter_boundary_conditions)
 
-    def enter_boundary_conditions(self):
+    def enter_boundary_conditions(self, method='piano-ayrons'):
         """
-        Введём граничные условия методом Пиана-Айронса
+        Введём граничные условия
+        method: 'piano-ayrons' - методом Пиана-Айронса: закреплённые
+                                 строки и столбцы K заменяются единичными
+                'reduce'       - исключением: K и f не меняются, решается
+                                 система только для свободных степеней
+                                 свободы (K_free), решение раскладывается
+                                 обратно в полный вектор перемещений
         """
-        # Обходим вектор узловых перемещений
-        for i in range(self.height):
-            # Если в каком-то узле перемещенее равно нулю
-            if self.q[i] == 0:
-                # Значит в этом узле нам нужно закрепить конструкцию
-                # Что немало важно, в этом узле находится заделка
-                # Примеменев в этой строке метод Пиано-Айронса
-                self.piano_ayrons(i)
-
-        # Теперь надо проверить естьли в матрице жёсткости K нулевые столбцы
-        for j in range(self.K.cols):
-            # Является ли столбц нулевым
-            is_null_col = True
-            for i in range(self.K.rows):
-                if self.K[i, j] != 0:
-                    is_null_col = False
-                    break
-            # Если столбец оказался нулевым
-            if is_null_col:
-                # То в строке = номеру столбца вводим
-                # Граничные условия методом Пиано-Айрноса
-                self.K[j, j] = 1
-
-        # Теперь обходим все строки - есть ли нулевые
-        for i in range(self.K.rows):
-            # Является ли строка нулевой
-            is_null_row = True
-            for j in range(self.K.cols):
-                if self.K[i, j] != 0:
-                    is_null_row = False
-                    break
-            # Если строка оказалась нулевой
-            if is_null_row:
-                # То в строке = номеру столбца вводим
-                # Граничные условия методом Пиано-Айрноса
+        if method not in ('piano-ayrons', 'reduce'):
+            raise Exception(f'Неизвестный метод ввода граничных условий {method}')
+        # Матрица K меняется - старое разложение и решение уже не годятся
+        self._factor = None
+        self.res_q = []
+
+        # Правую часть каждый раз строим заново из сил конструкции:
+        # при повторном вызове K_fc*u_c не должен вычитаться дважды
+        if method == 'reduce':
+            self.f = self.line_struct.f
+            self.reduce_system()
+            return
+        self._free = None
+        self.K_free = None
+
+        # Ненулевые заданные перемещения (осадка опоры): K_fc*u_c
+        # переносим в правую часть, пока столбцы K ещё не занулены
+        self._lift_prescribed()
+        self.f = self.constrain_f(self.line_struct.f)
+
+        # Закрепляем заданные степени свободы методом Пиано-Айронса
+        for i, value in self._prescribed.items():
+            self.piano_ayrons(i, value)
+
+        # Без сборки K нулевые строки находим по диагонали за O(n)
+        if isinstance(self.K, ElementOperator):
+            self.K.constrain_null()
+            return
+
+        # Матрица жёсткости неотрицательно определена: строка и столбец
+        # нулевые, если на диагонали ноль - ставим туда единицу за O(n)
+        for i, d in enumerate(self.K.diagonal()):
+            if d == 0:
                 self.K[i, i] = 1
 
-    def find_q(self, recalculate=False):
+    def _lift_prescribed(self):
+        """
+        Запомнить K_fc*u_c - одно умножение K на вектор заданных
+        перемещений за O(ненулевых элементов K), если они не все нулевые
+        """
+        if self._lift is not None or not any(self._prescribed.values()):
+            return
+        u = [0]*self.height
+        for i, value in self._prescribed.items():
+            u[i] = value
+        self._lift = self.K.matvec(u)
+
+    def _apply_lift(self, f):
+        """Вычесть K_fc*u_c из свободных строк вектора f"""
+        if self._lift is None:
+            return
+        for i, value in enumerate(self._lift):
+            if value and i not in self._prescribed:
+                f[i] -= value
+
+    def reduce_system(self):
+        """
+        Граничные условия исключением: оставляем только свободные
+        степени свободы за O(ненулевых элементов K)
+        Закреплённые (q[i] == 0) и "пустые" (нулевая диагональ K, у
+        неотрицательно определённой матрицы жёсткости это нулевые
+        строка и столбец) степени свободы в систему не входят
+        Ненулевые заданные перемещения дают вклад K_fc*u_c,
+        который вычитается из f свободных степеней свободы
+        """
+        if isinstance(self.K, ElementOperator):
+            raise Exception('Без сборки K граничные условия вводятся '
+                            'только методом Пиана-Айронса')
+        self._lift_prescribed()
+        diag = self.K.diagonal()
+        self._free = array('l', [i for i in range(self.height)
+                                 if i not in self._prescribed and diag[i] != 0])
+        self.K_free = self.K.submatrix(self._free)
+        self._factor = None
+        self.res_q = []
+
+    def reduce_f(self, f):
+        """Строки вектора узловых усилий f для свободных степеней свободы"""
+        lift = self._lift
+        values = [f[i] - lift[i] if lift else f[i] for i in self._free]
+        f_free = m.Matrix(rows=len(values), filler=0)
+        if values:
+            f_free.set_flat(slice(None), values)
+        return f_free
+
+    def expand_q(self, q_free):
+        """
+        Полный вектор перемещений: в закреплённых степенях
+        свободы заданные перемещения
+        """
+        q = m.Matrix(rows=self.height, filler=0)
+        for i, value in self._prescribed.items():
+            if value:
+                q[i] = value
+        for k, i in enumerate(self._free):
+            q[i] = q_free[k]
+        return q
+
+    def constrain_f(self, f):
+        """
+        Ввести граничные условия в другой вектор узловых усилий f
+        так же, как они введены в self.f методом Пиана-Айронса
+        """
+        # Делаем копию, чтобы не менять переданный вектор
+        f = m.Matrix(f.to_list())
+        self._apply_lift(f)
+        # В закреплённых узлах - заданные перемещения
+        for i, value in self._prescribed.items():
+            f[i] = value
+        return f
+
+    def factorize(self, solver='auto'):
+        """
+        Разложить матрицу K
+            solver: 'lu'   - LU-разложение с выбором ведущего элемента
+                    'ldlt' - LDL^T-разложение симметричной матрицы
+                    'auto' - LDL^T, если K симметрична, иначе LU
+                    'cg'   - без разложения, сопряжённые градиенты
+                             с предобуславливателем self.cg_precond
+            Профильная матрица K всегда раскладывается в своём
+            профиле, если только не попросили 'lu'; симметричная
+            разреженная - тоже в профиле
+        """
+        if solver not in ('auto', 'lu', 'ldlt', 'cg'):
+            raise Exception(f'Неизвестный метод решения {solver}')
+
+        # Без сборки K доступен только итерационный решатель
+        if isinstance(self.K, ElementOperator) and solver not in ('auto', 'cg'):
+            raise Exception(f"Без сборки K нельзя решать методом {solver}, только 'cg'")
+
+        # После исключения закреплённых степеней свободы
+        # раскладываем только матрицу свободных
+        K = self.K if self._free is None else self.K_free
+
+        # Итерационный решатель: ни разложения, ни заполнения
+        if solver == 'cg' or isinstance(K, ElementOperator):
+            return m.CGSolver(K, precond=self.cg_precond,
+                              tol=self.cg_tol, maxiter=self.cg_maxiter)
+
+        # Профильную матрицу раскладываем в её же профиле
+        if isinstance(K, m.SkylineMatrix) and solver != 'lu':
+            return m.skyline_factor(K)
+
+        # Симметричную разреженную - тоже в профиле, а не плотным
+        # LDL^T или LU за O(n^2) памяти и O(n^3) времени
+        if isinstance(K, m.SparseMatrix) and (
+                solver == 'ldlt' or (solver == 'auto' and m.is_symmetric(K))):
+            try:
+                return m.skyline_factor(K.to_skyline(), overwrite=True)
+            except Exception:
+                # Без выбора ведущего элемента не получилось - плотное
+                # LDL^T не поможет, в автоматическом режиме сразу LU
+                if solver == 'ldlt':
+                    raise
+                return m.lu_factor(K)
+
+        # После граничных условий K симметрична,
+        # и можно обойтись вдвое меньшим LDL^T-разложением
+        if solver == 'ldlt' or (solver == 'auto' and m.is_symmetric(K)):
+            try:
+                return m.ldlt_factor(K)
+            except Exception:
+                # Без выбора ведущего элемента не получилось -
+                # в автоматическом режиме переходим к LU
+                if solver == 'ldlt':
+                    raise
+
+        return m.lu_factor(K)
+
+    def find_q(self, recalculate=False, f=None, solver='auto'):
         """
         Найти вектор неизвестных узловым перемещений
-            method: метод решения систему уравнений (inv, guass)
             recalculate: пересчитать в любом случае
+            f: другой вектор узловых усилий для этой же конструкции,
+               система решается по уже готовому разложению K за O(n^2)
+            solver: метод разложения K (см. factorize),
+                    для 'cg' история сходимости - в self.cg_info
         """
+        # Разложение матрицы K делаем один раз
+        # (или заново, если попросили другой метод)
+        if recalculate or self._factor is None or self._solver != solver:
+            self._factor = self.factorize(solver)
+            self._solver = solver
+            self.res_q = []
+
+        # Решение для другого вектора усилий не кешируем
+        if f is not None:
+            if self._free is not None:
+                return self.expand_q(self._factor.solve(self.reduce_f(f)))
+            return self._factor.solve(self.constrain_f(f))
+
         # если задан параметр пересчитать - то есть в любом случае
         # произвести расчёт занаво или еще не было посчитано
         if recalculate or not self.res_q:
             # Находим перемещения
-            self.res_q = m.find_with_gauss(self.K, self.f)
+            if self._free is not None:
+                self.res_q = self.expand_q(self._factor.solve(self.reduce_f(self.f)))
+            else:
+                self.res_q = self._factor.solve(self.f)
 
         # возвращаем посчитанное значение вектора перемещений
         # или то, чо было вычисленно ранее
         return self.res_q
 
+    def solve_cases(self, cases=None, solver='auto'):
+        """
+        Рассчитать случаи нагружения конструкции вместе: их векторы
+        сил - столбцы одной матрицы, K раскладывается один раз
+        (то же разложение, что и у find_q), и все системы решаются
+        одним вызовом solve_many
+            cases: список случаев LoadCase, по умолчанию все
+                   line_struct.load_cases
+            solver: метод разложения K (см. factorize)
+        Случаи решаются с нулевыми перемещениями опор, а осадка опор
+        считается отдельно - в self.settlement
+        Возвращает словарь имя случая -> CaseResult, он же в self.case_results
+        """
+        cases = self.line_struct.load_cases if cases is None else cases
+        F = self.line_struct.cases_f(cases)
+        if self._factor is None or self._solver != solver:
+            self._factor = self.factorize(solver)
+            self._solver = solver
+            self.res_q = []
+
+        count = len(cases)
+        B = self._reduce_cases(F) if self._free is not None else self._constrain_cases(F)
+        flat = self._factor.solve_many(B).get_flat(slice(None))
+        # Хранилище решения (list, array, ndarray) - в обычный список
+        flat = flat.tolist() if hasattr(flat, 'tolist') else list(flat)
+        if self._free is not None:
+            flat = self._expand_cases(flat, count)
+
+        self.case_results = {}
+        for k, case in enumerate(cases):
+            q = flat[k::count]
+            self.case_results[case.name] = CaseResult(case.name, q, self.axial_forces(q))
+
+        # Осадка опор - решение без нагрузок с заданными перемещениями
+        self.settlement = None
+        if self._lift is not None:
+            q = self.find_q(f=m.Matrix(rows=self.height, filler=0), solver=solver).to_list()
+            self.settlement = CaseResult('settlement', q, self.axial_forces(q))
+        return self.case_results
+
+    def combine(self, factors, name=None):
+        """
+        Сочетание нагрузок из уже рассчитанных случаев (solve_cases)
+        без нового решения: перемещения и усилия - линейная комбинация
+        результатов случаев, O(случаев * степеней свободы)
+            factors: коэффициенты сочетания, имя случая -> коэффициент,
+                     например {'G': 1.35, 'Q': 1.5}
+            name: имя сочетания, по умолчанию '1.35*G + 1.5*Q'
+        Осадка опор (self.settlement) на коэффициенты не умножается
+        и входит в сочетание один раз
+        Возвращает CaseResult
+        """
+        if not self.case_results:
+            raise Exception('Случаи нагружения не рассчитаны, нужен solve_cases')
+        if not factors:
+            raise Exception('В сочетании нет ни одного случая')
+        if self.settlement is not None:
+            q, N = list(self.settlement.q), list(self.settlement.N)
+        else:
+            q = [0]*self.height
+            N = [0]*len(self.line_struct.items)
+        for case, c in factors.items():
+            if case not in self.case_results:
+                raise Exception(f'Случай нагружения {case} не рассчитан')
+            res = self.case_results[case]
+            q = [a + c*x for a, x in zip(q, res.q)]
+            N = [a + c*x for a, x in zip(N, res.N)]
+        if name is None:
+            name = ' + '.join(f'{c}*{case}' for case, c in factors.items())
+        return CaseResult(name, q, N)
+
+    def envelope(self, combinations):
+        """
+        Огибающие перемещений и усилий по всем сочетаниям: каждое
+        сочетание считается combine и сразу сравнивается с текущими
+        наименьшими и наибольшими значениями - сами сочетания не хранятся
+            combinations: последовательность (или генератор) словарей
+                          коэффициентов, как у combine, либо словарь
+                          имя сочетания -> коэффициенты
+        Возвращает Envelope
+        """
+        if isinstance(combinations, dict):
+            combinations = combinations.values()
+        env = None
+        for factors in combinations:
+            res = self.combine(factors)
+            if env is None:
+                env = Envelope(res.q, list(res.q), res.N, list(res.N), 1)
+                continue
+            env.q_min = list(map(min, env.q_min, res.q))
+            env.q_max = list(map(max, env.q_max, res.q))
+            env.N_min = list(map(min, env.N_min, res.N))
+            env.N_max = list(map(max, env.N_max, res.N))
+            env.count += 1
+        if env is None:
+            raise Exception('Нет ни одного сочетания')
+        return env
+
+    def _constrain_cases(self, F):
+        """
+        Однородные граничные условия во всех столбцах F:
+        в закреплённых степенях свободы нули
+        """
+        count = F.cols
+        flat = list(F.get_flat(slice(None)))
+        for i in self._prescribed:
+            flat[i*count:(i + 1)*count] = [0]*count
+        res = m.Matrix(rows=F.rows, cols=count, filler=0)
+        res.set_flat(slice(None), flat)
+        return res
+
+    def _reduce_cases(self, F):
+        """Строки всех столбцов F для свободных степеней свободы"""
+        count = F.cols
+        flat = F.get_flat(slice(None))
+        values = [flat[i*count + k] for i in self._free for k in range(count)]
+        res = m.Matrix(rows=len(self._free), cols=count, filler=0)
+        if values:
+            res.set_flat(slice(None), values)
+        return res
+
+    def _expand_cases(self, X, count):
+        """
+        Решения для свободных степеней свободы (строки плоского списка X
+        по count чисел) - в полные векторы перемещений,
+        в закреплённых степенях свободы нули
+        """
+        flat = [0]*(self.height*count)
+        for r, i in enumerate(self._free):
+            flat[i*count:(i + 1)*count] = X[r*count:(r + 1)*count]
+        return flat
+
+    def axial_forces(self, q):
+        """
+        Продольные усилия во всех элементах по вектору перемещений q
+        (последовательность u1, v1, u2, v2, ...), как aprox_Fx
+        """
+        return [self._axial_force(el, q[2*el.n1.pos], q[2*el.n2.pos])
+                for el in self.line_struct.items]
+
+    @property
+    def cg_info(self):
+        """Сведения о сходимости последнего решения методом CG"""
+        if isinstance(self._factor, m.CGSolver):
+            return self._factor.info
+        return None
+
     def show_q(self):
         """Вывести узловые перемещения"""
         # Вектор неизвестных узловых перемещений как строки python
@@ -194,9 +690,17 @@ class FEMComput:
             print(res_str)
 
     def apply_q_to_structure(self):
-        """Нанести перемещения на конструкцию"""
+        """
+        Нанести перемещения на конструкцию
+        В режиме снимка конструкция не меняется - перемещения
+        записываются только в массивы self.u и self.v
+        """
         # Найдем вектор узловых перемещений
-        q = self.find_q()
+        q = self.find_q().to_list()
+        self.u = q[0::2]
+        self.v = q[1::2]
+        if self.snapshot:
+            return
 
         # Узлы в конструкции должы быть в том же порядке, что и векторе q
         # Каждому узлу конструкции указываем соответствующее перемещение
@@ -204,6 +708,14 @@ class FEMComput:
             self.line_struct.grid[i].u = q[i*2]
             self.line_struct.grid[i].v = q[i*2+1]
 
+    def _node_u(self, node):
+        """Перемещение узла вдоль оси x: в режиме снимка - из self.u"""
+        if not self.snapshot:
+            return node.u
+        if self.u is None:
+            raise Exception('Перемещения ещё не найдены, нужен apply_q_to_structure')
+        return self.u[node.pos]
+
     def aprox_u(self, el: s.LineFE, x: float):
         """Апрокисимация поля перемещения ОДНОГО элемената
         el: конечный элемент
@@ -217,9 +729,9 @@ class FEMComput:
             raise Exception(f'Координата x={x} не внутри [0, 1]')
 
         # Находим перемещение в начале элемента
-        u1 = el.n1.u
+        u1 = self._node_u(el.n1)
         # Находим перемещение в конце элемента
-        u2 = el.n2.u
+        u2 = self._node_u(el.n2)
 
         # Функции форм конечного элемента
         N1 = 1 - (x*el.Lx)/el.Lx
@@ -280,10 +792,13 @@ class FEMComput:
         # - это константа, и можно не передавать x
 
         # Находим перемещение в начале элемента
-        u1 = el.n1.u
+        u1 = self._node_u(el.n1)
         # Находим перемещение в конце элемента
-        u2 = el.n2.u
+        u2 = self._node_u(el.n2)
+        return self._axial_force(el, u1, u2)
 
+    def _axial_force(self, el: s.LineFE, u1, u2):
+        """Усилие в элементе по перемещениям его узлов u1, u2 вдоль оси x"""
         # Производные от функции форм конечного элемента
         _N1 = -1/el.Lx
         _N2 = 1/el.Lx
@@ -0,0 +1,596 @@
+# -*- coding: utf-8 -*-
+"""
+columnar - колоночное представление конструкции (struct of arrays)
+Узлы и элементы хранятся не объектами, а строками типизированных
+массивов. Node, Rod и Spring заменяются лёгкими представлениями
+(NodeView, RodView, SpringView) над строками этих массивов, поэтому
+код построения конструкции (add_rod, add_spring, add_pinning, ...)
+работает без изменений, а памяти нужно на порядок меньше
+"""
+import math
+from array import array
+from collections.abc import Sequence
+
+from . import matan
+from . import structure as s
+from .structure import Force, Distance, LineStructure, TrussArrays
+
+# Нет значения (свободное перемещение, параметр не того типа элемента)
+NAN = float('nan')
+
+# Коды типов элементов
+ROD = 0
+SPRING = 1
+
+
+def _value(x):
+    """NaN в массиве означает None"""
+    return None if math.isnan(x) else x
+
+
+def _stored(x):
+    """None хранится в массиве как NaN"""
+    return NAN if x is None else x
+
+
+class NodeTable:
+    """Таблица узлов: по строке на узел"""
+
+    def __init__(self):
+        # Координаты узлов
+        self.x = array('d')
+        self.y = array('d')
+        # Перемещения узлов, NaN - неизвестное (свободное) перемещение
+        self.u = array('d')
+        self.v = array('d')
+        # 1 - в узле заделка
+        self.pinned = bytearray()
+        # Версии координат узлов (см. Node.version)
+        self.version = array('l')
+        # Точечные силы только у нагруженных узлов: {номер узла: [Force]}
+        self.forces = {}
+
+    def __len__(self):
+        return len(self.x)
+
+    def append(self, x, y):
+        """Добавить узел, возвращает его номер"""
+        self.x.append(x)
+        self.y.append(y)
+        self.u.append(NAN)
+        self.v.append(NAN)
+        self.pinned.append(0)
+        self.version.append(0)
+        return len(self.x) - 1
+
+    def permute(self, order):
+        """
+        Переставить строки: новой i-ой строкой становится строка order[i]
+        Возвращает inverse: старая i-ая строка теперь на месте inverse[i]
+        """
+        for name in ('x', 'y', 'u', 'v', 'version'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[i] for i in order]))
+        self.pinned = bytearray(self.pinned[i] for i in order)
+        inverse = [0]*len(order)
+        for new, old in enumerate(order):
+            inverse[old] = new
+        self.forces = {inverse[i]: forces for i, forces in self.forces.items()}
+        return inverse
+
+
+class ElementTable:
+    """Таблица элементов: по строке на элемент"""
+
+    def __init__(self):
+        # Номера начального и конечного узлов
+        self.n1 = array('l')
+        self.n2 = array('l')
+        # Код типа элемента: ROD или SPRING
+        self.kind = bytearray()
+        # Модуль Юнга и площадь стержня (NaN у пружинок)
+        self.E = array('d')
+        self.A = array('d')
+        # Жёсткость пружинки (NaN у стержней)
+        self.C = array('d')
+        # Распределённые нагрузки только у нагруженных элементов:
+        # {номер элемента: [[q1, q2], ...]}
+        self.q = {}
+
+    def __len__(self):
+        return len(self.n1)
+
+    def append(self, kind, n1, n2, E=None, A=None, C=None):
+        """Добавить элемент, возвращает его номер"""
+        self.n1.append(n1)
+        self.n2.append(n2)
+        self.kind.append(kind)
+        self.E.append(_stored(E))
+        self.A.append(_stored(A))
+        self.C.append(_stored(C))
+        return len(self.n1) - 1
+
+
+class NodeView:
+    """Узел - представление строки таблицы узлов"""
+    __slots__ = ('_table', 'pos')
+
+    def __init__(self, table: NodeTable, pos: int):
+        self._table = table
+        # Позиция узла в таблице (номер строки)
+        self.pos = pos
+
+    @property
+    def x(self):
+        return self._table.x[self.pos]
+
+    @x.setter
+    def x(self, value):
+        self._table.x[self.pos] = value
+        self._table.version[self.pos] += 1
+
+    @property
+    def y(self):
+        return self._table.y[self.pos]
+
+    @y.setter
+    def y(self, value):
+        self._table.y[self.pos] = value
+        self._table.version[self.pos] += 1
+
+    @property
+    def u(self):
+        return _value(self._table.u[self.pos])
+
+    @u.setter
+    def u(self, value):
+        self._table.u[self.pos] = _stored(value)
+
+    @property
+    def v(self):
+        return _value(self._table.v[self.pos])
+
+    @v.setter
+    def v(self, value):
+        self._table.v[self.pos] = _stored(value)
+
+    @property
+    def pinned(self):
+        """Есть ли в узле заделка"""
+        return bool(self._table.pinned[self.pos])
+
+    @property
+    def version(self):
+        return self._table.version[self.pos]
+
+    @property
+    def forces(self):
+        """Точечные силы в узле (только для чтения)"""
+        return tuple(self._table.forces.get(self.pos, ()))
+
+    def add_point_force(self, value: Force):
+        """Добавить точечную силу - нагрузку"""
+        self._table.forces.setdefault(self.pos, []).append(value)
+
+    def add_pinning(self, u=0, v=0):
+        """
+        Добавить закрепление
+        u, v : заданные перемещения узла, ненулевые - например, осадка опоры
+        """
+        self._table.u[self.pos] = _stored(u)
+        self._table.v[self.pos] = _stored(v)
+        self._table.pinned[self.pos] = 1
+
+    def __eq__(self, other):
+        return (isinstance(other, NodeView) and other._table is self._table
+                and other.pos == self.pos)
+
+    def __hash__(self):
+        return hash((id(self._table), self.pos))
+
+    def __repr__(self):
+        return f'NodeView(pos={self.pos}, x={self.x}, y={self.y}, u={self.u}, v={self.v})'
+
+
+class ElementView:
+    """Линейный КЭ - представление строки таблицы элементов"""
+    __slots__ = ('_nodes', '_table', 'pos')
+
+    def __init__(self, nodes: NodeTable, table: ElementTable, pos: int):
+        self._nodes = nodes
+        self._table = table
+        # Позиция элемента в таблице (номер строки)
+        self.pos = pos
+
+    @property
+    def n1(self):
+        return NodeView(self._nodes, self._table.n1[self.pos])
+
+    @property
+    def n2(self):
+        return NodeView(self._nodes, self._table.n2[self.pos])
+
+    @property
+    def q(self):
+        """Распределённые нагрузки на элементе (только для чтения)"""
+        return tuple(self._table.q.get(self.pos, ()))
+
+    @property
+    def Lx(self):
+        """Проекция элемента на ось x"""
+        x = self._nodes.x
+        return x[self._table.n2[self.pos]] - x[self._table.n1[self.pos]]
+
+    @property
+    def Ly(self):
+        """Проекция элемента на ось y"""
+        y = self._nodes.y
+        return y[self._table.n2[self.pos]] - y[self._table.n1[self.pos]]
+
+    @property
+    def L(self):
+        """Длина элемента"""
+        Lx = self.Lx
+        Ly = self.Ly
+        return math.sqrt(Lx*Lx + Ly*Ly)
+
+    @property
+    def alpha(self):
+        """Угол наклона элемента к оси x"""
+        return s.get_alpha(self.Lx, self.Ly)
+
+    def _get_geometry(self):
+        """Длина и направляющие косинусы (L, cos_a, sin_a)"""
+        Lx = self.Lx
+        Ly = self.Ly
+        L = math.sqrt(Lx*Lx + Ly*Ly)
+        if L == 0:
+            raise Exception('Нулевая длина элемента: его узлы совпадают')
+        return L, Lx/L, Ly/L
+
+    @property
+    def cos_a(self):
+        """Косинус угла наклона элемента Lx/L"""
+        return self._get_geometry()[1]
+
+    @property
+    def sin_a(self):
+        """Синус угла наклона элемента Ly/L"""
+        return self._get_geometry()[2]
+
+    def get_simple_K(self):
+        """Получить ПРОСТУЮ матрицу жёсткости без учета материала"""
+        return s.simple_K(self.cos_a, self.sin_a)
+
+    # Замена распределённой нагрузки на узловые - та же, что у LineFE
+    distributed_forces = s.LineFE.distributed_forces
+
+    @property
+    def _shared_K(self):
+        """Общая матрица жёсткости из кеша stiffness_cache - только для чтения"""
+        return s.stiffness_cache.get(self, self.material)
+
+    @property
+    def K(self):
+        """Матрица жёсткости элемента - копия, её можно менять"""
+        return self._shared_K.copy()
+
+    def add_linear_distributed_force(self, q1: Force, q2: Force):
+        """Добавить распределённую нагрузку - ВДОЛЬ элемента"""
+        self._table.q.setdefault(self.pos, []).append([q1, q2])
+
+    def __eq__(self, other):
+        return (isinstance(other, ElementView) and other._table is self._table
+                and other.pos == self.pos)
+
+    def __hash__(self):
+        return hash((id(self._table), self.pos))
+
+
+class RodView(ElementView):
+    """Стержневой КЭ - представление строки таблицы элементов"""
+    __slots__ = ()
+
+    @property
+    def E(self):
+        return self._table.E[self.pos]
+
+    @E.setter
+    def E(self, value):
+        self._table.E[self.pos] = value
+
+    @property
+    def A(self):
+        return self._table.A[self.pos]
+
+    @A.setter
+    def A(self, value):
+        self._table.A[self.pos] = value
+
+    @property
+    def stiffness(self):
+        """Коэффициент жёсткости стержня EA/L"""
+        return self.E*self.A/self.L
+
+    @property
+    def material(self):
+        """Материал для ключа кеша матриц жёсткости: EA"""
+        return self.E*self.A
+
+    def __repr__(self):
+        return f'RodView(pos={self.pos}, E={self.E}, A={self.A})'
+
+
+class SpringView(ElementView):
+    """КЭ Пружинка - представление строки таблицы элементов"""
+    __slots__ = ()
+
+    @property
+    def C(self):
+        return self._table.C[self.pos]
+
+    @C.setter
+    def C(self, value):
+        self._table.C[self.pos] = value
+
+    @property
+    def stiffness(self):
+        """Коэффициент жёсткости пружинки C"""
+        return self.C
+
+    @property
+    def material(self):
+        """Материал для ключа кеша матриц жёсткости: C"""
+        return self.C
+
+    def __repr__(self):
+        return f'SpringView(pos={self.pos}, C={self.C})'
+
+
+# Представления проходят проверки isinstance(el, Rod), isinstance(el, LineFE)
+s.Rod.register(RodView)
+s.Spring.register(SpringView)
+
+# Класс представления по коду типа элемента
+VIEWS = {ROD: RodView, SPRING: SpringView}
+
+
+class NodeList(Sequence):
+    """Список узлов конструкции - представления строк таблицы"""
+
+    def __init__(self, table: NodeTable):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Нет узла с номером {index}')
+        return NodeView(self._table, index)
+
+
+class ElementList(Sequence):
+    """Список элементов конструкции - представления строк таблицы"""
+
+    def __init__(self, nodes: NodeTable, table: ElementTable):
+        self._nodes = nodes
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Нет элемента с номером {index}')
+        return VIEWS[self._table.kind[index]](self._nodes, self._table, index)
+
+
+class ColumnarStructure(LineStructure):
+    """
+    Конструкция из линейных КЭ в колоночном представлении:
+    узлы в NodeTable, элементы в ElementTable
+    grid и items - списки представлений строк этих таблиц
+    """
+
+    def __init__(self):
+        # Таблица узлов
+        self.nodes = NodeTable()
+        # Таблица элементов
+        self.elements = ElementTable()
+        # Случаи нагружения
+        self.load_cases = []
+
+    @property
+    def grid(self):
+        """Узлы конструкции"""
+        return NodeList(self.nodes)
+
+    @property
+    def items(self):
+        """Конечные элементы конструкции"""
+        return ElementList(self.nodes, self.elements)
+
+    def __eq__(self, other):
+        """Конструкции равны, если совпадают их таблицы"""
+        if not isinstance(other, ColumnarStructure):
+            return NotImplemented
+        # У сил нет сравнения - сравниваем их проекции
+        def loads(table):
+            return {i: [[(F.x, F.y) for F in (load if isinstance(load, list) else [load])]
+                        for load in values]
+                    for i, values in table.items()}
+
+        return all(getattr(self.nodes, name) == getattr(other.nodes, name)
+                   for name in ('x', 'y', 'pinned')) and \
+            all(getattr(self.elements, name) == getattr(other.elements, name)
+                for name in ('n1', 'n2', 'kind')) and \
+            loads(self.nodes.forces) == loads(other.nodes.forces) and \
+            loads(self.elements.q) == loads(other.elements.q)
+
+    def __repr__(self):
+        return f'ColumnarStructure(nodes={len(self.nodes)}, elements={len(self.elements)})'
+
+    # Представления не сообщают об изменениях таблиц, поэтому K, f и q
+    # собираются каждый раз заново (пакетная сборка идёт прямо по таблицам)
+    @property
+    def K(self):
+        """Глобальная матрица жётскости (разреженная)"""
+        return self.get_K()
+
+    @property
+    def f(self):
+        """Вектор известных узловых сил (одним проходом по нагрузкам)"""
+        size = len(self.nodes)*2
+        vector = matan.Matrix(rows=size, filler=0)
+        vector.set_flat(slice(None), s.load_vector(
+            self.gather_loads(), self.nodes.x, self.nodes.y, size))
+        return vector
+
+    @property
+    def q(self):
+        """Вектор неизвестных узловых перемещений"""
+        return self._build_q()
+
+    def _node_pos(self, node):
+        """Номер строки узла этой конструкции"""
+        if not isinstance(node, NodeView) or node._table is not self.nodes:
+            raise Exception('Узел не принадлежит этой конструкции')
+        return node.pos
+
+    def _add_element(self, kind, n1, n2, D, **params):
+        """
+        Добавить элемент типа kind
+        n1, n2, D - как у LineStructure.add_fen_el
+        params    - параметры элемента (E, A или C)
+        """
+        # Если не указали начальный узел
+        if not n1:
+            # В конструкции еще нет ни одного узла - создаём узел в начале координат
+            if not len(self.nodes):
+                i = self.nodes.append(0, 0)
+            else:
+                raise Exception("Забыли указать НАЧАЛЬНЫЙ узел элемента 'n1'")
+        else:
+            i = self._node_pos(n1)
+
+        # Если не указали КОНЕЧНЫЙ узел элемента
+        if not n2:
+            if not D:
+                raise Exception("Необходимо указать длину элемента")
+            # Создаём конечный узел, с указанием его координаты
+            j = self.nodes.append(self.nodes.x[i] + D.x, self.nodes.y[i] + D.y)
+        else:
+            j = self._node_pos(n2)
+
+        pos = self.elements.append(kind, i, j, **params)
+        return VIEWS[kind](self.nodes, self.elements, pos)
+
+    def add_fen_el(self, el, n1: NodeView = None, n2: NodeView = None, D: Distance = None):
+        """
+        Добавляет конечный элемент (Rod или Spring) к конструкции,
+        его параметры копируются в таблицу элементов
+        Возвращает представление нового элемента
+        """
+        if isinstance(el, s.Spring):
+            return self._add_element(SPRING, n1, n2, D, C=el.C)
+        if isinstance(el, s.Rod):
+            return self._add_element(ROD, n1, n2, D, E=el.E, A=el.A)
+        raise Exception(f'Элемент {type(el).__name__} нельзя хранить в таблице')
+
+    def add_rod(self, E, A, n1: NodeView = None, n2: NodeView = None, D: Distance = None):
+        """Добавляет стержень к конструкции (см. LineStructure.add_rod)"""
+        return self._add_element(ROD, n1, n2, D, E=E, A=A)
+
+    def add_spring(self, C, n1: NodeView = None, n2: NodeView = None, D: Distance = None):
+        """Добавить пружину к системе (см. LineStructure.add_spring)"""
+        return self._add_element(SPRING, n1, n2, D, C=C)
+
+    def _reorder_nodes(self, order):
+        """Переставить строки таблицы узлов и перенумеровать узлы элементов"""
+        inverse = self.nodes.permute(order)
+        self.elements.n1 = array('l', [inverse[i] for i in self.elements.n1])
+        self.elements.n2 = array('l', [inverse[i] for i in self.elements.n2])
+
+    def skyline_first(self):
+        """Профиль глобальной матрицы жёсткости (см. LineStructure.skyline_first)"""
+        first = list(range(len(self.nodes)*2))
+        for i, j in zip(self.elements.n1, self.elements.n2):
+            low = 2*min(i, j)
+            for dof in (2*i, 2*i + 1, 2*j, 2*j + 1):
+                if low < first[dof]:
+                    first[dof] = low
+        return first
+
+    def gather_loads(self):
+        """Нагрузки в плоские массивы - только нагруженные узлы и элементы"""
+        loads = s.LoadArrays()
+        for i, forces in self.nodes.forces.items():
+            for F in forces:
+                loads.add_point(i, F)
+        n1, n2 = self.elements.n1, self.elements.n2
+        for i, q in self.elements.q.items():
+            for q1, q2 in q:
+                loads.add_distributed(n1[i], n2[i], q1, q2)
+        return loads
+
+    def _node_coordinates(self):
+        """Координаты узлов - столбцы таблицы"""
+        return self.nodes.x, self.nodes.y
+
+    def gather_arrays(self):
+        """Плоские массивы для пакетной сборки - прямо из таблиц"""
+        elements = self.elements
+        is_rod = bytearray(kind == ROD for kind in elements.kind)
+        return TrussArrays(
+            x=self.nodes.x, y=self.nodes.y,
+            n1=elements.n1, n2=elements.n2,
+            k=array('d', [E*A if rod else C
+                          for E, A, C, rod in zip(elements.E, elements.A, elements.C, is_rod)]),
+            per_length=is_rod)
+
+    @staticmethod
+    def from_structure(line_struct: LineStructure):
+        """Колоночная копия обычной конструкции"""
+        res = ColumnarStructure()
+        for node in line_struct.grid:
+            i = res.nodes.append(node.x, node.y)
+            res.nodes.u[i] = _stored(node.u)
+            res.nodes.v[i] = _stored(node.v)
+            res.nodes.pinned[i] = node.pinned or (node.u == 0 and node.v == 0)
+            if node.forces:
+                res.nodes.forces[i] = list(node.forces)
+        for el in line_struct.items:
+            view = res.add_fen_el(el, res.grid[el.n1.pos], res.grid[el.n2.pos])
+            if el.q:
+                res.elements.q[view.pos] = [list(q) for q in el.q]
+        return res
+
+    def to_structure(self):
+        """Обычная конструкция (объекты Node, Rod, Spring) из таблиц"""
+        res = LineStructure()
+        for view in self.grid:
+            node = s.Node(x=view.x, y=view.y)
+            node.u = view.u
+            node.v = view.v
+            node.pinned = view.pinned
+            node.forces = list(view.forces)
+            node.pos = view.pos
+            res.grid.append(node)
+        for view in self.items:
+            n1 = res.grid[view.n1.pos]
+            n2 = res.grid[view.n2.pos]
+            if isinstance(view, SpringView):
+                el = res.add_spring(C=view.C, n1=n1, n2=n2)
+            else:
+                el = res.add_rod(E=view.E, A=view.A, n1=n1, n2=n2)
+            el.q = [list(q) for q in view.q]
+        return res
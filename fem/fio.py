@@ -62,9 +62,14 @@ def save_model(line_struct: LineStructure, file_name, comment=''):
     # Обходим все узлы
     for i, node in enumerate(line_struct.grid):
         # Если в текущем узле заделка
-        if node.u == 0 and node.v == 0:
-            # Выводим номер этого узла
-            print(f'\t{i+1}')
+        if node.pinned or (node.u == 0 and node.v == 0):
+            # Ненулевые заданные перемещения (осадку опоры)
+            # пишем после номера узла
+            if node.u or node.v:
+                print(f'\t{i+1} {node.u} {node.v}')
+            else:
+                # Выводим номер этого узла
+                print(f'\t{i+1}')
 
     # Дальше нужно указать точечные усилия в узлах
     # Переменная флаг, мы вообще имеем усилия в узла?
@@ -211,8 +216,12 @@ def load_model(file_name):
         i = int(n[0])-1
         # Получаем индекс с нужным индексом
         node = line_struct.grid[i]
-        # Добавляем заделку в этот узел
-        line_struct.add_pinning(node)
+        # Добавляем заделку в этот узел, после номера
+        # могут быть указаны заданные перемещения u и v
+        if len(n) > 1:
+            line_struct.add_pinning(node, float(n[1]), float(n[2]))
+        else:
+            line_struct.add_pinning(node)
 
     # Получаем точечные усилия в узлах
     point_forces = get_block("Point_Forces", file_name)
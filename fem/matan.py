@@ -4,13 +4,95 @@ matan - модуль предоставляющий математическеи
 для работы с матричными выражениями
 можно сказать аналог numpy
 """
-from copy import deepcopy
+import os
+from array import array
+from bisect import bisect_left
 from collections.abc import Iterable
 
+try:
+    # numpy - НЕобязательная зависимость, без неё работает
+    # эталонная реализация на чистом python
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Имя переменной окружения, в которой можно выбрать бэкенд
+BACKEND_ENV = 'FEM_MATAN_BACKEND'
+# Доступные бэкенды
+BACKENDS = ('python', 'numpy')
+# Текущий бэкенд
+_backend = 'python'
+
+
+def set_backend(name):
+    """
+    Выбрать бэкенд для вычислений
+    'python' - эталонная реализация на чистом python
+    'numpy'  - матрицы хранятся в ndarray, операции векторизованы
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise Exception(f'Неизвестный бэкенд {name}, доступны {BACKENDS}')
+    if name == 'numpy' and numpy is None:
+        raise Exception('Для бэкенда numpy нужно установить numpy')
+    _backend = name
+
+
+def get_backend():
+    """Текущий бэкенд вычислений"""
+    return _backend
+
+
+def _default_storage():
+    """Тип хранилища новых матриц для текущего бэкенда"""
+    return 'numpy' if _backend == 'numpy' else 'list'
+
+
+def _new_storage(values, storage):
+    """
+    Создать одномерное хранилище элементов матрицы
+    storage : 'list'  - список python, может хранить что угодно (например строки)
+              'array' - компактный массив array('d'), только числа по 8 байт
+              'numpy' - одномерный numpy.ndarray
+    """
+    if storage == 'list':
+        return list(values)
+    elif storage == 'array':
+        return array('d', values)
+    elif storage == 'numpy':
+        try:
+            return numpy.array(values, dtype=float)
+        except (ValueError, TypeError):
+            # Среди элементов есть НЕ числа (например строки 'u1')
+            return numpy.array(list(values), dtype=object)
+    else:
+        raise Exception(f'Неизвестный тип хранения матрицы {storage}')
+
+
+def _storage_of(arr):
+    """Тип хранилища, в котором лежат элементы arr"""
+    if isinstance(arr, list):
+        return 'list'
+    elif isinstance(arr, array):
+        return 'array'
+    elif numpy is not None and isinstance(arr, numpy.ndarray):
+        return 'numpy'
+    else:
+        # Произвольный объект с буферным протоколом
+        return 'buffer'
+
+
+def _is_numeric_ndarray(arr):
+    """Является ли хранилище числовым numpy.ndarray"""
+    return numpy is not None and isinstance(arr, numpy.ndarray) and arr.dtype != object
+
 
 class RowAccess:
     """Доступ к строкам матрицы"""
 
+    __slots__ = ('m', 'i_row')
+
     def __init__(self, m, i_row):
         # Ссылка на матрицу
         self.m = m
@@ -60,7 +142,7 @@ class RowAccess:
         # проводим валидацию индекса и преобразуюем в индекс матрицы
         index_matrix = self.valid_index(index)
         # присваиваем элементу матрицы значение
-        self.m._arr[index_matrix] = value
+        self.m._store(index_matrix, value)
 
     def __str__(self):
         """Строковое представление матрицы строки"""
@@ -115,12 +197,8 @@ class RowAccess:
 
         else:
             # other - это число
-            # Создаём диагональную матрицу, где на главной диагонале
-            # Будет стоять это число other
             # Каждый элемент строки умножаем на это число
-            D = Matrix.diag(size=1, filler=other)
-            # Возвращаем матрицу умножения
-            return D*self
+            return Matrix._from_flat(1, self.cols, [x*other for x in self.to_list()])
 
     def __add__(self, other):
         """Сложение двух строк"""
@@ -166,7 +244,68 @@ class RowAccess:
 
     def __truediv__(self, other):
         """Операция деления"""
-        return self * (1/other)
+        # Каждый элемент строки делим на число
+        return Matrix._from_flat(1, self.cols, [x/other for x in self.to_list()])
+
+    def _other_row(self, other):
+        """Элементы строки other для операций на месте"""
+        if isinstance(other, Matrix) and other.rows == 1 and other.cols == self.cols:
+            return other.to_list()
+        elif isinstance(other, RowAccess) and other.cols == self.cols:
+            return other.to_list()
+        else:
+            # Размерности не совпадают или other - не строка
+            raise Exception(f"Длины строк не совпадают {self} и {other}")
+
+    def __iadd__(self, other):
+        """Прибавить строку other прямо к строке матрицы"""
+        arr = self.m._arr
+        start = self.i_row*self.cols
+        row = self._other_row(other)
+        # В numpy складываем срез целиком
+        if _is_numeric_ndarray(arr):
+            arr[start:start + self.cols] += numpy.asarray(row, dtype=float)
+            return self
+        for j, x in enumerate(row):
+            arr[start + j] += x
+        return self
+
+    def __isub__(self, other):
+        """Вычесть строку other прямо из строки матрицы"""
+        arr = self.m._arr
+        start = self.i_row*self.cols
+        row = self._other_row(other)
+        # В numpy вычитаем срез целиком
+        if _is_numeric_ndarray(arr):
+            arr[start:start + self.cols] -= numpy.asarray(row, dtype=float)
+            return self
+        for j, x in enumerate(row):
+            arr[start + j] -= x
+        return self
+
+    def __imul__(self, other):
+        """Умножить строку матрицы на число на месте"""
+        arr = self.m._arr
+        start = self.i_row*self.cols
+        # В numpy умножаем срез целиком
+        if _is_numeric_ndarray(arr):
+            arr[start:start + self.cols] *= other
+            return self
+        for k in range(start, start + self.cols):
+            arr[k] *= other
+        return self
+
+    def __itruediv__(self, other):
+        """Разделить строку матрицы на число на месте"""
+        arr = self.m._arr
+        start = self.i_row*self.cols
+        # В numpy делим срез целиком
+        if _is_numeric_ndarray(arr):
+            arr[start:start + self.cols] /= other
+            return self
+        for k in range(start, start + self.cols):
+            arr[k] /= other
+        return self
 
     def __eq__(self, other):
         """Переопределение операции сравнения =="""
@@ -182,7 +321,7 @@ class RowAccess:
                 # получаем элементы в данной строке матрицы
                 elements = [self.m[self.i_row, j] for j in range(self.cols)]
                 # Сравниваем элементы
-                return elements == other._arr
+                return elements == list(other._arr)
         elif isinstance(other, RowAccess):
             # Второй объект это строка чей-то матрицы
             # Если не равны размерности, то и сравнивать элементы не нужно
@@ -220,8 +359,24 @@ class RowAccess:
 class Matrix:
     """Представление математической матрицы"""
 
-    def __init__(self, arr=None, *, to_row=False, size=None, rows=None, cols=None, filler=0):
-        """При создании получает либо двухмерный либо одномерный массив"""
+    __slots__ = ('_rows', '_cols', '_arr')
+
+    def __init__(self, arr=None, *, to_row=False, size=None, rows=None, cols=None, filler=0,
+                 storage=None):
+        """
+        При создании получает либо двухмерный либо одномерный массив
+        storage - как хранить элементы:
+                  'list'  - список python, может хранить строки
+                  'array' - компактный array('d'), 8 байт на элемент
+                  'numpy' - numpy.ndarray
+                  по умолчанию - 'list', а при бэкенде numpy - 'numpy'
+        """
+        if storage is None:
+            storage = _default_storage()
+        # Массив может быть и numpy.ndarray, у которого нет однозначного
+        # логического значения, поэтому пустоту проверяем через длину
+        if arr is not None and len(arr) == 0:
+            arr = None
         # Если передали парамтр size - значит матрица КВАДРАТНАЯ
         if size:
             # Задаём количество строк
@@ -246,7 +401,7 @@ class Matrix:
             # И столбцов матрицы
             self._cols = cols
         # Если передали
-        elif arr:
+        elif arr is not None:
             # Смаотрим какой он двухмерный или одномерный
             # Если двухмерный
             if isinstance(arr[0], Iterable):
@@ -278,7 +433,7 @@ class Matrix:
         # Заполняем матрицу
         self._arr = []
         # Если передали массив или матрицу
-        if arr:
+        if arr is not None:
             for line in arr:
                 # Если строка тоже массив
                 if isinstance(line, Iterable):
@@ -290,7 +445,11 @@ class Matrix:
         else:
             # Если массив не был передан
             # То заполняем матрицу заполнителем filler
-            self._arr = [filler for _ in range(self.rows*self.cols)]
+            self._arr = [filler]*(self.rows*self.cols)
+
+        # Переносим элементы в нужное хранилище
+        if storage != 'list':
+            self._arr = _new_storage(self._arr, storage)
 
     @property
     def rows(self):
@@ -337,6 +496,95 @@ class Matrix:
         """Единичная матрица size x size"""
         return Matrix.diag(size, filler=1)
 
+    @staticmethod
+    def from_buffer(buf, rows, cols=1):
+        """
+        Матрица rows x cols поверх любого объекта с буферным протоколом
+        (array('d'), bytearray, mmap, ...). Данные не копируются:
+        изменения матрицы видны в буфере и наоборот
+        """
+        view = memoryview(buf)
+        # Приводим буфер к вещественным числам по 8 байт
+        if view.format != 'd':
+            view = view.cast('B').cast('d')
+        # Размер буфера должен совпадать с размером матрицы
+        if len(view) != rows*cols:
+            raise Exception(f'В буфере {len(view)} элементов, а нужно {rows*cols}')
+        return Matrix._from_flat(rows, cols, view)
+
+    @property
+    def storage(self):
+        """Тип хранилища элементов: 'list', 'array', 'numpy' или 'buffer'"""
+        return _storage_of(self._arr)
+
+    def copy(self, storage=None):
+        """
+        Копия матрицы
+        storage - тип хранилища копии, по умолчанию как у исходной
+        (копия буфера хранится в array)
+        """
+        if storage is None:
+            storage = self.storage
+            if storage == 'buffer':
+                storage = 'array'
+        return Matrix._from_flat(self.rows, self.cols, _new_storage(self._arr, storage))
+
+    def _store(self, index, value):
+        """Записать value в позицию index одномерного представления"""
+        try:
+            self._arr[index] = value
+        except (ValueError, TypeError):
+            # Числовой ndarray не может хранить строки (например 'u1'),
+            # в этом случае переходим к ndarray объектов
+            if not _is_numeric_ndarray(self._arr):
+                raise
+            self._arr = self._arr.astype(object)
+            self._arr[index] = value
+
+    def get_flat(self, index):
+        """
+        Элемент (или срез) одномерного представления матрицы БЕЗ проверок
+        Элемент [i, j] лежит в позиции i*cols + j
+        Срез возвращается в виде хранилища матрицы (list, array, memoryview)
+        """
+        return self._arr[index]
+
+    def set_flat(self, index, value):
+        """
+        Задать элемент (или срез) одномерного представления матрицы БЕЗ проверок
+        При задании среза длина value должна совпадать с длиной среза
+        """
+        # Компактные хранилища принимают срезом только такой же массив
+        if isinstance(index, slice) and self.storage in ('array', 'buffer'):
+            if not isinstance(value, array):
+                value = array('d', value)
+        self._arr[index] = value
+
+    @staticmethod
+    def _from_flat(rows, cols, arr):
+        """
+        Матрица rows x cols поверх готового одномерного массива arr
+        Массив не копируется и не проверяется
+        """
+        m = Matrix.__new__(Matrix)
+        m._rows = rows
+        m._cols = cols
+        m._arr = arr
+        return m
+
+    def _like(self, values):
+        """Матрица той же размерности и типа хранилища из списка values"""
+        storage = self.storage
+        if storage == 'list':
+            return Matrix._from_flat(self.rows, self.cols, values)
+        elif storage == 'numpy':
+            return Matrix._from_flat(self.rows, self.cols, _new_storage(values, 'numpy'))
+        return Matrix._from_flat(self.rows, self.cols, array('d', values))
+
+    def _nd(self):
+        """Представление матрицы в виде двухмерного ndarray (без копирования)"""
+        return self._arr.reshape(self.rows, self.cols)
+
     def __len__(self):
         """Количество элементов в матрице"""
         return len(self._arr)
@@ -413,7 +661,7 @@ class Matrix:
             # Переводим два индекса в одномерное представление
             index = self.__index_from_two(coords[0], coords[1])
             # Задаём элемент матрицы
-            self._arr[index] = value
+            self._store(index, value)
         else:
             # Передали только один индекс
             index = self.__index_from_one(coords)
@@ -432,6 +680,10 @@ class Matrix:
                     raise Exception(f'Передано {dim2}, а нужно {dim1}')
             elif isinstance(value, RowAccess):
                 # Передпли строку какой-то матрицы
+                # Если это та же самая строка (например после m[i] *= k,
+                # которое уже изменило строку на месте) - ничего не делаем
+                if value.m is self and value.i_row == index:
+                    return
                 # если строка value имеет нужное количество столбцов
                 if value.cols == self.cols:
                     # каждый элемент строки value, присваиваем каждому элементу
@@ -450,7 +702,7 @@ class Matrix:
                 # Проверяем можно ли представить матрицу одномерным массивом
                 if self.cols == 1 or self.rows == 1:
                     # писваиваем элементу матрицы значение value
-                    self._arr[index] = value
+                    self._store(index, value)
                 else:
                     # Строке матрицы присвоили не матрицу строку
                     raise Exception(
@@ -473,6 +725,11 @@ class Matrix:
                 dim2 = f'{other.rows}x{other.cols}'
                 raise Exception(f"неверные размерности матриц {dim1} и {dim2}")
 
+            # Обе матрицы в numpy - умножаем средствами numpy
+            if _is_numeric_ndarray(self._arr) and _is_numeric_ndarray(other._arr):
+                res = numpy.dot(self._nd(), other._nd())
+                return Matrix._from_flat(self.rows, other.cols, res.ravel())
+
             # Создаём новую матрицу закготовку
             m = Matrix(rows=self.rows, cols=other.cols, filler=0)
 
@@ -506,22 +763,25 @@ class Matrix:
             return m
         else:
             # other - это число
-            # Создаём диагональную матрицу, где на главной диагонале
-            # Будет стоять это число other
-            D = Matrix.diag(size=self.rows, filler=other)
-            # Возвращаем матрицу умножения
-            return D*self
+            # В numpy умножаем весь массив сразу
+            if _is_numeric_ndarray(self._arr):
+                return Matrix._from_flat(self.rows, self.cols, self._arr*other)
+            # Каждый элемент матрицы умножаем на это число
+            return self._like([x*other for x in self._arr])
 
     def __add__(self, other):
         """Сложение двух матриц"""
         # oter должны быть матрицей
         if isinstance(other, Matrix):
             # Если размерности двух матриц не совпадают
-            if self.rows != other.rows and self.cols != other.cols:
+            if self.rows != other.rows or self.cols != other.cols:
                 # Вызываем исключение
                 dim1 = f'{self.rows}x{self.cols}'
                 dim2 = f'{other.rows}x{other.cols}'
                 raise Exception(f"неверные размерности матриц {dim1} и {dim2}")
+            elif _is_numeric_ndarray(self._arr) and _is_numeric_ndarray(other._arr):
+                # Обе матрицы в numpy - складываем массивы целиком
+                return Matrix._from_flat(self.rows, self.cols, self._arr + other._arr)
             else:
                 # Создаём заготовку для результирующей матрицы
                 res = Matrix(rows=self.rows, cols=self.cols, filler=0)
@@ -554,11 +814,85 @@ class Matrix:
 
     def __sub__(self, other):
         """Операция вычитания"""
+        # Матрицы одинаковой размерности вычитаем поэлементно
+        if isinstance(other, Matrix) and self.rows == other.rows and self.cols == other.cols:
+            if _is_numeric_ndarray(self._arr) and _is_numeric_ndarray(other._arr):
+                return Matrix._from_flat(self.rows, self.cols, self._arr - other._arr)
+            return self._like([a - b for a, b in zip(self._arr, other._arr)])
         return self + other*(-1)
 
     def __truediv__(self, other):
         """Операция деления"""
-        return self * (1/other)
+        # В numpy делим весь массив сразу
+        if _is_numeric_ndarray(self._arr):
+            return Matrix._from_flat(self.rows, self.cols, self._arr/other)
+        # Каждый элемент матрицы делим на число
+        return self._like([x/other for x in self._arr])
+
+    def _other_flat(self, other):
+        """Одномерное представление other для операций на месте"""
+        if isinstance(other, Matrix):
+            if self.rows == other.rows and self.cols == other.cols:
+                return other._arr
+        elif isinstance(other, RowAccess):
+            if self.rows == 1 and self.cols == other.cols:
+                return other.to_list()
+        else:
+            # other - не матрица - вызываем исключение
+            raise Exception(f"{other} - НЕ матрица")
+
+        # Размерности не совпадают
+        dim1 = f'{self.rows}x{self.cols}'
+        dim2 = f'{other.rows if isinstance(other, Matrix) else 1}x{other.cols}'
+        raise Exception(f"неверные размерности матриц {dim1} и {dim2}")
+
+    def __iadd__(self, other):
+        """Сложение на месте, без создания новой матрицы"""
+        arr = self._arr
+        flat = self._other_flat(other)
+        if _is_numeric_ndarray(arr):
+            arr += numpy.asarray(flat, dtype=float)
+            return self
+        for k, x in enumerate(flat):
+            arr[k] += x
+        return self
+
+    def __isub__(self, other):
+        """Вычитание на месте, без создания новой матрицы"""
+        arr = self._arr
+        flat = self._other_flat(other)
+        if _is_numeric_ndarray(arr):
+            arr -= numpy.asarray(flat, dtype=float)
+            return self
+        for k, x in enumerate(flat):
+            arr[k] -= x
+        return self
+
+    def __imul__(self, other):
+        """
+        Умножение на число на месте, без создания новой матрицы
+        Умножение на матрицу меняет размерность, поэтому
+        в этом случае возвращается новая матрица
+        """
+        if isinstance(other, (Matrix, RowAccess)):
+            return self * other
+        arr = self._arr
+        if _is_numeric_ndarray(arr):
+            arr *= other
+            return self
+        for k in range(len(arr)):
+            arr[k] *= other
+        return self
+
+    def __itruediv__(self, other):
+        """Деление на число на месте, без создания новой матрицы"""
+        arr = self._arr
+        if _is_numeric_ndarray(arr):
+            arr /= other
+            return self
+        for k in range(len(arr)):
+            arr[k] /= other
+        return self
 
     def __eq__(self, other):
         """Переопределение операции сравнения =="""
@@ -570,9 +904,12 @@ class Matrix:
             # Если не равны размерности, то и сравнивать элементы не нужно
             if not is_dim:
                 return False
+            elif _is_numeric_ndarray(self._arr) and _is_numeric_ndarray(other._arr):
+                # Оба массива numpy - сравниваем средствами numpy
+                return bool(numpy.array_equal(self._arr, other._arr))
             else:
-                # Сравниваем элементы
-                return self._arr == other._arr
+                # Сравниваем элементы (хранилища могут быть разных типов)
+                return list(self._arr) == list(other._arr)
         elif isinstance(other, RowAccess):
             # У матриц должны быть равны элементы и размерности
             # Равны ли размерности
@@ -584,7 +921,7 @@ class Matrix:
                 # Получаем значение элементов в строке other
                 row = [other.m[other.i_row, j] for j in range(other.cols)]
                 # Сравниваем элементы
-                return self._arr == row
+                return list(self._arr) == row
         else:
             # other - не матрица - вызываем исключение
             raise Exception(f"{other} - НЕ матрица")
@@ -611,6 +948,10 @@ class Matrix:
 
     def transpose(self):
         """Транспонировать матрицу"""
+        # В numpy транспонируем двухмерное представление
+        if _storage_of(self._arr) == 'numpy':
+            return Matrix._from_flat(self.cols, self.rows, self._nd().T.ravel())
+
         # Создаём матрицу заготовку
         m = Matrix(rows=self.cols, cols=self.rows)
         # Обходим столбцы исходной матрицы
@@ -623,8 +964,70 @@ class Matrix:
         # Возвращаем транспонированную матрицу
         return m
 
+    def submatrix(self, index):
+        """
+        Главная подматрица: строки и столбцы с номерами из index
+        (по возрастанию), например свободные степени свободы
+        """
+        if _storage_of(self._arr) == 'numpy':
+            index = numpy.asarray(index)
+            return Matrix._from_flat(len(index), len(index),
+                                     self._nd()[numpy.ix_(index, index)].ravel())
+        arr, cols = self._arr, self.cols
+        values = [arr[i*cols + j] for i in index for j in index]
+        m = Matrix(size=len(index), filler=0)
+        m.set_flat(slice(None), values)
+        return m
+
+    def diagonal(self):
+        """Список диагональных элементов"""
+        return [self._arr[i*self.cols + i] for i in range(min(self.rows, self.cols))]
+
+    def matvec(self, x):
+        """
+        Умножить матрицу на вектор
+        x : последовательность из cols чисел
+        Возвращает список из rows чисел
+        """
+        if _is_numeric_ndarray(self._arr):
+            return (self._nd() @ numpy.asarray(x, dtype=float)).tolist()
+        arr, cols = self._arr, self.cols
+        res = [0]*self.rows
+        for i in range(self.rows):
+            s = 0
+            for j in range(cols):
+                s += arr[i*cols + j]*x[j]
+            res[i] = s
+        return res
+
+    def constrain(self, i):
+        """
+        Метод Пиана-Айронса в i-ой строке и i-ом столбце:
+        строка и столбец нулевые, на диагонали единица
+        У плотной матрицы это O(n) - вся строка и весь столбец
+        """
+        if _storage_of(self._arr) == 'numpy':
+            nd = self._nd()
+            nd[i, :] = 0
+            nd[:, i] = 0
+            nd[i, i] = 1
+            return
+        cols = self.cols
+        for j in range(cols):
+            self._store(i*cols + j, 0)
+        for j in range(self.rows):
+            self._store(j*cols + i, 0)
+        self._store(i*cols + i, 1)
+
     def to_list(self):
         """Привести матрицу к виду списка"""
+        # В numpy список собирает сам ndarray
+        if _storage_of(self._arr) == 'numpy':
+            # Двухмерный список только если и строк и столбцов больше одного
+            if self.rows > 1 and self.cols > 1:
+                return self._nd().tolist()
+            return self._arr.tolist()
+
         # Заготовка под список
         l = []
         # Если строк больне одной
@@ -649,15 +1052,761 @@ class Matrix:
         return l
 
 
+class SparseRowAccess(RowAccess):
+    """Доступ к строкам разреженной матрицы"""
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        """Операция взятия индекса row[index]"""
+        # У разреженной матрицы нет плоского массива,
+        # поэтому обращаемся к элементу по двум индексам
+        index = self.valid_index(index) - self.i_row*self.cols
+        return self.m[self.i_row, index]
+
+    def __setitem__(self, index, value):
+        """Задать элемент строки разреженной матрицы"""
+        index = self.valid_index(index) - self.i_row*self.cols
+        self.m[self.i_row, index] = value
+
+
+class SparseMatrix:
+    """
+    Разреженная матрица
+    Хранит только ненулевые элементы:
+    сборка идёт в формате COO (тройки строка, столбец, значение),
+    а арифметика - в формате CSR (сжатые строки)
+    """
+
+    def __init__(self, arr=None, *, to_row=False, size=None, rows=None, cols=None):
+        """
+        Принимает те же параметры, что и Matrix, кроме заполнителя
+        (заполнитель у разреженной матрицы всегда 0)
+        """
+        # Если передали массив - размерности берём у плотной матрицы
+        dense = Matrix(arr, to_row=to_row) if arr else None
+        if dense is not None:
+            self._rows = dense.rows
+            self._cols = dense.cols
+        # Квадратная матрица
+        elif size:
+            self._rows = size
+            self._cols = size
+        # Матрица столбец, строка или прямоугольная матрица
+        elif rows or cols:
+            self._rows = rows if rows else 1
+            self._cols = cols if cols else 1
+        else:
+            # Не было указано ничего говорим об ошибке
+            raise Exception("Не было пердано ни кол-во СТРОК, ни СТОЛБЦОВ")
+
+        # Несжатые тройки (COO) - сюда добавляются элементы при сборке
+        # Повторяющиеся позиции при сжатии складываются
+        self._coo_rows = []
+        self._coo_cols = []
+        self._coo_vals = []
+        # Сжатые строки (CSR):
+        # элементы i-ой строки лежат в позициях indptr[i]..indptr[i+1]
+        self._indptr = [0]*(self._rows + 1)
+        # Номера столбцов хранимых элементов
+        self._indices = []
+        # Значения хранимых элементов
+        self._data = []
+
+        # Переносим ненулевые элементы плотной матрицы
+        if dense is not None:
+            for i in range(dense.rows):
+                for j in range(dense.cols):
+                    if dense[i, j] != 0:
+                        self.add(i, j, dense[i, j])
+
+    @staticmethod
+    def from_coo(shape, rows, cols, vals):
+        """
+        Собрать разреженную матрицу из троек
+        shape : (количество строк, количество столбцов)
+        rows  : номера строк элементов
+        cols  : номера столбцов элементов
+        vals  : значения элементов, повторы складываются
+        """
+        m = SparseMatrix(rows=shape[0], cols=shape[1])
+        m._coo_rows = list(rows)
+        m._coo_cols = list(cols)
+        m._coo_vals = list(vals)
+        return m
+
+    @staticmethod
+    def from_csr(shape, indptr, indices, data):
+        """
+        Разреженная матрица из готовых сжатых строк (без проверок)
+        shape   : (количество строк, количество столбцов)
+        indptr  : начала строк в indices и data, длина rows + 1
+        indices : номера столбцов, по возрастанию внутри строки
+        data    : значения элементов
+        """
+        m = SparseMatrix(rows=shape[0], cols=shape[1])
+        m._indptr = list(indptr)
+        m._indices = list(indices)
+        m._data = list(data)
+        return m
+
+    @property
+    def rows(self):
+        """Количество строк матрицы"""
+        return self._rows
+
+    @property
+    def cols(self):
+        """Количество столбцов матрицы"""
+        return self._cols
+
+    @property
+    def size(self):
+        """Размерность матрицы"""
+        # Данное свойство есть только когда матрица квадратная
+        if self.cols == self.rows:
+            return self.cols
+        else:
+            # Столбцы и строки не равны, вызываем исключения
+            raise AttributeError("rows != cols")
+
+    @property
+    def nnz(self):
+        """Количество хранимых элементов"""
+        self._compress()
+        return len(self._data)
+
+    def __len__(self):
+        """Количество элементов в матрице"""
+        return self.rows*self.cols
+
+    def _compress(self):
+        """Перенести несжатые тройки в сжатые строки"""
+        # Если новых троек нет, то и делать ничего не надо
+        if not self._coo_vals:
+            return
+
+        # Ключ элемента - его индекс в одномерном представлении матрицы
+        keys = []
+        vals = []
+        # Уже сжатые элементы
+        for i in range(self.rows):
+            for p in range(self._indptr[i], self._indptr[i+1]):
+                keys.append(i*self.cols + self._indices[p])
+                vals.append(self._data[p])
+        # Новые тройки
+        for i, j in zip(self._coo_rows, self._coo_cols):
+            keys.append(i*self.cols + j)
+        vals.extend(self._coo_vals)
+
+        # Сортируем элементы по строкам, а внутри строки по столбцам
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+
+        indptr = [0]*(self.rows + 1)
+        indices = []
+        data = []
+        last = -1
+        for p in order:
+            k = keys[p]
+            if k == last:
+                # Элемент в этой позиции уже есть - складываем
+                data[-1] += vals[p]
+            else:
+                i, j = divmod(k, self.cols)
+                indices.append(j)
+                # Прибавляем к нулю, как и в плотной матрице,
+                # чтобы не хранить "отрицательный ноль"
+                data.append(0 + vals[p])
+                indptr[i+1] += 1
+                last = k
+
+        # Превращаем количество элементов в строках в указатели
+        for i in range(self.rows):
+            indptr[i+1] += indptr[i]
+
+        self._indptr = indptr
+        self._indices = indices
+        self._data = data
+        self._coo_rows = []
+        self._coo_cols = []
+        self._coo_vals = []
+
+    def _find(self, i_row, i_col):
+        """Позиция элемента в сжатых строках или -1"""
+        lo = self._indptr[i_row]
+        hi = self._indptr[i_row+1]
+        p = bisect_left(self._indices, i_col, lo, hi)
+        if p < hi and self._indices[p] == i_col:
+            return p
+        return -1
+
+    def __valid_two(self, i_row, i_col):
+        """Валидация двух индексов"""
+        # Если индексы отрицательные, то приводим их к правильному виду:
+        if i_row < 0:
+            i_row = self.rows + i_row
+        if i_col < 0:
+            i_col = self.cols + i_col
+
+        # Они не должны выходить за пределы
+        if not(0 <= i_row < self.rows):
+            raise IndexError(f"Bad row={i_row} not in [0, {self.rows-1}]")
+        if not(0 <= i_col < self.cols):
+            raise IndexError(f"Bad col={i_col} not in [0, {self.cols-1}]")
+
+        return i_row, i_col
+
+    def __valid_one(self, index):
+        """Превратить один индекс в два"""
+        # Одномерная матрица - индекс элемента
+        if self.cols == 1:
+            return self.__valid_two(index, 0)
+        if self.rows == 1:
+            return self.__valid_two(0, index)
+        # Двухмерная - индекс строки
+        return self.__valid_two(index, 0)[0], None
+
+    def __getitem__(self, coords):
+        """Получение элемента матрицы"""
+        if isinstance(coords, tuple):
+            i_row, i_col = self.__valid_two(coords[0], coords[1])
+        else:
+            i_row, i_col = self.__valid_one(coords)
+            # Для двухмерной матрицы возвращаем строку
+            if i_col is None:
+                return SparseRowAccess(m=self, i_row=i_row)
+
+        self._compress()
+        p = self._find(i_row, i_col)
+        # Не хранимый элемент - это ноль
+        return self._data[p] if p >= 0 else 0
+
+    def __setitem__(self, coords, value):
+        """Задать элемент матрицы"""
+        if isinstance(coords, tuple):
+            i_row, i_col = self.__valid_two(coords[0], coords[1])
+        else:
+            i_row, i_col = self.__valid_one(coords)
+            # Для двухмерной матрицы присваиваем строку
+            if i_col is None:
+                if value.cols != self.cols:
+                    # Рразмерности "строк" не совпадают
+                    dim1 = f'1x{self.cols}'
+                    dim2 = f'1x{value.cols}'
+                    raise Exception(f'Передано {dim2}, а нужно {dim1}')
+                # Сначала забираем значения, ведь value может
+                # оказаться строкой этой же матрицы
+                row = value.to_list()
+                for j in range(self.cols):
+                    self[i_row, j] = row[j]
+                return
+
+        self._compress()
+        p = self._find(i_row, i_col)
+        if p >= 0:
+            # Элемент уже хранится - просто меняем его
+            self._data[p] = value
+        elif value != 0:
+            # Новый ненулевой элемент добавляем как тройку
+            self.add(i_row, i_col, value)
+
+    def add(self, i_row, i_col, value):
+        """
+        Прибавить value к элементу [i_row, i_col]
+        Без проверки индексов - для быстрой сборки
+        """
+        self._coo_rows.append(i_row)
+        self._coo_cols.append(i_col)
+        self._coo_vals.append(value)
+
+    def resize(self, rows, cols):
+        """
+        Увеличить размеры матрицы, новые строки и столбцы нулевые
+        Уменьшать матрицу нельзя
+        """
+        if rows < self._rows or cols < self._cols:
+            raise Exception(f'Нельзя уменьшить матрицу {self._rows}x{self._cols} до {rows}x{cols}')
+        self._compress()
+        self._indptr.extend([self._indptr[-1]]*(rows - self._rows))
+        self._rows = rows
+        self._cols = cols
+
+    def items(self):
+        """Хранимые элементы в виде троек (строка, столбец, значение)"""
+        self._compress()
+        for i in range(self.rows):
+            for p in range(self._indptr[i], self._indptr[i+1]):
+                yield i, self._indices[p], self._data[p]
+
+    def copy(self):
+        """Копия матрицы"""
+        self._compress()
+        m = SparseMatrix(rows=self.rows, cols=self.cols)
+        m._indptr = self._indptr[:]
+        m._indices = self._indices[:]
+        m._data = self._data[:]
+        return m
+
+    def to_dense(self):
+        """Плотная матрица Matrix с теми же элементами"""
+        m = Matrix(rows=self.rows, cols=self.cols, filler=0)
+        for i, j, value in self.items():
+            m[i, j] = value
+        return m
+
+    def to_skyline(self):
+        """
+        Профильная матрица SkylineMatrix по верхнему треугольнику
+        (матрица должна быть симметричной), за O(ненулевых элементов)
+        """
+        if self.rows != self.cols:
+            raise Exception(f'Профильной может быть только квадратная матрица, а не {self.rows}x{self.cols}')
+        first = list(range(self.rows))
+        upper = [(i, j, value) for i, j, value in self.items() if i <= j and value != 0]
+        for i, j, _ in upper:
+            if i < first[j]:
+                first[j] = i
+        m = SkylineMatrix(first)
+        for i, j, value in upper:
+            m[i, j] = value
+        return m
+
+    def to_list(self):
+        """Привести матрицу к виду списка"""
+        return self.to_dense().to_list()
+
+    def submatrix(self, index):
+        """
+        Главная подматрица: строки и столбцы с номерами из index
+        (по возрастанию), за O(ненулевых элементов)
+        """
+        self._compress()
+        # Новый номер каждого старого столбца, -1 - столбец выброшен
+        new = [-1]*self.cols
+        for k, j in enumerate(index):
+            new[j] = k
+        indptr, indices, data = [0], [], []
+        for i in index:
+            for p in range(self._indptr[i], self._indptr[i+1]):
+                k = new[self._indices[p]]
+                if k >= 0:
+                    indices.append(k)
+                    data.append(self._data[p])
+            indptr.append(len(indices))
+        return SparseMatrix.from_csr((len(index), len(index)), indptr, indices, data)
+
+    def transpose(self):
+        """Транспонировать матрицу"""
+        rows, cols, vals = [], [], []
+        for i, j, value in self.items():
+            rows.append(j)
+            cols.append(i)
+            vals.append(value)
+        return SparseMatrix.from_coo((self.cols, self.rows), rows, cols, vals)
+
+    def diagonal(self):
+        """Список диагональных элементов"""
+        return [self[i, i] for i in range(min(self.rows, self.cols))]
+
+    def constrain(self, i):
+        """
+        Метод Пиана-Айронса в i-ой строке и i-ом столбце:
+        строка и столбец нулевые, на диагонали единица
+        Структура ненулевых элементов считается симметричной (как у
+        матрицы жёсткости), поэтому элементы столбца ищутся только
+        напротив хранимых элементов строки - O(nnz строки * log)
+        """
+        self._compress()
+        for p in range(self._indptr[i], self._indptr[i+1]):
+            j = self._indices[p]
+            self._data[p] = 0
+            if j != i:
+                q = self._find(j, i)
+                if q >= 0:
+                    self._data[q] = 0
+        self[i, i] = 1
+
+    def matvec(self, x):
+        """
+        Умножить матрицу на вектор
+        x : последовательность из cols чисел
+        Возвращает список из rows чисел
+        """
+        self._compress()
+        indptr, indices, data = self._indptr, self._indices, self._data
+        res = [0]*self.rows
+        for i in range(self.rows):
+            s = 0
+            for p in range(indptr[i], indptr[i+1]):
+                s += data[p]*x[indices[p]]
+            res[i] = s
+        return res
+
+    def __round__(self, ndigits=None):
+        """Округлить хранимые элементы матрицы"""
+        m = self.copy()
+        m._data = [round(value, ndigits) for value in m._data]
+        return m
+
+    def __neg__(self):
+        """Переопределение операции унарного минуса"""
+        return self * (-1)
+
+    def __mul__(self, other):
+        """Операция умножения"""
+        if isinstance(other, (Matrix, SparseMatrix)):
+            # Количество столбцов первой должно быть равно
+            # количеству строк второй
+            if self.cols != other.rows:
+                dim1 = f'{self.rows}x{self.cols}'
+                dim2 = f'{other.rows}x{other.cols}'
+                raise Exception(f"неверные размерности матриц {dim1} и {dim2}")
+
+        if isinstance(other, SparseMatrix):
+            # Произведение разреженных матриц - тоже разреженная матрица
+            # Собираем каждую строку результата в словаре
+            other._compress()
+            rows, cols, vals = [], [], []
+            for i in range(self.rows):
+                row = {}
+                for k, a in self.__row_items(i):
+                    for j, b in other.__row_items(k):
+                        row[j] = row.get(j, 0) + a*b
+                for j, value in row.items():
+                    rows.append(i)
+                    cols.append(j)
+                    vals.append(value)
+            return SparseMatrix.from_coo((self.rows, other.cols), rows, cols, vals)
+        elif isinstance(other, Matrix):
+            # Произведение на плотную матрицу - плотная матрица
+            m = Matrix(rows=self.rows, cols=other.cols, filler=0)
+            # Умножаем по столбцам второй матрицы
+            for j in range(other.cols):
+                col = self.matvec([other[k, j] for k in range(other.rows)])
+                for i in range(m.rows):
+                    m[i, j] = col[i]
+            return m
+        else:
+            # other - это число, умножаем только хранимые элементы
+            m = self.copy()
+            m._data = [value*other for value in m._data]
+            return m
+
+    def __row_items(self, i_row):
+        """Пары (столбец, значение) i-ой строки"""
+        self._compress()
+        for p in range(self._indptr[i_row], self._indptr[i_row+1]):
+            yield self._indices[p], self._data[p]
+
+    def __add__(self, other):
+        """Сложение двух матриц"""
+        if not isinstance(other, (Matrix, SparseMatrix)):
+            # other - не матрица - вызываем исключение
+            raise Exception(f"{other} - НЕ матрица")
+        # Если размерности двух матриц не совпадают
+        if self.rows != other.rows or self.cols != other.cols:
+            dim1 = f'{self.rows}x{self.cols}'
+            dim2 = f'{other.rows}x{other.cols}'
+            raise Exception(f"неверные размерности матриц {dim1} и {dim2}")
+
+        if isinstance(other, SparseMatrix):
+            # Складываем тройки, повторы сложатся при сжатии
+            m = self.copy()
+            for i, j, value in other.items():
+                m.add(i, j, value)
+            return m
+        else:
+            # С плотной матрицей результат плотный
+            m = Matrix(other.to_list())
+            for i, j, value in self.items():
+                m[i, j] += value
+            return m
+
+    def __sub__(self, other):
+        """Операция вычитания"""
+        return self + other*(-1)
+
+    def __truediv__(self, other):
+        """Операция деления"""
+        return self * (1/other)
+
+    def __eq__(self, other):
+        """Переопределение операции сравнения =="""
+        if isinstance(other, (Matrix, SparseMatrix)):
+            # Если не равны размерности, то и сравнивать элементы не нужно
+            if self.rows != other.rows or self.cols != other.cols:
+                return False
+            return self.to_list() == other.to_list()
+        else:
+            # other - не матрица - вызываем исключение
+            raise Exception(f"{other} - НЕ матрица")
+
+    def __str__(self):
+        """Строковое представление матрицы"""
+        return str(self.to_dense())
+
+
+class SkylineMatrix:
+    """
+    Симметричная матрица в профильном (skyline) формате
+    Для каждого столбца j хранятся элементы верхнего треугольника
+    от первой ненулевой строки first[j] до диагонали включительно.
+    Для ленточных матриц (цепочки стержней) это O(n*b) памяти,
+    где b - полуширина ленты
+    """
+
+    def __init__(self, first):
+        """
+        first : first[j] - номер первой строки профиля j-го столбца (<= j)
+        """
+        # Размер матрицы
+        self._size = len(first)
+        # Первые строки профиля
+        self._first = list(first)
+        # Начала столбцов в массиве данных, последний элемент - длина массива
+        self._ptr = [0]*(self._size + 1)
+        for j in range(self._size):
+            if not 0 <= self._first[j] <= j:
+                raise Exception(f'Неверное начало профиля столбца {j}: {self._first[j]}')
+            self._ptr[j+1] = self._ptr[j] + j - self._first[j] + 1
+        # Полуширина ленты: дальше неё строка j вправо не заходит
+        self._band = max((j - self._first[j] for j in range(self._size)), default=0)
+        # Элементы профиля по столбцам: A[first[j], j], ..., A[j, j]
+        self._data = array('d', bytes(8*self._ptr[-1]))
+
+    @property
+    def rows(self):
+        """Количество строк матрицы"""
+        return self._size
+
+    @property
+    def cols(self):
+        """Количество столбцов матрицы"""
+        return self._size
+
+    @property
+    def size(self):
+        """Размерность матрицы"""
+        return self._size
+
+    @property
+    def profile(self):
+        """Количество хранимых элементов (профиль матрицы)"""
+        return self._ptr[-1]
+
+    @property
+    def bandwidth(self):
+        """Полуширина ленты - максимальная высота столбца над диагональю"""
+        return self._band
+
+    def __len__(self):
+        """Количество элементов в матрице"""
+        return self._size*self._size
+
+    def _pos(self, i_row, i_col):
+        """Позиция элемента в массиве данных или -1, если он вне профиля"""
+        # Матрица симметрична - храним только верхний треугольник
+        if i_row > i_col:
+            i_row, i_col = i_col, i_row
+        if i_row < self._first[i_col]:
+            return -1
+        return self._ptr[i_col] + i_row - self._first[i_col]
+
+    def __valid_two(self, i_row, i_col):
+        """Валидация двух индексов"""
+        # Если индексы отрицательные, то приводим их к правильному виду:
+        if i_row < 0:
+            i_row = self._size + i_row
+        if i_col < 0:
+            i_col = self._size + i_col
+        if not(0 <= i_row < self._size):
+            raise IndexError(f"Bad row={i_row} not in [0, {self._size-1}]")
+        if not(0 <= i_col < self._size):
+            raise IndexError(f"Bad col={i_col} not in [0, {self._size-1}]")
+        return i_row, i_col
+
+    def __getitem__(self, coords):
+        """Получение элемента матрицы"""
+        # Один индекс - это строка матрицы
+        if not isinstance(coords, tuple):
+            return SparseRowAccess(m=self, i_row=self.__valid_two(coords, 0)[0])
+        p = self._pos(*self.__valid_two(coords[0], coords[1]))
+        # Элемент вне профиля - это ноль
+        return self._data[p] if p >= 0 else 0
+
+    def __setitem__(self, coords, value):
+        """
+        Задать элемент матрицы
+        Из-за симметрии меняется и элемент [j, i]
+        """
+        if not isinstance(coords, tuple):
+            # Присваиваем строку
+            row = value.to_list()
+            i_row = self.__valid_two(coords, 0)[0]
+            for j in range(self._size):
+                self[i_row, j] = row[j]
+            return
+        p = self._pos(*self.__valid_two(coords[0], coords[1]))
+        if p >= 0:
+            self._data[p] = value
+        elif value != 0:
+            # Ненулевой элемент вне профиля хранить негде
+            raise Exception(f'Элемент {coords} вне профиля матрицы')
+
+    def add(self, i_row, i_col, value):
+        """
+        Прибавить value к элементу [i_row, i_col] (и к симметричному ему)
+        Каждую внедиагональную пару нужно добавлять ОДИН раз
+        """
+        p = self._pos(i_row, i_col)
+        if p < 0:
+            raise Exception(f'Элемент ({i_row}, {i_col}) вне профиля матрицы')
+        self._data[p] += value
+
+    def items(self):
+        """Хранимые элементы (оба треугольника) в виде троек"""
+        for j in range(self._size):
+            for i in range(self._first[j], j+1):
+                value = self._data[self._ptr[j] + i - self._first[j]]
+                yield i, j, value
+                if i != j:
+                    yield j, i, value
+
+    def copy(self):
+        """Копия матрицы"""
+        m = SkylineMatrix.__new__(SkylineMatrix)
+        m._size = self._size
+        m._first = self._first[:]
+        m._ptr = self._ptr[:]
+        m._band = self._band
+        m._data = array('d', self._data)
+        return m
+
+    def to_dense(self):
+        """Плотная матрица Matrix с теми же элементами"""
+        m = Matrix(size=self._size, filler=0)
+        for i, j, value in self.items():
+            m[i, j] = value
+        return m
+
+    def to_list(self):
+        """Привести матрицу к виду списка"""
+        return self.to_dense().to_list()
+
+    def transpose(self):
+        """Симметричная матрица при транспонировании не меняется"""
+        return self.copy()
+
+    def submatrix(self, index):
+        """
+        Главная подматрица: строки и столбцы с номерами из index
+        (по возрастанию); профиль столбца начинается с первой
+        оставшейся строки старого профиля
+        """
+        first = [bisect_left(index, self._first[j]) for j in index]
+        m = SkylineMatrix(first)
+        for k, j in enumerate(index):
+            # Столбец j старой матрицы: строки index[first[k]..k]
+            start = self._ptr[j] - self._first[j]
+            pos = m._ptr[k]
+            for r in range(first[k], k + 1):
+                m._data[pos] = self._data[start + index[r]]
+                pos += 1
+        return m
+
+    def diagonal(self):
+        """Список диагональных элементов"""
+        return [self._data[self._ptr[j+1] - 1] for j in range(self._size)]
+
+    def constrain(self, i):
+        """
+        Метод Пиана-Айронса в i-ой строке и i-ом столбце:
+        строка и столбец нулевые, на диагонали единица
+        Над диагональю это i-й столбец профиля, справа от неё -
+        столбцы в пределах полуширины ленты, O(b)
+        """
+        data, ptr, first = self._data, self._ptr, self._first
+        for p in range(ptr[i], ptr[i+1] - 1):
+            data[p] = 0
+        data[ptr[i+1] - 1] = 1
+        for j in range(i + 1, min(self._size, i + self._band + 1)):
+            if first[j] <= i:
+                data[ptr[j] + i - first[j]] = 0
+
+    def matvec(self, x):
+        """
+        Умножить матрицу на вектор
+        x : последовательность из size чисел
+        Возвращает список из size чисел
+        """
+        res = [0]*self._size
+        data, ptr, first = self._data, self._ptr, self._first
+        for j in range(self._size):
+            f = first[j]
+            x_j = x[j]
+            # Столбец над диагональю участвует дважды:
+            # как столбец j и как строка j
+            s = 0
+            for t, a in enumerate(data[ptr[j]:ptr[j+1] - 1]):
+                s += a*x[f + t]
+                res[f + t] += a*x_j
+            res[j] += s + data[ptr[j+1] - 1]*x_j
+        return res
+
+    def __round__(self, ndigits=None):
+        """Округлить хранимые элементы матрицы"""
+        m = self.copy()
+        m._data = array('d', [round(value, ndigits) for value in m._data])
+        return m
+
+    def __mul__(self, other):
+        """Операция умножения"""
+        if isinstance(other, Matrix):
+            if self._size != other.rows:
+                dim1 = f'{self._size}x{self._size}'
+                dim2 = f'{other.rows}x{other.cols}'
+                raise Exception(f"неверные размерности матриц {dim1} и {dim2}")
+            # Умножаем по столбцам второй матрицы
+            m = Matrix(rows=self._size, cols=other.cols, filler=0)
+            for j in range(other.cols):
+                col = self.matvec([other[k, j] for k in range(other.rows)])
+                for i in range(self._size):
+                    m[i, j] = col[i]
+            return m
+        else:
+            # other - это число, умножаем только хранимые элементы
+            m = self.copy()
+            m._data = array('d', [value*other for value in m._data])
+            return m
+
+    def __eq__(self, other):
+        """Переопределение операции сравнения =="""
+        if hasattr(other, 'to_list') and hasattr(other, 'rows'):
+            if self.rows != other.rows or self.cols != other.cols:
+                return False
+            return self.to_list() == other.to_list()
+        else:
+            # other - не матрица - вызываем исключение
+            raise Exception(f"{other} - НЕ матрица")
+
+    def __str__(self):
+        """Строковое представление матрицы"""
+        return str(self.to_dense())
+
+
 def to_valid_diag(A: Matrix, Y: Matrix):
     """Привести систему уравнений A*X=Y к валидному виду"""
     # Чтобы бе проблем в методе Гаусса приводить матрицу к треугольному виду
     # нужно чтобы все диаголнальные элементы матрицы A - были не нулевыми
 
     # Чтобы случайно перезаписать передаваемые матрицу и вектор
-    # Сделаем их локальные копии
-    A = deepcopy(A)
-    Y = deepcopy(Y)
+    # Сделаем их локальные копии в компактном хранилище array('d')
+    # Разреженную матрицу для исключения Гаусса переводим в плотную
+    # (она и так будет заполняться по ходу исключения)
+    if not isinstance(A, Matrix):
+        A = A.to_dense()
+    A = A.copy(storage='array')
+    Y = Y.copy(storage='array')
 
     # размер матрицы A и столбца Y
     size = len(Y)
@@ -665,18 +1814,20 @@ def to_valid_diag(A: Matrix, Y: Matrix):
     # Обходим диагональные элементы матрицы A
     for i in range(size):
         # Если диагональный элемент матрицы нулевой
-        if A[i, i] == 0:
+        if A.get_flat(i*size + i) == 0:
             # обходим весь i-ый столбец
             for i_non_zero in range(size):
                 # Чтобы найти номер строки в которой
                 # попадётся неннулевой элемент
-                if A[i_non_zero, i] != 0:
+                if A.get_flat(i_non_zero*size + i) != 0:
                     break
             # складываем текущую i-ую строку со строкой, где ненулевой элемент
             # Для матрицы A
-            A[i] += A[i_non_zero]
+            row_i = slice(i*size, (i+1)*size)
+            row_nz = A.get_flat(slice(i_non_zero*size, (i_non_zero+1)*size))
+            A.set_flat(row_i, [a + b for a, b in zip(A.get_flat(row_i), row_nz)])
             # для столбца Y
-            Y[i] += Y[i_non_zero]
+            Y.set_flat(i, Y.get_flat(i) + Y.get_flat(i_non_zero))
 
     # Возвращаем матрицу A и Y, приведённые к валидному виду
     return A, Y
@@ -692,25 +1843,27 @@ def triangulate(A: Matrix, Y: Matrix):
 
     # Перебираем все строки матрицы
     for j in range(size):
-        k = A[j, j]
+        # Левее диагонали в строках ниже j-ой уже стоят нули,
+        # поэтому работаем только с хвостами строк, начиная со столбца j
+        tail_j = slice(j*size + j, (j+1)*size)
+        k = A.get_flat(j*size + j)
         # В j-ой строке A[j, j] - точно НЕ равно 0
         # Делим всю строку на этот коэффициент
-        A[j] /= k
-        Y[j] /= k
+        row_j = [x/k for x in A.get_flat(tail_j)]
+        A.set_flat(tail_j, row_j)
+        y_j = Y.get_flat(j)/k
+        Y.set_flat(j, y_j)
         # Для всех последующих строк
         for i in range(j+1, size):
-            k = A[i, j]
+            k = A.get_flat(i*size + j)
             # Если k = 0 то в нужной позиции уже стоит 0 и ничего делать не надо
             if k != 0:
                 # в i-ой строке делим всю строку на коэффициент стоящий при
                 # елементе A[i, j], чтобы в этой позиции получить 1-у
-                A[i] /= k
-                Y[i] /= k
-
-                # Теперь из i-ой строки вычитаем j-ую строку
-                # Чтобы получить 0 в позиции A[i][j]
-                A[i] -= A[j]
-                Y[i] -= Y[j]
+                # и сразу вычитаем j-ую строку, чтобы получить 0 в позиции A[i][j]
+                tail_i = slice(i*size + j, (i+1)*size)
+                A.set_flat(tail_i, [x/k - y for x, y in zip(A.get_flat(tail_i), row_j)])
+                Y.set_flat(i, Y.get_flat(i)/k - y_j)
 
     # Воазвращаем систему приведённую к треугольному виду
     return A, Y
@@ -721,24 +1874,798 @@ def find_with_gauss(A: Matrix, Y: Matrix):
     Найти решение системы уравнений при помощи метода Гаусса
     A*X=Y -> возвращает вектор столбец X
     """
+    # При бэкенде numpy решаем систему средствами LAPACK
+    if _backend == 'numpy':
+        if not isinstance(A, Matrix):
+            A = A.to_dense()
+        a = numpy.asarray(A.to_list(), dtype=float).reshape(A.rows, A.cols)
+        y = numpy.asarray(Y.to_list(), dtype=float)
+        return Matrix._from_flat(len(Y), 1, numpy.linalg.solve(a, y).ravel())
+
     # Приводим систему к треугольному виду
     A, Y = triangulate(A, Y)
     # размер матрицы A и столбца Y
     size = len(Y)
     # Возвращаемый вектор столбец X, предварительно заполняем его нулями
-    X = Matrix(cols=1, rows=size, filler=0)
+    X = Matrix(cols=1, rows=size, filler=0, storage='array')
     # Начиная с последней строки, двигаясь вверх собираем вектор X
     for i in range(size-1, -1, -1):
         # Временная переменная для хранения значения i-го элемента столбца X
         # Сразу записываем туда элемент Y[i], т.к. в матрице A элемент A[i][i] = 1
-        temp = Y[i]
+        temp = Y.get_flat(i)
         # Проходим все оставшиеся столбцы в строке
-        for j in range(i+1, size):
+        row = A.get_flat(slice(i*size + i + 1, (i+1)*size))
+        for a, x in zip(row, X.get_flat(slice(i+1, size))):
             # Раскрываем линейную последовательность
-            temp -= A[i, j]*X[j]
+            temp -= a*x
 
         # Записываем i-ый элемент массива X
-        X[i] = temp
+        X.set_flat(i, temp)
 
     # Возвращаем искомый вектор столбец X
     return X
+
+
+class LUFactor:
+    """
+    LU-разложение квадратной матрицы с частичным выбором ведущего элемента
+    P*A = L*U, где L - нижняя треугольная с единицами на диагонали,
+    U - верхняя треугольная. Обе хранятся в одной плотной матрице.
+    Разложение делается один раз, а решать систему A*X=Y
+    можно сколько угодно раз для разных Y за O(n^2)
+    """
+
+    def __init__(self, A, overwrite=False):
+        """
+        A         : квадратная матрица (Matrix, SparseMatrix, SkylineMatrix)
+        overwrite : разложить прямо в хранилище A (A будет испорчена),
+                    иначе разложение делается в копии
+        """
+        if A.rows != A.cols:
+            raise Exception(f'Матрица {A.rows}x{A.cols} не квадратная')
+        # Разреженную матрицу всё равно переводим в плотную
+        if not isinstance(A, Matrix):
+            A = A.to_dense()
+            overwrite = True
+        # Копия в компактном хранилище, в ней и будем раскладывать
+        if not overwrite:
+            A = A.copy(storage='numpy' if _backend == 'numpy' else 'array')
+
+        # Размер системы
+        self.size = A.rows
+        # Матрица, в которой лежат L (под диагональю) и U
+        self._lu = A
+        # Перестановка строк: i-ая строка разложения - это perm[i]-ая строка A
+        self._perm = list(range(self.size))
+
+        # Раскладываем
+        if _is_numeric_ndarray(A._arr):
+            self._factor_numpy()
+        else:
+            self._factor_python()
+
+    def _factor_python(self):
+        """Разложение на чистом python"""
+        n = self.size
+        lu = self._lu
+        perm = self._perm
+        for k in range(n):
+            # Ищем в k-ом столбце ниже диагонали максимальный по модулю элемент
+            col = [abs(lu.get_flat(i*n + k)) for i in range(k, n)]
+            p = k + col.index(max(col))
+            pivot = lu.get_flat(p*n + k)
+            if pivot == 0:
+                raise Exception(f'Матрица вырождена (нулевой столбец {k})')
+
+            # Меняем местами k-ую строку и строку с ведущим элементом
+            if p != k:
+                row_k = slice(k*n, (k+1)*n)
+                row_p = slice(p*n, (p+1)*n)
+                tmp = lu.get_flat(row_k)
+                lu.set_flat(row_k, lu.get_flat(row_p))
+                lu.set_flat(row_p, tmp)
+                perm[k], perm[p] = perm[p], perm[k]
+
+            # Хвост k-ой строки правее диагонали
+            tail_k = lu.get_flat(slice(k*n + k + 1, (k+1)*n))
+            # Исключаем k-ый столбец из всех нижних строк
+            for i in range(k+1, n):
+                a_ik = lu.get_flat(i*n + k)
+                # Если там и так ноль - строку не трогаем
+                if a_ik != 0:
+                    # Множитель сохраняем на месте исключённого элемента (это L)
+                    l_ik = a_ik/pivot
+                    lu.set_flat(i*n + k, l_ik)
+                    tail_i = slice(i*n + k + 1, (i+1)*n)
+                    lu.set_flat(tail_i, [x - l_ik*y for x, y in zip(lu.get_flat(tail_i), tail_k)])
+
+    def _factor_numpy(self):
+        """Разложение средствами numpy"""
+        a = self._lu._nd()
+        perm = self._perm
+        for k in range(self.size):
+            # Ищем в k-ом столбце ниже диагонали максимальный по модулю элемент
+            p = k + int(numpy.argmax(numpy.abs(a[k:, k])))
+            if a[p, k] == 0:
+                raise Exception(f'Матрица вырождена (нулевой столбец {k})')
+            # Меняем местами k-ую строку и строку с ведущим элементом
+            if p != k:
+                a[[k, p]] = a[[p, k]]
+                perm[k], perm[p] = perm[p], perm[k]
+            # Множители L и обновление оставшейся подматрицы
+            a[k+1:, k] /= a[k, k]
+            a[k+1:, k+1:] -= numpy.outer(a[k+1:, k], a[k, k+1:])
+
+    def _solve_python(self, b):
+        """Решить систему для одной правой части b (список)"""
+        n = self.size
+        lu = self._lu
+        # Переставляем правую часть так же, как строки матрицы
+        y = [b[p] for p in self._perm]
+        # Прямой ход L*Z = P*Y (на диагонали L стоят единицы)
+        for i in range(n):
+            temp = y[i]
+            for l_ik, z in zip(lu.get_flat(slice(i*n, i*n + i)), y):
+                temp -= l_ik*z
+            y[i] = temp
+        # Обратный ход U*X = Z
+        for i in range(n-1, -1, -1):
+            temp = y[i]
+            for u_ij, x in zip(lu.get_flat(slice(i*n + i + 1, (i+1)*n)), y[i+1:]):
+                temp -= u_ij*x
+            y[i] = temp/lu.get_flat(i*n + i)
+        return y
+
+    def _solve_numpy(self, b):
+        """Решить систему для правых частей b (столбец или n x m ndarray)"""
+        a = self._lu._nd()
+        y = numpy.array(b, dtype=float)[self._perm]
+        # Прямой ход L*Z = P*Y
+        for i in range(1, self.size):
+            y[i] -= a[i, :i] @ y[:i]
+        # Обратный ход U*X = Z
+        for i in range(self.size-1, -1, -1):
+            y[i] = (y[i] - a[i, i+1:] @ y[i+1:])/a[i, i]
+        return y
+
+    def solve(self, b):
+        """
+        Решить систему A*X=b
+        b : вектор столбец (Matrix) или список из size чисел
+        Возвращает вектор столбец X
+        """
+        b = b.to_list() if isinstance(b, Matrix) else list(b)
+        if len(b) != self.size:
+            raise Exception(f'Длина правой части {len(b)}, а нужно {self.size}')
+        if _is_numeric_ndarray(self._lu._arr):
+            return Matrix._from_flat(self.size, 1, self._solve_numpy(b))
+        return Matrix._from_flat(self.size, 1, array('d', self._solve_python(b)))
+
+    def solve_many(self, B):
+        """
+        Решить системы A*X=B сразу для нескольких правых частей
+        B : матрица size x m, каждый столбец - отдельная правая часть
+        Возвращает матрицу X размером size x m
+        """
+        if B.rows != self.size:
+            raise Exception(f'В правой части {B.rows} строк, а нужно {self.size}')
+        if _is_numeric_ndarray(self._lu._arr):
+            b = numpy.array(B.to_list(), dtype=float).reshape(B.rows, B.cols)
+            return Matrix._from_flat(B.rows, B.cols, self._solve_numpy(b).ravel())
+
+        # Решаем по столбцам и собираем результат
+        X = Matrix(rows=B.rows, cols=B.cols, filler=0, storage='array')
+        flat = B.get_flat(slice(None))
+        for j in range(B.cols):
+            X.set_flat(slice(j, None, B.cols), self._solve_python(list(flat[j::B.cols])))
+        return X
+
+
+def lu_factor(A, overwrite=False):
+    """
+    LU-разложение матрицы A с частичным выбором ведущего элемента
+    Возвращает объект LUFactor с методами solve(b) и solve_many(B)
+    """
+    return LUFactor(A, overwrite=overwrite)
+
+
+def is_symmetric(A, tol=0):
+    """
+    Является ли квадратная матрица A симметричной
+    tol : допустимая разница между A[i, j] и A[j, i]
+    """
+    if A.rows != A.cols:
+        return False
+    if isinstance(A, SkylineMatrix):
+        # Профильная матрица симметрична по построению
+        return True
+    if isinstance(A, SparseMatrix):
+        # Сравниваем хранимые элементы с транспонированными
+        upper = {}
+        lower = {}
+        for i, j, value in A.items():
+            if j > i:
+                upper[i, j] = value
+            elif j < i:
+                lower[j, i] = value
+        for key in upper.keys() | lower.keys():
+            if abs(upper.get(key, 0) - lower.get(key, 0)) > tol:
+                return False
+        return True
+    if _is_numeric_ndarray(A._arr):
+        a = A._nd()
+        return bool(numpy.all(numpy.abs(a - a.T) <= tol))
+    # Плотная матрица - сравниваем элементы над и под диагональю
+    n = A.rows
+    for i in range(n):
+        for j in range(i+1, n):
+            if abs(A.get_flat(i*n + j) - A.get_flat(j*n + i)) > tol:
+                return False
+    return True
+
+
+class LDLFactor:
+    """
+    Разложение симметричной матрицы A = U^T*D*U, где U - верхняя
+    треугольная с единицами на диагонали, D - диагональная.
+    Читается ТОЛЬКО верхний треугольник A, он же хранится
+    в упакованном виде (n*(n+1)/2 чисел), поэтому памяти и операций
+    примерно вдвое меньше, чем у LU-разложения.
+    На бэкенде numpy - то же разложение, но строки исключаются
+    векторно, поэтому знаконеопределённые матрицы раскладываются
+    на обоих бэкендах одинаково.
+    """
+
+    def __init__(self, A):
+        """A : симметричная квадратная матрица (Matrix, SparseMatrix, SkylineMatrix)"""
+        if A.rows != A.cols:
+            raise Exception(f'Матрица {A.rows}x{A.cols} не квадратная')
+        # Размер системы
+        self.size = A.rows
+        # Множитель U и диагональ D (только для бэкенда numpy)
+        self._U = None
+        self._d = None
+        # Упакованный верхний треугольник: строка i начинается с A[i, i]
+        self._packed = None
+        # Начало каждой строки в упакованном массиве
+        self._offsets = [i*self.size - i*(i-1)//2 for i in range(self.size)]
+
+        if _backend == 'numpy':
+            self._factor_numpy(A)
+        else:
+            self._pack(A)
+            self._factor_python()
+
+    def _pack(self, A):
+        """Упаковать верхний треугольник A"""
+        n = self.size
+        off = self._offsets
+        packed = array('d', bytes(8*(n*(n+1)//2)))
+        if not isinstance(A, Matrix):
+            # Берём только хранимые элементы на и над диагональю
+            for i, j, value in A.items():
+                if j >= i:
+                    packed[off[i] + j - i] = value
+        else:
+            for i in range(n):
+                packed[off[i]:off[i] + n - i] = array('d', A.get_flat(slice(i*n + i, (i+1)*n)))
+        self._packed = packed
+
+    def _factor_python(self):
+        """Разложение на чистом python"""
+        n = self.size
+        a = self._packed
+        off = self._offsets
+        for k in range(n):
+            d = a[off[k]]
+            # Без выбора ведущего элемента нулевой элемент на диагонали - тупик
+            if d == 0:
+                raise Exception(f'Нулевой ведущий элемент в строке {k}, нужно LU-разложение')
+            # Хвост k-ой строки правее диагонали - это A[k, j] = A[j, k]
+            row_k = slice(off[k] + 1, off[k] + n - k)
+            tail_k = a[row_k]
+            # Исключаем k-ую строку из нижних строк, меняя только их
+            # элементы на и правее диагонали
+            for t, a_ki in enumerate(tail_k):
+                if a_ki != 0:
+                    i = k + 1 + t
+                    l_ik = a_ki/d
+                    row_i = slice(off[i], off[i] + n - i)
+                    a[row_i] = array('d', [x - l_ik*y for x, y in zip(a[row_i], tail_k[t:])])
+            # Строка U: делим хвост на диагональный элемент
+            a[row_k] = array('d', [y/d for y in tail_k])
+
+    def _factor_numpy(self, A):
+        """Разложение средствами numpy: те же шаги, что и на чистом python"""
+        n = self.size
+        # Как и на чистом python, берём только верхний треугольник
+        a = numpy.triu(numpy.asarray(A.to_list(), dtype=float).reshape(n, n))
+        d = numpy.empty(n)
+        for k in range(n):
+            d[k] = a[k, k]
+            # Без выбора ведущего элемента нулевой элемент на диагонали - тупик
+            if d[k] == 0:
+                raise Exception(f'Нулевой ведущий элемент в строке {k}, нужно LU-разложение')
+            # Исключаем k-ую строку из нижних (нужен только их верхний треугольник)
+            tail_k = a[k, k+1:].copy()
+            a[k+1:, k+1:] -= numpy.triu(numpy.outer(tail_k/d[k], tail_k))
+            # Строка U: делим хвост на диагональный элемент
+            a[k, k+1:] = tail_k/d[k]
+        self._U = a
+        self._d = d
+
+    def _solve_python(self, b):
+        """Решить систему для одной правой части b (список)"""
+        n = self.size
+        a = self._packed
+        off = self._offsets
+        z = list(b)
+        # Прямой ход U^T*Z = B: вычитаем строку U, умноженную на готовый z[k]
+        for k in range(n):
+            z_k = z[k]
+            if z_k != 0:
+                for t, u_kj in enumerate(a[off[k] + 1:off[k] + n - k]):
+                    z[k + 1 + t] -= u_kj*z_k
+        # D*Y = Z
+        for k in range(n):
+            z[k] /= a[off[k]]
+        # Обратный ход U*X = Y
+        for i in range(n-1, -1, -1):
+            temp = z[i]
+            for u_ij, x in zip(a[off[i] + 1:off[i] + n - i], z[i+1:]):
+                temp -= u_ij*x
+            z[i] = temp
+        return z
+
+    def _solve_numpy(self, b):
+        """Решить систему для правых частей b (столбец или n x m ndarray)"""
+        U = self._U
+        y = numpy.array(b, dtype=float)
+        # Прямой ход U^T*Z = B
+        for i in range(self.size):
+            y[i] -= U[:i, i] @ y[:i]
+        # D*Y = Z
+        y = (y.T/self._d).T
+        # Обратный ход U*X = Y
+        for i in range(self.size-1, -1, -1):
+            y[i] -= U[i, i+1:] @ y[i+1:]
+        return y
+
+    def solve(self, b):
+        """
+        Решить систему A*X=b
+        b : вектор столбец (Matrix) или список из size чисел
+        Возвращает вектор столбец X
+        """
+        b = b.to_list() if isinstance(b, Matrix) else list(b)
+        if len(b) != self.size:
+            raise Exception(f'Длина правой части {len(b)}, а нужно {self.size}')
+        if self._U is not None:
+            return Matrix._from_flat(self.size, 1, self._solve_numpy(b))
+        return Matrix._from_flat(self.size, 1, array('d', self._solve_python(b)))
+
+    def solve_many(self, B):
+        """
+        Решить системы A*X=B сразу для нескольких правых частей
+        B : матрица size x m, каждый столбец - отдельная правая часть
+        Возвращает матрицу X размером size x m
+        """
+        if B.rows != self.size:
+            raise Exception(f'В правой части {B.rows} строк, а нужно {self.size}')
+        if self._U is not None:
+            b = numpy.array(B.to_list(), dtype=float).reshape(B.rows, B.cols)
+            return Matrix._from_flat(B.rows, B.cols, self._solve_numpy(b).ravel())
+
+        # Решаем по столбцам и собираем результат
+        X = Matrix(rows=B.rows, cols=B.cols, filler=0, storage='array')
+        flat = B.get_flat(slice(None))
+        for j in range(B.cols):
+            X.set_flat(slice(j, None, B.cols), self._solve_python(list(flat[j::B.cols])))
+        return X
+
+
+def ldlt_factor(A):
+    """
+    LDL^T-разложение симметричной матрицы A (читается верхний треугольник)
+    Возвращает объект LDLFactor с методами solve(b) и solve_many(B)
+    """
+    return LDLFactor(A)
+
+
+class SkylineFactor:
+    """
+    LDL^T-разложение симметричной матрицы в профильном формате
+    A = U^T*D*U, профиль U совпадает с профилем A, поэтому заполнения
+    вне профиля не происходит: O(n*b^2) операций и O(n*b) памяти
+    """
+
+    def __init__(self, A, overwrite=False):
+        """
+        A         : SkylineMatrix
+        overwrite : разложить прямо в хранилище A (A будет испорчена)
+        """
+        # Копия, в которой раскладываем
+        self._sky = A if overwrite else A.copy()
+        # Размер системы
+        self.size = A.size
+        self._factor()
+
+    def _factor(self):
+        """Разложение по столбцам"""
+        data = self._sky._data
+        ptr = self._sky._ptr
+        first = self._sky._first
+        for j in range(self.size):
+            f_j = first[j]
+            p_j = ptr[j]
+            # 1) g[i, j] = A[i, j] - сумма U[k, i]*g[k, j] по k < i
+            for i in range(f_j + 1, j):
+                f_i = first[i]
+                # Общая часть профилей столбцов i и j
+                k0 = max(f_i, f_j)
+                if k0 < i:
+                    col_i = data[ptr[i] + k0 - f_i:ptr[i] + i - f_i]
+                    col_j = data[p_j + k0 - f_j:p_j + i - f_j]
+                    s = 0
+                    for u, g in zip(col_i, col_j):
+                        s += u*g
+                    data[p_j + i - f_j] -= s
+            # 2) U[i, j] = g[i, j]/d[i] и d[j] = A[j, j] - сумма U[i, j]*g[i, j]
+            d_j = data[ptr[j+1] - 1]
+            for i in range(f_j, j):
+                g = data[p_j + i - f_j]
+                u = g/data[ptr[i+1] - 1]
+                data[p_j + i - f_j] = u
+                d_j -= u*g
+            if d_j == 0:
+                raise Exception(f'Нулевой ведущий элемент в строке {j}, нужно LU-разложение')
+            data[ptr[j+1] - 1] = d_j
+
+    def _solve_list(self, b):
+        """Решить систему для одной правой части b (список)"""
+        data = self._sky._data
+        ptr = self._sky._ptr
+        first = self._sky._first
+        x = list(b)
+        # Прямой ход U^T*Z = B
+        for j in range(self.size):
+            f_j = first[j]
+            s = 0
+            for u, z in zip(data[ptr[j]:ptr[j+1] - 1], x[f_j:j]):
+                s += u*z
+            x[j] -= s
+        # D*Y = Z
+        for j in range(self.size):
+            x[j] /= data[ptr[j+1] - 1]
+        # Обратный ход U*X = Y: готовый x[j] вычитаем из строк над ним
+        for j in range(self.size-1, -1, -1):
+            f_j = first[j]
+            x_j = x[j]
+            if x_j != 0:
+                for t, u in enumerate(data[ptr[j]:ptr[j+1] - 1]):
+                    x[f_j + t] -= u*x_j
+        return x
+
+    def solve(self, b):
+        """
+        Решить систему A*X=b
+        b : вектор столбец (Matrix) или список из size чисел
+        Возвращает вектор столбец X
+        """
+        b = b.to_list() if isinstance(b, Matrix) else list(b)
+        if len(b) != self.size:
+            raise Exception(f'Длина правой части {len(b)}, а нужно {self.size}')
+        return Matrix._from_flat(self.size, 1, array('d', self._solve_list(b)))
+
+    def solve_many(self, B):
+        """
+        Решить системы A*X=B сразу для нескольких правых частей
+        B : матрица size x m, каждый столбец - отдельная правая часть
+        Возвращает матрицу X размером size x m
+        """
+        if B.rows != self.size:
+            raise Exception(f'В правой части {B.rows} строк, а нужно {self.size}')
+        X = Matrix(rows=B.rows, cols=B.cols, filler=0, storage='array')
+        flat = B.get_flat(slice(None))
+        for j in range(B.cols):
+            X.set_flat(slice(j, None, B.cols), self._solve_list(list(flat[j::B.cols])))
+        return X
+
+
+def skyline_factor(A, overwrite=False):
+    """
+    LDL^T-разложение профильной матрицы A (SkylineMatrix)
+    Возвращает объект SkylineFactor с методами solve(b) и solve_many(B)
+    """
+    return SkylineFactor(A, overwrite=overwrite)
+
+
+def _matvec_of(A):
+    """Функция умножения A на вектор-список"""
+    if hasattr(A, 'matvec'):
+        return A.matvec
+    if isinstance(A, Matrix):
+        return lambda x: (A*Matrix._from_flat(A.cols, 1, list(x))).to_list()
+    raise Exception(f'Нельзя умножить {type(A).__name__} на вектор')
+
+
+def _diagonal_of(A):
+    """Список диагональных элементов A"""
+    if hasattr(A, 'diagonal'):
+        return list(A.diagonal())
+    if isinstance(A, Matrix):
+        return [A[i, i] for i in range(min(A.rows, A.cols))]
+    raise Exception(f'У {type(A).__name__} нет метода diagonal() для предобуславливателя '
+                    f'Якоби, нужен precond=None или другой предобуславливатель')
+
+
+def _rows_of(A):
+    """
+    Строки A в виде словарей {j: A[i, j]} - только ненулевые элементы
+    Нужны предобуславливателям, которые работают с треугольниками A
+    """
+    if hasattr(A, 'items'):
+        items = A.items()
+    elif isinstance(A, Matrix):
+        items = ((i, j, A[i, j]) for i in range(A.rows) for j in range(A.cols))
+    else:
+        raise Exception(f'У {type(A).__name__} нет элементов для предобуславливателя')
+    rows = [{} for _ in range(A.rows)]
+    for i, j, value in items:
+        if value != 0:
+            rows[i][j] = value
+    return rows
+
+
+class JacobiPrecond:
+    """Предобуславливатель Якоби: M = diag(A)"""
+
+    def __init__(self, A):
+        diag = _diagonal_of(A)
+        for i, d in enumerate(diag):
+            if d == 0:
+                raise Exception(f'Нулевой диагональный элемент в строке {i}')
+        # Храним обратные значения - применение без делений
+        self._inv = [1/d for d in diag]
+
+    def solve(self, r):
+        """z = M^-1 * r"""
+        return [w*x for w, x in zip(self._inv, r)]
+
+
+class SSORPrecond:
+    """
+    Симметричный предобуславливатель Гаусса-Зейделя с релаксацией (SSOR)
+    M = (D + w*L) * D^-1 * (D + w*U) / (w*(2 - w)),
+    где A = L + D + U
+    """
+
+    def __init__(self, A, omega=1.0):
+        if not 0 < omega < 2:
+            raise Exception(f'Параметр релаксации {omega} не внутри (0, 2)')
+        rows = _rows_of(A)
+        self.omega = omega
+        # Диагональ и строки нижнего и верхнего треугольников
+        self._diag = [row.get(i, 0) for i, row in enumerate(rows)]
+        for i, d in enumerate(self._diag):
+            if d == 0:
+                raise Exception(f'Нулевой диагональный элемент в строке {i}')
+        self._lower = [[(j, a*omega) for j, a in sorted(row.items()) if j < i]
+                       for i, row in enumerate(rows)]
+        self._upper = [[(j, a*omega) for j, a in sorted(row.items()) if j > i]
+                       for i, row in enumerate(rows)]
+
+    def solve(self, r):
+        """z = M^-1 * r: прямой и обратный ход Гаусса-Зейделя"""
+        n = len(self._diag)
+        diag = self._diag
+        scale = self.omega*(2 - self.omega)
+        # Прямой ход (D + w*L)*y = w*(2 - w)*r
+        y = [0]*n
+        for i in range(n):
+            s = scale*r[i]
+            for j, a in self._lower[i]:
+                s -= a*y[j]
+            y[i] = s/diag[i]
+        # Обратный ход (D + w*U)*z = D*y
+        z = [0]*n
+        for i in range(n-1, -1, -1):
+            s = diag[i]*y[i]
+            for j, a in self._upper[i]:
+                s -= a*z[j]
+            z[i] = s/diag[i]
+        return z
+
+
+class IC0Precond:
+    """
+    Неполное разложение Холецкого без заполнения IC(0) в виде L*D*L^T:
+    L имеет тот же портрет, что и нижний треугольник A
+    """
+
+    def __init__(self, A):
+        rows = _rows_of(A)
+        n = len(rows)
+        # Строки L (без единичной диагонали) и диагональ D
+        self._lower = [{} for _ in range(n)]
+        self._diag = [0]*n
+        for i in range(n):
+            L_i = self._lower[i]
+            for k in sorted(j for j in rows[i] if j < i):
+                # Только общие позиции портрета строк i и k
+                L_k = self._lower[k]
+                s = rows[i][k]
+                for j, l_ij in L_i.items():
+                    l_kj = L_k.get(j)
+                    if l_kj is not None:
+                        s -= l_ij*self._diag[j]*l_kj
+                L_i[k] = s/self._diag[k]
+            d = rows[i].get(i, 0)
+            for k, l_ik in L_i.items():
+                d -= l_ik*l_ik*self._diag[k]
+            if d <= 0:
+                raise Exception(f'Неполное разложение Холецкого не удалось в строке {i}')
+            self._diag[i] = d
+        # Строки в виде списков - так быстрее применять
+        self._lower = [sorted(L_i.items()) for L_i in self._lower]
+
+    def solve(self, r):
+        """z = (L*D*L^T)^-1 * r"""
+        n = len(self._diag)
+        # Прямой ход L*y = r
+        y = list(r)
+        for i in range(n):
+            s = y[i]
+            for k, l_ik in self._lower[i]:
+                s -= l_ik*y[k]
+            y[i] = s
+        # D*w = y
+        for i in range(n):
+            y[i] /= self._diag[i]
+        # Обратный ход L^T*z = w: готовый z[i] вычитаем из строк k < i
+        for i in range(n-1, -1, -1):
+            z_i = y[i]
+            if z_i != 0:
+                for k, l_ik in self._lower[i]:
+                    y[k] -= l_ik*z_i
+        return y
+
+
+PRECONDITIONERS = {'jacobi': JacobiPrecond,
+                   'ssor': SSORPrecond,
+                   'ic0': IC0Precond}
+
+
+def cg_solve(A, b, precond='jacobi', tol=1e-10, maxiter=None, x0=None):
+    """
+    Решить систему A*X=b методом сопряжённых градиентов
+    с предобуславливанием (PCG). A должна быть симметричной
+    и положительно определённой
+        A       : SparseMatrix, SkylineMatrix, Matrix или любой объект
+                  с методом matvec(x) -> список (и diagonal() для Якоби)
+        b       : вектор столбец (Matrix) или список
+        precond : 'jacobi', 'ssor', 'ic0', None
+                  или готовый объект с методом solve(r)
+        tol     : относительная невязка ||b - A*X||/||b||, при которой
+                  итерации прекращаются
+        maxiter : наибольшее число итераций (по умолчанию 10*n)
+        x0      : начальное приближение
+    Возвращает пару (X, info):
+        X    : вектор столбец решения
+        info : {'converged': сошёлся ли метод,
+                'iterations': число итераций,
+                'residuals': история относительных невязок}
+    """
+    b = b.to_list() if isinstance(b, Matrix) else list(b)
+    # Размер берём из правой части: у оператора может быть только matvec
+    n = len(b)
+    rows = getattr(A, 'rows', n)
+    if rows != n:
+        raise Exception(f'Длина правой части {n}, а нужно {rows}')
+    if maxiter is None:
+        maxiter = 10*n
+    matvec = _matvec_of(A)
+
+    # Предобуславливатель
+    if precond is None:
+        M = None
+    elif isinstance(precond, str):
+        if precond not in PRECONDITIONERS:
+            raise Exception(f'Неизвестный предобуславливатель {precond}')
+        M = PRECONDITIONERS[precond](A)
+    else:
+        M = precond
+
+    # Начальное приближение и невязка r = b - A*x
+    if x0 is None:
+        x = [0.0]*n
+        r = list(b)
+    else:
+        x = x0.to_list() if isinstance(x0, Matrix) else [float(v) for v in x0]
+        r = [bi - ai for bi, ai in zip(b, matvec(x))]
+
+    norm_b = sum(v*v for v in b)**0.5
+    # Нулевая правая часть - нулевое решение
+    if norm_b == 0:
+        norm_b = 1
+    residuals = [sum(v*v for v in r)**0.5/norm_b]
+    info = {'converged': residuals[0] <= tol,
+            'iterations': 0,
+            'residuals': residuals}
+
+    z = M.solve(r) if M is not None else list(r)
+    p = list(z)
+    rz = sum(ri*zi for ri, zi in zip(r, z))
+    while not info['converged'] and info['iterations'] < maxiter:
+        Ap = matvec(p)
+        pAp = sum(pi*api for pi, api in zip(p, Ap))
+        if pAp <= 0:
+            raise Exception('Матрица не положительно определена, метод CG неприменим')
+        alpha = rz/pAp
+        for i in range(n):
+            x[i] += alpha*p[i]
+            r[i] -= alpha*Ap[i]
+        info['iterations'] += 1
+        residuals.append(sum(v*v for v in r)**0.5/norm_b)
+        if residuals[-1] <= tol:
+            info['converged'] = True
+            break
+        z = M.solve(r) if M is not None else list(r)
+        rz_new = sum(ri*zi for ri, zi in zip(r, z))
+        beta = rz_new/rz
+        rz = rz_new
+        p = [zi + beta*pi for zi, pi in zip(z, p)]
+
+    return Matrix._from_flat(n, 1, array('d', x)), info
+
+
+class CGSolver:
+    """
+    Итерационный решатель с тем же интерфейсом, что и разложения
+    (solve, solve_many), но без разложения: матрица A не меняется
+    и дополнительно хранится только предобуславливатель
+    """
+
+    def __init__(self, A, precond='jacobi', tol=1e-10, maxiter=None):
+        """Параметры такие же, как у cg_solve"""
+        self.A = A
+        # У оператора может быть только matvec - тогда размер неизвестен
+        self.size = getattr(A, 'rows', None)
+        self.tol = tol
+        self.maxiter = maxiter
+        # Предобуславливатель строим один раз для всех правых частей
+        if isinstance(precond, str):
+            if precond not in PRECONDITIONERS:
+                raise Exception(f'Неизвестный предобуславливатель {precond}')
+            precond = PRECONDITIONERS[precond](A)
+        self.precond = precond
+        # Сведения о сходимости последнего решения
+        self.info = None
+
+    def solve(self, b):
+        """
+        Решить систему A*X=b
+        Если метод не сошёлся за maxiter итераций - исключение,
+        история невязок при этом остаётся в self.info
+        """
+        X, self.info = cg_solve(self.A, b, precond=self.precond,
+                                tol=self.tol, maxiter=self.maxiter)
+        if not self.info['converged']:
+            raise Exception(f'Метод CG не сошёлся за {self.info["iterations"]} итераций, '
+                            f'невязка {self.info["residuals"][-1]:.3e}')
+        return X
+
+    def solve_many(self, B):
+        """Решить системы A*X=B для каждого столбца B"""
+        if self.size is not None and B.rows != self.size:
+            raise Exception(f'В правой части {B.rows} строк, а нужно {self.size}')
+        X = Matrix(rows=B.rows, cols=B.cols, filler=0, storage='array')
+        for j in range(B.cols):
+            col = self.solve([B[i, j] for i in range(B.rows)])
+            for i in range(B.rows):
+                X.set_flat(i*B.cols + j, col.get_flat(i))
+        return X
+
+
+# Бэкенд можно выбрать переменной окружения
+set_backend(os.environ.get(BACKEND_ENV, 'python'))
@@ -7,10 +7,21 @@ structure - отдельний модуль для описания констр
 from . import matan
 
 import math
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import accumulate, chain
 from typing import List
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod, abstractproperty
 
+try:
+    # numpy - НЕобязательная зависимость: с ней пакетная сборка
+    # матрицы жёсткости векторизована, без неё - циклы python
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def get_alpha(x, y):
     """
@@ -48,11 +59,431 @@ def get_alpha(x, y):
     return alpha
 
 
+def rcm_order(adjacency):
+    """
+    Порядок вершин графа по обратному алгоритму Катхилла-Макки (RCM)
+    adjacency: adjacency[i] - множество соседей i-ой вершины
+    Возвращает список старых номеров вершин в новом порядке
+    """
+    n = len(adjacency)
+    degree = [len(neighbours) for neighbours in adjacency]
+    visited = [False]*n
+    order = []
+
+    def bfs_levels(start):
+        """Уровни обхода в ширину из вершины start"""
+        levels = [[start]]
+        seen = {start}
+        while True:
+            level = []
+            for i in levels[-1]:
+                for j in adjacency[i]:
+                    if j not in seen and not visited[j]:
+                        seen.add(j)
+                        level.append(j)
+            if not level:
+                return levels
+            levels.append(level)
+
+    # Граф может быть несвязным - обходим каждую компоненту
+    for root in sorted(range(n), key=degree.__getitem__):
+        if visited[root]:
+            continue
+        # Ищем псевдопериферийную вершину (алгоритм Джорджа-Лю):
+        # уходим в самый дальний уровень, пока растёт эксцентриситет
+        levels = bfs_levels(root)
+        while True:
+            candidate = min(levels[-1], key=degree.__getitem__)
+            candidate_levels = bfs_levels(candidate)
+            if len(candidate_levels) <= len(levels):
+                break
+            root, levels = candidate, candidate_levels
+
+        # Обход в ширину, соседей берём по возрастанию степени
+        visited[root] = True
+        queue = [root]
+        head = 0
+        while head < len(queue):
+            i = queue[head]
+            head += 1
+            for j in sorted(adjacency[i], key=degree.__getitem__):
+                if not visited[j]:
+                    visited[j] = True
+                    queue.append(j)
+        order.extend(queue)
+
+    # Обратный порядок даёт меньший профиль
+    order.reverse()
+    return order
+
+
+# Матрица жёсткости линейного КЭ определяется тремя числами a, b, d:
+#   | a  b -a -b |
+#   | b  d -b -d |
+#   |-a -b  a  b |
+#   |-b -d  b  d |
+# Для каждого из 16 элементов (по строкам) - номер строки и столбца,
+# номер числа среди (a, b, d) и знак
+K_ROWS = (0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3)
+K_COLS = (0, 1, 2, 3)*4
+K_COEF = tuple(min(r % 2 + c % 2, 2) for r, c in zip(K_ROWS, K_COLS))
+K_SIGN = tuple(1 if r//2 == c//2 else -1 for r, c in zip(K_ROWS, K_COLS))
+
+
+@dataclass
+class TrussArrays:
+    """Конструкция в виде плоских массивов - для пакетной сборки"""
+    # Координаты узлов
+    x: array = field(default_factory=lambda: array('d'))
+    y: array = field(default_factory=lambda: array('d'))
+    # Номера начального и конечного узлов элементов
+    n1: array = field(default_factory=lambda: array('l'))
+    n2: array = field(default_factory=lambda: array('l'))
+    # Жёсткость элемента: EA для стержня (делится на длину), C для пружинки
+    k: array = field(default_factory=lambda: array('d'))
+    # 1 - жёсткость нужно разделить на длину элемента, 0 - не нужно
+    per_length: bytearray = field(default_factory=bytearray)
+
+
+@dataclass
+class LoadArrays:
+    """Нагрузки конструкции в виде плоских массивов - для сборки f"""
+    # Точечные силы: номер узла и проекции силы
+    node: array = field(default_factory=lambda: array('l'))
+    fx: array = field(default_factory=lambda: array('d'))
+    fy: array = field(default_factory=lambda: array('d'))
+    # Линейные распределённые нагрузки: номера узлов элемента
+    # и проекции нагрузки в начале и в конце элемента
+    n1: array = field(default_factory=lambda: array('l'))
+    n2: array = field(default_factory=lambda: array('l'))
+    q1x: array = field(default_factory=lambda: array('d'))
+    q1y: array = field(default_factory=lambda: array('d'))
+    q2x: array = field(default_factory=lambda: array('d'))
+    q2y: array = field(default_factory=lambda: array('d'))
+
+    def add_point(self, node, F):
+        """Добавить точечную силу F в узле с номером node"""
+        self.node.append(node)
+        self.fx.append(F.x)
+        self.fy.append(F.y)
+
+    def add_distributed(self, n1, n2, q1, q2):
+        """Добавить нагрузку q1..q2 на элемент с узлами n1, n2"""
+        self.n1.append(n1)
+        self.n2.append(n2)
+        self.q1x.append(q1.x)
+        self.q1y.append(q1.y)
+        self.q2x.append(q2.x)
+        self.q2y.append(q2.y)
+
+
+def load_vector(loads: LoadArrays, x, y, size):
+    """
+    Вектор известных узловых сил одним проходом по всем нагрузкам:
+    точечные силы складываются в свои строки, линейные распределённые
+    заменяются эквивалентными узловыми (как LineFE.distributed_forces)
+    x, y : координаты узлов
+    size : длина вектора
+    Возвращает список
+    """
+    if numpy is not None:
+        node = numpy.frombuffer(loads.node, dtype=loads.node.typecode)
+        n1 = numpy.frombuffer(loads.n1, dtype=loads.n1.typecode)
+        n2 = numpy.frombuffer(loads.n2, dtype=loads.n2.typecode)
+        q1x, q1y, q2x, q2y = (numpy.frombuffer(values, dtype=float) for values in
+                              (loads.q1x, loads.q1y, loads.q2x, loads.q2y))
+        x = numpy.frombuffer(x, dtype=float)
+        y = numpy.frombuffer(y, dtype=float)
+        Lx = x[n2] - x[n1]
+        Ly = y[n2] - y[n1]
+        # Нагрузки в начале и в конце элементов
+        f1x = (Lx/2)*(q1x*2/3 + q2x*1/3)
+        f1y = (Ly/2)*(q1y*2/3 + q2y*1/3)
+        f2x = (Lx/2)*(q1x*1/3 + q2x*2/3)
+        f2y = (Ly/2)*(q1y*1/3 + q2y*2/3)
+        # Строки вектора и слагаемые: сначала точечные силы,
+        # потом распределённые - в том же порядке, что и в цикле python ниже
+        rows = numpy.concatenate((2*node, 2*node + 1, numpy.stack(
+            (2*n1, 2*n1 + 1, 2*n2, 2*n2 + 1), axis=1).ravel()))
+        values = numpy.concatenate((
+            numpy.frombuffer(loads.fx, dtype=float), numpy.frombuffer(loads.fy, dtype=float),
+            numpy.stack((f1x, f1y, f2x, f2y), axis=1).ravel()))
+        return numpy.bincount(rows, weights=values, minlength=size).tolist()
+
+    vector = [0]*size
+    for i, Fx, Fy in zip(loads.node, loads.fx, loads.fy):
+        vector[2*i] += Fx
+        vector[2*i + 1] += Fy
+    for i, j, q1x, q1y, q2x, q2y in zip(loads.n1, loads.n2, loads.q1x,
+                                        loads.q1y, loads.q2x, loads.q2y):
+        Lx = x[j] - x[i]
+        Ly = y[j] - y[i]
+        vector[2*i] += (Lx/2)*(q1x*2/3 + q2x*1/3)
+        vector[2*i + 1] += (Ly/2)*(q1y*2/3 + q2y*1/3)
+        vector[2*j] += (Lx/2)*(q1x*1/3 + q2x*2/3)
+        vector[2*j + 1] += (Ly/2)*(q1y*1/3 + q2y*2/3)
+    return vector
+
+
+@dataclass
+class LoadCase:
+    """
+    Случай нагружения (собственный вес, снег, ветер ...): свои точечные
+    и распределённые нагрузки, которые не входят в f конструкции
+    Храним сами узлы и элементы, а не их номера - номера узлов
+    могут поменяться при перенумерации
+    """
+    # Имя случая
+    name: str
+    # Точечные силы: пары (узел, сила)
+    points: list = field(default_factory=list)
+    # Линейные распределённые нагрузки: тройки (элемент, q1, q2)
+    distributed: list = field(default_factory=list)
+
+    def add_point_force(self, node, value):
+        """Добавить точечную силу value в узле node"""
+        self.points.append((node, value))
+
+    def add_linear_distributed_force(self, el, q1, q2):
+        """Добавить распределённую нагрузку q1..q2 вдоль элемента el"""
+        self.distributed.append((el, q1, q2))
+
+    def gather_loads(self):
+        """Нагрузки случая в плоских массивах по текущим номерам узлов"""
+        loads = LoadArrays()
+        for node, F in self.points:
+            loads.add_point(node.pos, F)
+        for el, q1, q2 in self.distributed:
+            loads.add_distributed(el.n1.pos, el.n2.pos, q1, q2)
+        return loads
+
+
+def direction_cosines(arrays: TrussArrays):
+    """
+    Длины и направляющие косинусы всех элементов сразу - без углов
+    и тригонометрии, прямо из проекций элементов
+    Возвращает (L, cos_a, sin_a): массивы numpy, если он есть, иначе списки
+    """
+    if numpy is not None:
+        x = numpy.frombuffer(arrays.x, dtype=float)
+        y = numpy.frombuffer(arrays.y, dtype=float)
+        n1 = numpy.frombuffer(arrays.n1, dtype=arrays.n1.typecode)
+        n2 = numpy.frombuffer(arrays.n2, dtype=arrays.n2.typecode)
+        # Проекции и длины всех элементов
+        Lx = x[n2] - x[n1]
+        Ly = y[n2] - y[n1]
+        L = numpy.sqrt(Lx*Lx + Ly*Ly)
+        # У элемента нулевой длины нет направления
+        zero = numpy.flatnonzero(L == 0)
+        if len(zero):
+            raise Exception(f'Нулевая длина элемента {zero[0] + 1}: его узлы совпадают')
+        return L, Lx/L, Ly/L
+
+    L, cos_a, sin_a = [], [], []
+    x, y = arrays.x, arrays.y
+    for e, (i, j) in enumerate(zip(arrays.n1, arrays.n2)):
+        Lx = x[j] - x[i]
+        Ly = y[j] - y[i]
+        length = math.sqrt(Lx*Lx + Ly*Ly)
+        if length == 0:
+            raise Exception(f'Нулевая длина элемента {e + 1}: его узлы совпадают')
+        L.append(length)
+        cos_a.append(Lx/length)
+        sin_a.append(Ly/length)
+    return L, cos_a, sin_a
+
+
+def element_coefficients(arrays: TrussArrays, ndigits=None):
+    """
+    Числа a, b, d матриц жёсткости всех элементов сразу
+    (см. K_ROWS), с учётом жёсткости элемента
+    ndigits: до скольки знаков округлить косинусы (как в simple_K),
+             None - не округлять
+    Возвращает три массива numpy, если он есть, иначе три списка
+    """
+    L, cos_a, sin_a = direction_cosines(arrays)
+    if numpy is not None:
+        k = numpy.frombuffer(arrays.k, dtype=float)
+        per_length = numpy.frombuffer(arrays.per_length, dtype=numpy.uint8)
+        # Жёсткость стержня делим на длину
+        k = numpy.where(per_length == 1, k/L, k)
+        a, b, d = cos_a*cos_a, cos_a*sin_a, sin_a*sin_a
+        if ndigits is not None:
+            a, b, d = (numpy.round(a, ndigits), numpy.round(b, ndigits),
+                       numpy.round(d, ndigits))
+        return a*k, b*k, d*k
+
+    a, b, d = [], [], []
+    for length, c, s, k, per_length in zip(L, cos_a, sin_a, arrays.k, arrays.per_length):
+        if per_length:
+            k = k/length
+        if ndigits is None:
+            a.append(c*c*k)
+            b.append(c*s*k)
+            d.append(s*s*k)
+        else:
+            a.append(round(c*c, ndigits)*k)
+            b.append(round(c*s, ndigits)*k)
+            d.append(round(s*s, ndigits)*k)
+    return a, b, d
+
+
+@dataclass
+class AssemblyPlan:
+    """
+    План сборки глобальной матрицы жёсткости при неизменной топологии:
+    для каждого вклада элемента заранее известно место в хранилище
+    матрицы и множитель, на который умножается жёсткость элемента
+    (см. LineStructure.assembly_plan и LineStructure.assemble)
+    """
+    # Формат матрицы: 'sparse', 'skyline' или 'dense'
+    fmt: str
+    # Размер матрицы
+    size: int
+    # Количество элементов конструкции
+    count: int
+    # Место вклада в хранилище данных матрицы
+    slots: array
+    # Номер элемента, которому принадлежит вклад
+    owner: array
+    # Вклад при единичной жёсткости элемента (знак и косинусы)
+    coef: array
+    # На что делится жёсткость элемента: длина стержня или 1
+    divisor: array
+    # Длина хранилища данных матрицы
+    nnz: int
+    # До скольки знаков округлять, None - не округлять
+    ndigits: int = None
+    # Структура матрицы: начала строк и номера столбцов для 'sparse',
+    # первые строки профиля для 'skyline'
+    indptr: list = None
+    indices: list = None
+    first: list = None
+
+
+def simple_K(cos_a, sin_a, ndigits=None):
+    """
+    ПРОСТАЯ матрица жёсткости линейного КЭ без учета материала
+    cos_a, sin_a : косинус и синус угла наклона элемента к оси x
+    ndigits      : до скольки знаков округлить элементы матрицы,
+                   None - не округлять
+    """
+    a, b, d = cos_a*cos_a, cos_a*sin_a, sin_a*sin_a
+    if ndigits is not None:
+        a, b, d = round(a, ndigits), round(b, ndigits), round(d, ndigits)
+
+    # Упрощённая матрица жёсткости (см. K_ROWS)
+    return matan.Matrix._from_flat(4, 4, [a, b, -a, -b,
+                                          b, d, -b, -d,
+                                          -a, -b, a, b,
+                                          -b, -d, b, d])
+
+
+class StiffnessCache:
+    """
+    Ограниченный LRU-кеш матриц жёсткости элементов, общий для всех
+    элементов и всех конструкций. Ключ - тип элемента, материал
+    (EA для стержня, C для пружинки), длина и направляющие косинусы,
+    округлённые до ndigits знаков: одинаковые стержни регулярной фермы
+    не пересчитывают матрицу
+    Одна матрица кеша общая для всех таких элементов, поэтому менять
+    её нельзя: наружу (el.K) элементы отдают только её копию
+    """
+
+    def __init__(self, maxsize=4096, ndigits=12):
+        """
+        maxsize : сколько матриц хранить, 0 - не кешировать
+        ndigits : до скольки знаков округлять параметры ключа
+        """
+        self.maxsize = maxsize
+        self.ndigits = ndigits
+        self._data = OrderedDict()
+        # Статистика обращений
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, el, material):
+        """
+        Матрица жёсткости элемента el
+        material : материал элемента (EA для стержня, C для пружинки)
+        """
+        if not self.maxsize:
+            self.misses += 1
+            return el.get_simple_K()*el.stiffness
+        n = self.ndigits
+        L, cos_a, sin_a = el._get_geometry()
+        key = (type(el).__name__, round(material, n), round(L, n),
+               round(cos_a, n), round(sin_a, n))
+        K = self._data.get(key)
+        if K is not None:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return K
+        self.misses += 1
+        K = el.get_simple_K()*el.stiffness
+        self._data[key] = K
+        # Вытесняем давно не используемые матрицы
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return K
+
+    def clear(self):
+        """Очистить кеш и статистику"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Статистика: попадания, промахи, доля попаданий, размер кеша"""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits/total if total else 0.0,
+                'size': len(self._data), 'maxsize': self.maxsize}
+
+
+# Общий кеш матриц жёсткости элементов
+stiffness_cache = StiffnessCache()
+
+
+def _slots_getstate(self):
+    """
+    Состояние объекта со __slots__ для copy и pickle: значения слотов
+    читаем прямо из дескрипторов - свойство наследника с тем же именем
+    (как grid и items у ColumnarStructure) их не заслоняет
+    """
+    state = dict(getattr(self, '__dict__', ()))
+    for cls in type(self).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            try:
+                state[name] = cls.__dict__[name].__get__(self)
+            except AttributeError:
+                # Слот не заполнен
+                pass
+    return state
+
+
+def _slots_setstate(self, state):
+    """
+    Восстановить состояние объекта со __slots__ в обход __setattr__:
+    при копировании узлы и элементы не должны сообщать конструкции
+    об изменениях
+    """
+    slots = {name: cls.__dict__[name] for cls in type(self).__mro__
+             for name in cls.__dict__.get('__slots__', ())}
+    for name, value in state.items():
+        if name in slots:
+            slots[name].__set__(self, value)
+        else:
+            self.__dict__[name] = value
+
+
 class Vector(ABC):
     """
     Класс вектора, его ТОЛЬКО наследовать
     Нужно определить сеттеры для свойств x и y
     """
+    # Без __dict__ у каждого объекта - сил в модели может быть очень много
+    __slots__ = ('val', 'alpha')
 
     def __init__(self, x=0, y=0, *, val=None, alpha=0):
         """
@@ -114,6 +545,8 @@ class Force(Vector):
     Класс представляет Силу
     Прокции силы можно менять
     """
+    __slots__ = ()
+
     @Vector.x.setter
     def x(self, val):
         """Изменить проекцию силы на ось x"""
@@ -130,6 +563,8 @@ class Distance(Vector):
     Класс расстояния
     В данном случае проекции расстояния менять нельз
     """
+    __slots__ = ()
+
     @Vector.x.setter
     def x(self, val):
         """Изменить проекцию дистанции на ось x"""
@@ -141,7 +576,7 @@ class Distance(Vector):
         raise Exception("Нельзя менять проекци Y объекта расстояния")
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     """Класс одного узла в системе"""
     # Содержит координаты своего расположения
@@ -156,6 +591,27 @@ class Node:
     forces: List[Force] = field(init=False, default_factory=list)
     # Позиция узла в массиве вершин
     pos: int = field(init=False, default=None)
+    # Заделка: перемещения u и v узла заданы (в том числе ненулевые)
+    pinned: bool = field(init=False, default=False, repr=False, compare=False)
+    # Версия координат узла: растёт при каждом изменении x или y,
+    # по ней элементы узнают, что их кеш матрицы жёсткости устарел
+    version: int = field(init=False, default=0, repr=False, compare=False)
+    # Конструкция, которой принадлежит узел: ей сообщаем об изменениях,
+    # чтобы она обновила собранные K, f и q
+    _owner: object = field(init=False, default=None, repr=False, compare=False)
+
+    def __setattr__(self, name, value):
+        """При изменении координат увеличиваем версию узла"""
+        if name in ('x', 'y'):
+            object.__setattr__(self, 'version', getattr(self, 'version', 0) + 1)
+        object.__setattr__(self, name, value)
+        # Сообщаем конструкции об изменении координат или перемещений
+        owner = getattr(self, '_owner', None)
+        if owner is not None and name in ('x', 'y', 'u', 'v', 'pos', 'forces', 'pinned'):
+            owner._node_changed(self, name)
+
+    __getstate__ = _slots_getstate
+    __setstate__ = _slots_setstate
 
     def add_point_force(self, value: Force):
         """
@@ -164,14 +620,20 @@ class Node:
           value  : значение нагрузки
         """
         self.forces.append(value)
+        if self._owner is not None:
+            self._owner._force_added(self, value)
 
-    def add_pinning(self):
-        """Добавить закрепление"""
-        self.u = 0
-        self.v = 0
+    def add_pinning(self, u=0, v=0):
+        """
+        Добавить закрепление
+        u, v : заданные перемещения узла, ненулевые - например, осадка опоры
+        """
+        self.u = u
+        self.v = v
+        self.pinned = True
 
 
-@dataclass
+@dataclass(slots=True)
 class FiniteElement(ABC):
     """Абстрактный класс одного обособленного конечного элемента"""
     # Самое базовое свойтсво, которым должны обладать КЭ - это матрица жёсткости
@@ -192,8 +654,11 @@ class FiniteElement(ABC):
         """
         raise Exception("Попытка изменить матрицу жосткости элемента")
 
+    __getstate__ = _slots_getstate
+    __setstate__ = _slots_setstate
 
-@dataclass
+
+@dataclass(slots=True)
 class LineFE(FiniteElement):
     """Линейный конечный элемент"""
     # объекты узлов нв концах стержня
@@ -207,12 +672,50 @@ class LineFE(FiniteElement):
     # Так называем КЕШ простой матрицы жёсткости
     # Чтобы каждый раз не вычислять её
     _simple_K: matan.Matrix = field(init=False, default=None)
+    # Узлы и их версии, для которых посчитана простая матрица
+    _simple_K_key: tuple = field(init=False, default=None, repr=False, compare=False)
+    # КЕШ матрицы жёсткости с учётом материала и ключ, для которого
+    # она посчитана (узлы, их версии и параметры элемента)
+    _K: matan.Matrix = field(init=False, default=None, repr=False, compare=False)
+    _K_key: tuple = field(init=False, default=None, repr=False, compare=False)
+    # КЕШ длины и направляющих косинусов (L, cos_a, sin_a) и ключ узлов
+    _geometry: tuple = field(init=False, default=None, repr=False, compare=False)
+    _geometry_key: tuple = field(init=False, default=None, repr=False, compare=False)
+    # Конструкция, которой принадлежит элемент (см. Node._owner)
+    _owner: object = field(init=False, default=None, repr=False, compare=False)
+
+    def __setattr__(self, name, value):
+        """Об изменении параметров или узлов элемента сообщаем конструкции"""
+        object.__setattr__(self, name, value)
+        owner = getattr(self, '_owner', None)
+        if owner is not None and name in ('E', 'A', 'C', 'n1', 'n2', 'q'):
+            owner._element_changed(self, name)
+
+    def _get_geometry(self):
+        """Длина и направляющие косинусы, пересчёт только при сдвиге узлов"""
+        n1 = self.n1
+        n2 = self.n2
+        # Проверка кеша дешевле самого расчёта: сравниваем узлы
+        # и их версии без сборки ключа
+        key = self._geometry_key
+        if (key is None or key[0] is not n1 or key[1] is not n2
+                or key[2] != n1.version or key[3] != n2.version):
+            Lx = n2.x - n1.x
+            Ly = n2.y - n1.y
+            L = math.sqrt(Lx*Lx + Ly*Ly)
+            if L == 0:
+                raise Exception('Нулевая длина элемента: его узлы совпадают')
+            object.__setattr__(self, '_geometry', (L, Lx/L, Ly/L))
+            object.__setattr__(self, '_geometry_key', (n1, n2, n1.version, n2.version))
+        return self._geometry
 
     @property
     def L(self):
         """Длина элемента"""
-        # Из конечного узла вычитаем начальный
-        return math.sqrt((self.n1.x-self.n2.x)**2 + (self.n1.y-self.n2.y)**2)
+        # Считаем напрямую: это дешевле проверки кеша
+        Lx = self.n2.x - self.n1.x
+        Ly = self.n2.y - self.n1.y
+        return math.sqrt(Lx*Lx + Ly*Ly)
 
     @L.setter
     def L(self, value):
@@ -250,28 +753,44 @@ class LineFE(FiniteElement):
         """Задавать угол альфа нельзя"""
         raise Exception("Попытка изменить угол наклона стержня КЭ")
 
+    @property
+    def cos_a(self):
+        """Косинус угла наклона элемента Lx/L - без вычисления угла"""
+        return self._get_geometry()[1]
+
+    @property
+    def sin_a(self):
+        """Синус угла наклона элемента Ly/L - без вычисления угла"""
+        return self._get_geometry()[2]
+
+    def _nodes_key(self):
+        """Ключ геометрии элемента: его узлы и версии их координат"""
+        return (id(self.n1), self.n1.version, id(self.n2), self.n2.version)
+
+    def _cached_K(self, *params):
+        """
+        Матрица жёсткости элемента из кеша
+        params : параметры материала, от которых зависит матрица
+        Пересчитываем, только если сдвинулись узлы или изменились params;
+        при пересчёте сначала ищем такую же матрицу в общем кеше
+        stiffness_cache
+        Матрица общая с другими элементами - только для чтения
+        """
+        key = self._nodes_key() + params
+        if self._K is None or self._K_key != key:
+            self._K = stiffness_cache.get(self, math.prod(params))
+            self._K_key = key
+        return self._K
+
     def get_simple_K(self):
         """Получить ПРОСТУЮ матрицу жёсткости без учета материала"""
-        # Если матрица еще не вычислялась
-        if not self._simple_K:
-            # Вычисляем её
-            # Перед созданием матрицы зададимся косинусом
-            # и синусом угла наклона элемента
-            cos_a = math.cos(self.alpha)
-            sin_a = math.sin(self.alpha)
-
-            # Упрощённая матрица жёсткости
-            self._simple_K = matan.Matrix(
-                [[cos_a**2,     cos_a*sin_a,  -cos_a**2,    -cos_a*sin_a],
-                 [cos_a*sin_a,  sin_a**2,     -cos_a*sin_a, -sin_a**2],
-                 [-cos_a**2,    -cos_a*sin_a, cos_a**2,     cos_a*sin_a],
-                 [-cos_a*sin_a, -sin_a**2,    cos_a*sin_a,  sin_a**2]])
-
-            # Теперь округляем все элементы матрицы жеёсткости с точностью
-            # До второго знака после запятой
-            for i in range(self._simple_K.rows):
-                for j in range(self._simple_K.cols):
-                    self._simple_K[i, j] = round(self._simple_K[i, j], 2)
+        # Если матрица еще не вычислялась или узлы сдвинулись
+        key = self._nodes_key()
+        if self._simple_K is None or self._simple_K_key != key:
+            self._simple_K_key = key
+            # Вычисляем её по направляющим косинусам: через угол alpha
+            # косинус вертикального элемента получился бы не нулём, а 6e-17
+            self._simple_K = simple_K(self.cos_a, self.sin_a)
 
         # Возвращаем ПРОСТУЮ матрицу жёсткости
         return self._simple_K
@@ -285,9 +804,24 @@ class LineFE(FiniteElement):
         """
         # Приведём силы по краям элемента к объектам сил
         self.q.append([q1, q2])
+        if self._owner is not None:
+            self._owner._load_added(self, q1, q2)
+
+    def distributed_forces(self, q1: Force, q2: Force):
+        """
+        Распределённая нагрузка, заменённая на точечные в узлах элемента
+        Возвращает (f1x, f1y, f2x, f2y)
+        """
+        # Вычисляем нагрузки в начале элемента
+        f1x = (self.Lx/2)*(q1.x*2/3 + q2.x*1/3)
+        f1y = (self.Ly/2)*(q1.y*2/3 + q2.y*1/3)
+        # Вычисляем нагрузки в конце элемента
+        f2x = (self.Lx/2)*(q1.x*1/3 + q2.x*2/3)
+        f2y = (self.Ly/2)*(q1.y*1/3 + q2.y*2/3)
+        return f1x, f1y, f2x, f2y
 
 
-@dataclass
+@dataclass(slots=True)
 class Rod(LineFE):
     """Стержневой КЭ"""
     # Жесткость (модуль Юнга)
@@ -296,29 +830,44 @@ class Rod(LineFE):
     A: float = None
 
     @property
-    def K(self):
-        """Матрица жётскости стержня"""
-        # коэффициент перед матрицей
-        c = self.E*self.A/self.L
+    def stiffness(self):
+        """Коэффициент жёсткости стержня EA/L"""
+        return self.E*self.A/self.L
 
-        # Результирующая матрица жёсткости стержня
-        return self.get_simple_K()*c
+    @property
+    def _shared_K(self):
+        """Общая матрица жёсткости из кеша (пока не изменились E, A и узлы)"""
+        return self._cached_K(self.E, self.A)
 
+    @property
+    def K(self):
+        """Матрица жётскости стержня - копия, её можно менять"""
+        return self._shared_K.copy()
 
-@dataclass
+
+@dataclass(slots=True)
 class Spring(LineFE):
     """КЭ Пружинка"""
     # Жесткость пружинки
     C: float = None
 
+    @property
+    def stiffness(self):
+        """Коэффициент жёсткости пружинки C"""
+        return self.C
+
+    @property
+    def _shared_K(self):
+        """Общая матрица жёсткости из кеша (пока не изменились C и узлы)"""
+        return self._cached_K(self.C)
+
     @property
     def K(self):
-        """Матрица жётскости пружинки"""
-        # Результирующая матрица жёсткости пружинки
-        return self.get_simple_K()*self.C
+        """Матрица жётскости пружинки - копия, её можно менять"""
+        return self._shared_K.copy()
 
 
-@dataclass
+@dataclass(slots=True)
 class LineStructure(FiniteElement):
     """
     Конструкция состоящая из линейных КЭ
@@ -328,6 +877,143 @@ class LineStructure(FiniteElement):
     # Массив узлов, которые содержат ссылки на конечные элементы
     grid: List[Node] = field(init=False, default_factory=list)
 
+    # Собранная матрица жёсткости по строкам: номера столбцов по
+    # возрастанию и суммы. Новый элемент добавляет только свой вклад
+    # в свои 4 строки, а изменение узла или материала сбрасывает её
+    _K_cols: list = field(init=False, default=None, repr=False, compare=False)
+    _K_vals: list = field(init=False, default=None, repr=False, compare=False)
+    # Количество элементов, вклад которых внесён
+    _K_count: int = field(init=False, default=0, repr=False, compare=False)
+    # Сжатая матрица, копию которой отдаёт свойство K
+    _K_cache: matan.SparseMatrix = field(init=False, default=None, repr=False, compare=False)
+    # Собранные векторы f и q в виде списков
+    _f_cache: list = field(init=False, default=None, repr=False, compare=False)
+    _q_cache: list = field(init=False, default=None, repr=False, compare=False)
+    # Все нагрузки в плоских массивах: по ним f собирается заново
+    # без обхода объектов сил
+    _loads: LoadArrays = field(init=False, default=None, repr=False, compare=False)
+    # Случаи нагружения - рассчитываются вместе (FEMComput.solve_cases)
+    load_cases: List[LoadCase] = field(init=False, default_factory=list, repr=False, compare=False)
+
+    def invalidate(self):
+        """
+        Сбросить собранные K, f и q
+        Нужно после прямого изменения grid, items, списков сил
+        или самих объектов сил - о таких изменениях конструкция не знает
+        """
+        self._K_cols = None
+        self._K_cache = None
+        self._f_cache = None
+        self._q_cache = None
+        self._loads = None
+
+    def _node_changed(self, node, name):
+        """Узел сдвинулся, изменились его перемещения или силы"""
+        if name == 'forces':
+            self._f_cache = None
+            self._loads = None
+        elif name in ('x', 'y'):
+            # Меняются длины и углы элементов - собираем K и f заново
+            self._K_cols = None
+            self._K_cache = None
+            self._f_cache = None
+        elif name == 'pos':
+            # Узел перенумерован - меняются все строки
+            self.invalidate()
+        elif self._q_cache is not None and self._q_cache_valid():
+            # Меняются только строки вектора q этого узла
+            self._q_cache[node.pos*2:node.pos*2 + 2] = self._q_entries(node.pos)
+
+    def _element_changed(self, el, name):
+        """Изменились параметры, узлы или нагрузки элемента"""
+        if name != 'q':
+            self._K_cols = None
+            self._K_cache = None
+        if name in ('n1', 'n2', 'q'):
+            self._f_cache = None
+            self._loads = None
+
+    def _element_added(self, el):
+        """Внести вклад нового элемента в собранную матрицу жёсткости"""
+        el._owner = self
+        for node in (el.n1, el.n2):
+            node._owner = self
+        if self._K_cols is None:
+            return
+        # Новые узлы - матрица растёт
+        self._K_resize()
+        u1 = el.n1.pos*2
+        u2 = el.n2.pos*2
+        dofs = (u1, u1 + 1, u2, u2 + 1)
+        K_el = el._shared_K
+        for r in range(4):
+            cols = self._K_cols[dofs[r]]
+            vals = self._K_vals[dofs[r]]
+            for c in range(4):
+                value = K_el.get_flat(r*4 + c)
+                j = dofs[c]
+                p = bisect_left(cols, j)
+                if p < len(cols) and cols[p] == j:
+                    vals[p] += value
+                else:
+                    # Новый элемент строки - прибавляем к нулю,
+                    # чтобы не хранить "отрицательный ноль"
+                    cols.insert(p, j)
+                    vals.insert(p, 0 + value)
+        self._K_count += 1
+        self._K_cache = None
+
+    def _K_resize(self):
+        """Добавить пустые строки собранной K для новых узлов"""
+        for _ in range(len(self.grid)*2 - len(self._K_cols)):
+            self._K_cols.append([])
+            self._K_vals.append([])
+            self._K_cache = None
+
+    def _force_added(self, node, F):
+        """Добавить точечную силу в собранный вектор f"""
+        if self._loads is not None:
+            self._loads.add_point(node.pos, F)
+        if self._f_cache is not None and self._f_cache_valid():
+            self._f_cache[node.pos*2] += F.x
+            self._f_cache[node.pos*2+1] += F.y
+
+    def _load_added(self, el, q1, q2):
+        """Добавить распределённую нагрузку в собранный вектор f"""
+        if self._loads is not None:
+            self._loads.add_distributed(el.n1.pos, el.n2.pos, q1, q2)
+        if self._f_cache is not None and self._f_cache_valid():
+            f1x, f1y, f2x, f2y = el.distributed_forces(q1, q2)
+            self._f_cache[el.n1.pos*2] += f1x
+            self._f_cache[el.n1.pos*2+1] += f1y
+            self._f_cache[el.n2.pos*2] += f2x
+            self._f_cache[el.n2.pos*2+1] += f2y
+
+    def _f_cache_valid(self):
+        """Собранный f соответствует узлам конструкции"""
+        return len(self._f_cache) == len(self.grid)*2
+
+    def _q_cache_valid(self):
+        """Собранный q соответствует узлам конструкции"""
+        return len(self._q_cache) == len(self.grid)*2
+
+    def _nodes_added(self):
+        """В конструкцию добавлены узлы - удлиняем собранные f и q"""
+        if self._f_cache is not None:
+            self._f_cache.extend([0]*(len(self.grid)*2 - len(self._f_cache)))
+        if self._q_cache is not None:
+            for i in range(len(self._q_cache)//2, len(self.grid)):
+                self._q_cache.extend(self._q_entries(i))
+
+    def _q_entries(self, i):
+        """Строки вектора q для i-го узла"""
+        node = self.grid[i]
+        # В заделке перемещения известны
+        if node.pinned:
+            return [node.u, node.v]
+        return [f'u{i+1}' if node.u != 0 else 0,
+                f'v{i+1}' if node.v != 0 else 0]
+
     def add_fen_el(self, el: LineFE, n1: Node = None, n2: Node = None, D: Distance = None):
         """
         Добавляет конечный элемент к другим элементам конструкции
@@ -382,6 +1068,10 @@ class LineStructure(FiniteElement):
         # тогда назначаем новый узел КОНЕЧНЫМ узлом элемента
         el.n2 = n2
 
+        # Обновляем собранные K, f и q только вкладом нового элемента
+        self._nodes_added()
+        self._element_added(el)
+
     def add_rod(self, E, A, n1: Node = None, n2: Node = None, D: Distance = None):
         """
         Добавляет стержень к конструкции
@@ -434,18 +1124,382 @@ class LineStructure(FiniteElement):
         """
         el.add_linear_distributed_force(q1, q2)
 
-    def add_pinning(self, node: Node):
+    def add_pinning(self, node: Node, u=0, v=0):
         """
         Добавить закрепление
         node : объект вершины
+        u, v : заданные перемещения узла (осадка опоры), по умолчанию 0
         """
-        node.add_pinning()
+        node.add_pinning(u, v)
 
-    @property
-    def K(self):
-        """Глобальная матрица жётскости"""
+    def add_load_case(self, name):
+        """
+        Добавить случай нагружения с именем name
+        Его нагрузки не входят в f конструкции
+        Возвращает объект LoadCase, к нему и добавляются нагрузки
+        """
+        if any(case.name == name for case in self.load_cases):
+            raise Exception(f'Случай нагружения {name} уже есть')
+        case = LoadCase(name)
+        self.load_cases.append(case)
+        return case
+
+    def load_case(self, name):
+        """Случай нагружения по имени"""
+        for case in self.load_cases:
+            if case.name == name:
+                return case
+        raise Exception(f'Нет случая нагружения {name}')
+
+    def cases_f(self, cases=None):
+        """
+        Векторы узловых сил случаев нагружения - столбцы одной
+        матрицы размером (число степеней свободы) x (число случаев)
+        cases : список случаев, по умолчанию все load_cases
+        """
+        cases = self.load_cases if cases is None else cases
+        if not cases:
+            raise Exception('Нет случаев нагружения')
+        size = len(self.grid)*2
+        x, y = self._node_coordinates()
+        columns = [load_vector(case.gather_loads(), x, y, size) for case in cases]
+        F = matan.Matrix(rows=size, cols=len(columns), filler=0)
+        F.set_flat(slice(None), [value for row in zip(*columns) for value in row])
+        return F
+
+    def skyline_first(self):
+        """
+        Профиль глобальной матрицы жёсткости:
+        для каждой степени свободы j - номер первой степени свободы,
+        с которой она связана хотя бы одним элементом (не больше j)
+        """
+        first = list(range(len(self.grid)*2))
+        for el in self.items:
+            # Степени свободы элемента
+            dofs = (el.n1.pos*2, el.n1.pos*2 + 1, el.n2.pos*2, el.n2.pos*2 + 1)
+            low = min(dofs)
+            for dof in dofs:
+                if low < first[dof]:
+                    first[dof] = low
+        return first
+
+    def bandwidth(self):
+        """Полуширина ленты глобальной матрицы жёсткости"""
+        first = self.skyline_first()
+        return max((j - first[j] for j in range(len(first))), default=0)
+
+    def profile(self):
+        """Профиль глобальной матрицы жёсткости (элементов в skyline)"""
+        first = self.skyline_first()
+        return sum(j - first[j] + 1 for j in range(len(first)))
+
+    def _reorder_nodes(self, order):
+        """
+        Переставить узлы: новым i-ым узлом становится узел order[i]
+        Позиции узлов переписываются
+        """
+        self.grid = [self.grid[i] for i in order]
+        for i, node in enumerate(self.grid):
+            node.pos = i
+        self.invalidate()
+
+    def renumber(self, method='rcm'):
+        """
+        Перенумеровать узлы, чтобы уменьшить ширину ленты и профиль
+        глобальной матрицы жёсткости (важно для профильного решателя)
+            method: 'rcm' - обратный алгоритм Катхилла-Макки
+        Если новая нумерация не уменьшает профиль - узлы не трогаем
+        Возвращает отчёт:
+            {'method': method,
+             'bandwidth': (до, после),
+             'profile': (до, после)}
+        """
+        if method != 'rcm':
+            raise Exception(f'Неизвестный метод перенумерации {method}')
+
+        # Ширина ленты и профиль до перенумерации
+        bandwidth = self.bandwidth()
+        profile = self.profile()
+
+        # Граф смежности узлов: узлы связаны, если есть общий элемент
+        adjacency = [set() for _ in self.grid]
+        for el in self.items:
+            adjacency[el.n1.pos].add(el.n2.pos)
+            adjacency[el.n2.pos].add(el.n1.pos)
+
+        # Переставляем узлы
+        order = rcm_order(adjacency)
+        self._reorder_nodes(order)
+
+        # Если профиль не уменьшился - возвращаем старую нумерацию:
+        # узел, бывший i-ым, сейчас стоит на месте inverse[i]
+        if self.profile() > profile:
+            inverse = [0]*len(order)
+            for new, old in enumerate(order):
+                inverse[old] = new
+            self._reorder_nodes(inverse)
+
+        # Отчёт о перенумерации
+        return {'method': method,
+                'bandwidth': (bandwidth, self.bandwidth()),
+                'profile': (profile, self.profile())}
+
+    def gather_arrays(self):
+        """Собрать координаты узлов и параметры элементов в плоские массивы"""
+        # Стержень: EA/L, на длину делим при сборке
+        # Пружинка (и любой другой элемент) - готовая жёсткость
+        is_rod = [isinstance(el, Rod) for el in self.items]
+        return TrussArrays(
+            x=array('d', [node.x for node in self.grid]),
+            y=array('d', [node.y for node in self.grid]),
+            n1=array('l', [el.n1.pos for el in self.items]),
+            n2=array('l', [el.n2.pos for el in self.items]),
+            k=array('d', [el.E*el.A if rod else el.stiffness
+                          for el, rod in zip(self.items, is_rod)]),
+            per_length=bytearray(is_rod))
+
+    def gather_loads(self):
+        """Собрать точечные и распределённые нагрузки в плоские массивы"""
+        loads = LoadArrays()
+        for node in self.grid:
+            for F in node.forces:
+                loads.add_point(node.pos, F)
+        for el in self.items:
+            for q1, q2 in el.q:
+                loads.add_distributed(el.n1.pos, el.n2.pos, q1, q2)
+        return loads
+
+    def _node_coordinates(self):
+        """Координаты узлов: массивы x и y"""
+        return (array('d', [node.x for node in self.grid]),
+                array('d', [node.y for node in self.grid]))
+
+    def direction_cosines(self):
+        """
+        Длины и направляющие косинусы всех элементов конструкции
+        по порядку items (см. функцию direction_cosines)
+        """
+        return direction_cosines(self.gather_arrays())
+
+    def _get_K_batch(self, fmt, ndigits=None):
+        """
+        Пакетная сборка: матрицы всех элементов считаются одним
+        векторным проходом (element_coefficients) и раскладываются
+        в глобальную матрицу по заранее вычисленным индексам
+        ndigits: до скольки знаков округлять, None - не округлять
+        """
+        size = len(self.grid)*2
+        arrays = self.gather_arrays()
+        a, b, d = element_coefficients(arrays, ndigits)
+
+        if numpy is not None:
+            n1 = numpy.frombuffer(arrays.n1, dtype=arrays.n1.typecode)
+            n2 = numpy.frombuffer(arrays.n2, dtype=arrays.n2.typecode)
+            # Степени свободы элементов: по строке на элемент
+            dofs = numpy.stack((2*n1, 2*n1 + 1, 2*n2, 2*n2 + 1), axis=1)
+            # Все 16 элементов матриц всех элементов
+            coeffs = numpy.stack((a, b, d), axis=1)
+            rows = dofs[:, K_ROWS].ravel()
+            cols = dofs[:, K_COLS].ravel()
+            vals = (coeffs[:, K_COEF]*numpy.array(K_SIGN)).ravel()
+            if fmt == 'skyline':
+                first = numpy.arange(size)
+                numpy.minimum.at(first, cols, rows)
+                first = first.tolist()
+                matrix = matan.SkylineMatrix(first)
+                # Только верхний треугольник, позиция в профиле столбца
+                upper = rows <= cols
+                ptr = numpy.array(matrix._ptr)
+                first = numpy.array(first)
+                pos = ptr[cols[upper]] + rows[upper] - first[cols[upper]]
+                data = numpy.bincount(pos, weights=vals[upper], minlength=len(matrix._data))
+                if ndigits is not None:
+                    data = numpy.round(data, ndigits)
+                matrix._data = array('d', data.tobytes())
+                return matrix
+            # Одномерный индекс элемента в глобальной матрице;
+            # bincount складывает повторы в порядке элементов,
+            # как и поэлементная сборка
+            keys = rows*size + cols
+            if fmt == 'sparse':
+                keys, inverse = numpy.unique(keys, return_inverse=True)
+                data = numpy.bincount(inverse.ravel(), weights=vals)
+                if ndigits is not None:
+                    data = numpy.round(data, ndigits)
+                indptr = numpy.zeros(size + 1, dtype=keys.dtype)
+                numpy.cumsum(numpy.bincount(keys//size, minlength=size), out=indptr[1:])
+                return matan.SparseMatrix.from_csr(
+                    (size, size), indptr.tolist(), (keys % size).tolist(),
+                    data.tolist())
+            data = numpy.bincount(keys, weights=vals, minlength=size*size)
+            if ndigits is not None:
+                data = numpy.round(data, ndigits)
+            matrix = matan.Matrix(size=size, filler=0)
+            matrix.set_flat(slice(None), data.tolist())
+            return matrix
+
+        # Без numpy - те же индексы, но циклами python
+        rows, cols, vals = [], [], []
+        for i, j, coeffs in zip(arrays.n1, arrays.n2, zip(a, b, d)):
+            dofs = (2*i, 2*i + 1, 2*j, 2*j + 1)
+            for r, c, t, sign in zip(K_ROWS, K_COLS, K_COEF, K_SIGN):
+                rows.append(dofs[r])
+                cols.append(dofs[c])
+                vals.append(sign*coeffs[t])
+        if fmt == 'skyline':
+            matrix = matan.SkylineMatrix(self.skyline_first())
+            for i, j, value in zip(rows, cols, vals):
+                if i <= j:
+                    matrix.add(i, j, value)
+        elif fmt == 'sparse':
+            matrix = matan.SparseMatrix.from_coo((size, size), rows, cols, vals)
+        else:
+            data = [0]*(size*size)
+            for i, j, value in zip(rows, cols, vals):
+                data[i*size + j] += value
+            if ndigits is not None:
+                data = [round(value, ndigits) for value in data]
+            matrix = matan.Matrix(size=size, filler=0)
+            matrix.set_flat(slice(None), data)
+            return matrix
+        return round(matrix, ndigits) if ndigits is not None else matrix
+
+    def assembly_plan(self, fmt='sparse', ndigits=None):
+        """
+        Заранее разложить вклады всех элементов по местам в глобальной
+        матрице жёсткости. План годится, пока не меняются узлы элементов
+        и их координаты; материалы можно менять (см. assemble)
+        fmt     : 'sparse', 'skyline' или 'dense', как в get_K
+        ndigits : округление, как в get_K
+        """
+        if fmt not in ('sparse', 'skyline', 'dense'):
+            raise Exception(f'Неизвестный формат матрицы жёсткости {fmt}')
+        size = len(self.grid)*2
+        arrays = self.gather_arrays()
+        count = len(arrays.n1)
+        # Длины элементов - на них делится жёсткость стержней
+        L = direction_cosines(arrays)[0]
+        divisor = array('d', [float(length) if per_length else 1.0
+                              for length, per_length in zip(L, arrays.per_length)])
+        # Числа a, b, d при единичной жёсткости
+        arrays.k = array('d', [1.0])*count
+        arrays.per_length = bytearray(count)
+        a, b, d = element_coefficients(arrays, ndigits)
+        coeffs = list(zip(a, b, d))
+
+        # Все 16 вкладов каждого элемента: строка, столбец, множитель
+        rows, cols, owner, coef = [], [], array('l'), array('d')
+        for e, (i, j) in enumerate(zip(arrays.n1, arrays.n2)):
+            dofs = (2*i, 2*i + 1, 2*j, 2*j + 1)
+            for r, c, t, sign in zip(K_ROWS, K_COLS, K_COEF, K_SIGN):
+                # Профильная матрица хранит только верхний треугольник
+                if fmt == 'skyline' and dofs[r] > dofs[c]:
+                    continue
+                rows.append(dofs[r])
+                cols.append(dofs[c])
+                owner.append(e)
+                coef.append(sign*float(coeffs[e][t]))
+
+        plan = AssemblyPlan(fmt=fmt, size=size, count=count, slots=array('l'),
+                            owner=owner, coef=coef, divisor=divisor, nnz=0,
+                            ndigits=ndigits)
+        if fmt == 'dense':
+            plan.slots.extend(i*size + j for i, j in zip(rows, cols))
+            plan.nnz = size*size
+        elif fmt == 'skyline':
+            plan.first = self.skyline_first()
+            ptr = matan.SkylineMatrix(plan.first)._ptr
+            plan.slots.extend(ptr[j] + i - plan.first[j] for i, j in zip(rows, cols))
+            plan.nnz = ptr[-1]
+        else:
+            # Занятые позиции по строкам и столбцам - сжатые строки
+            keys = sorted(set(i*size + j for i, j in zip(rows, cols)))
+            index = {key: n for n, key in enumerate(keys)}
+            plan.slots.extend(index[i*size + j] for i, j in zip(rows, cols))
+            plan.indices = [key % size for key in keys]
+            plan.indptr = [0]*(size + 1)
+            for key in keys:
+                plan.indptr[key//size + 1] += 1
+            plan.indptr = list(accumulate(plan.indptr))
+            plan.nnz = len(keys)
+        return plan
+
+    def assemble(self, plan: AssemblyPlan, values=None):
+        """
+        Собрать глобальную матрицу жёсткости по готовому плану:
+        жёсткости элементов только умножаются на множители плана
+        и складываются в заранее известные места
+        plan    : план сборки (assembly_plan)
+        values  : жёсткости элементов по порядку items - EA для
+                  стержня, C для пружинки (как TrussArrays.k);
+                  None - взять из текущих элементов
+        """
+        if values is None:
+            values = self.gather_arrays().k
+        if len(values) != plan.count:
+            raise Exception(f'План сборки рассчитан на {plan.count} элементов, '
+                            f'передано жёсткостей: {len(values)}')
+
+        if numpy is not None:
+            k = numpy.asarray(values, dtype=float)/numpy.frombuffer(plan.divisor)
+            weights = numpy.frombuffer(plan.coef)*k[numpy.frombuffer(plan.owner, dtype=plan.owner.typecode)]
+            data = numpy.bincount(numpy.frombuffer(plan.slots, dtype=plan.slots.typecode),
+                                  weights=weights, minlength=plan.nnz)
+            if plan.ndigits is not None:
+                data = numpy.round(data, plan.ndigits)
+            data = data.tolist()
+        else:
+            k = [value/divisor for value, divisor in zip(values, plan.divisor)]
+            data = [0]*plan.nnz
+            for slot, e, coef in zip(plan.slots, plan.owner, plan.coef):
+                data[slot] += coef*k[e]
+            if plan.ndigits is not None:
+                data = [round(value, plan.ndigits) for value in data]
+
+        if plan.fmt == 'sparse':
+            return matan.SparseMatrix.from_csr((plan.size, plan.size),
+                                               plan.indptr, plan.indices, data)
+        if plan.fmt == 'skyline':
+            matrix = matan.SkylineMatrix(plan.first)
+            matrix._data = array('d', data)
+            return matrix
+        matrix = matan.Matrix(size=plan.size, filler=0)
+        matrix.set_flat(slice(None), data)
+        return matrix
+
+    def get_K(self, fmt='sparse', method='batch', ndigits=None):
+        """
+        Глобальная матрица жётскости в нужном формате
+        fmt     : 'sparse'  - разреженная матрица SparseMatrix
+                  'skyline' - профильная симметричная матрица SkylineMatrix
+                  'dense'   - плотная матрица Matrix
+        method  : 'batch' - пакетная сборка по плоским массивам (быстро)
+                  'loop'  - поэлементная сборка по матрицам el.K
+        ndigits : до скольки знаков округлять косинусы в матрицах
+                  элементов и суммы в глобальной матрице (так считали
+                  раньше), None - полная точность
+        """
+        if fmt not in ('sparse', 'skyline', 'dense'):
+            raise Exception(f'Неизвестный формат матрицы жёсткости {fmt}')
+        if method == 'batch':
+            return self._get_K_batch(fmt, ndigits)
+        if method != 'loop':
+            raise Exception(f'Неизвестный метод сборки {method}')
+
+        # Размер матрицы
+        size = len(self.grid)*2
         # Создаём заготовку под матрицу
-        matrix = matan.Matrix(size=len(self.grid)*2, filler=0)
+        if fmt == 'sparse':
+            # Узел связан только с соседями, поэтому хранить все
+            # (2n)^2 элементов не нужно
+            matrix = matan.SparseMatrix(size=size)
+        elif fmt == 'skyline':
+            # Храним только профиль верхнего треугольника
+            matrix = matan.SkylineMatrix(self.skyline_first())
+        elif fmt == 'dense':
+            matrix = matan.Matrix(size=size, filler=0)
+        else:
+            raise Exception(f'Неизвестный формат матрицы жёсткости {fmt}')
 
         # Обходим все конечные элементы конструкции
         for el in self.items:
@@ -454,79 +1508,91 @@ class LineStructure(FiniteElement):
             v1 = u1 + 1
             u2 = el.n2.pos*2
             v2 = u2 + 1
+            dofs = (u1, v1, u2, v2)
+            # Матрицу жёсткости элемента берём один раз
+            # и читаем её элементы напрямую из плоского хранилища
+            if ndigits is None:
+                K_el = el._shared_K
+            else:
+                K_el = simple_K(el.cos_a, el.sin_a, ndigits)*el.stiffness
             # Добавляем элементы матрицы жёсткости к глобальной
-            matrix[u1, u1] += el.K[0, 0]
-            matrix[u1, v1] += el.K[0, 1]
-            matrix[u1, u2] += el.K[0, 2]
-            matrix[u1, v2] += el.K[0, 3]
-
-            matrix[v1, u1] += el.K[1, 0]
-            matrix[v1, v1] += el.K[1, 1]
-            matrix[v1, u2] += el.K[1, 2]
-            matrix[v1, v2] += el.K[1, 3]
-
-            matrix[u2, u1] += el.K[2, 0]
-            matrix[u2, v1] += el.K[2, 1]
-            matrix[u2, u2] += el.K[2, 2]
-            matrix[u2, v2] += el.K[2, 3]
-
-            matrix[v2, u1] += el.K[3, 0]
-            matrix[v2, v1] += el.K[3, 1]
-            matrix[v2, u2] += el.K[3, 2]
-            matrix[v2, v2] += el.K[3, 3]
-
-        # Теперь округляем все элементы матрицы жеёсткости с точностью
-        # До второго знака после запятой
-        for i in range(matrix.rows):
-            for j in range(matrix.cols):
-                matrix[i, j] = round(matrix[i, j], 2)
+            for r in range(4):
+                for c in range(4):
+                    k = K_el.get_flat(r*4 + c)
+                    if fmt == 'sparse':
+                        # Одинаковые позиции сложатся при сжатии матрицы
+                        matrix.add(dofs[r], dofs[c], k)
+                    elif fmt == 'skyline':
+                        # Симметричную пару добавляем только один раз
+                        if r <= c:
+                            matrix.add(dofs[r], dofs[c], k)
+                    else:
+                        matrix[dofs[r], dofs[c]] += k
+
+        # Округляем только по запросу: для разреженной и профильной
+        # матриц - только хранимые элементы
+        if ndigits is not None:
+            if fmt == 'dense':
+                matrix.set_flat(slice(None), [round(value, ndigits)
+                                              for value in matrix.get_flat(slice(None))])
+            else:
+                matrix = round(matrix, ndigits)
 
         # Возвращаем глобальную матрицу
         return matrix
 
     @property
-    def f(self):
-        """Вектор известных узловых сил"""
-        # Заготовка для вектора
-        vector = matan.Matrix(rows=len(self.grid*2), filler=0)
-
-        # Обходим все узлы системы
-        for i in range(len(self.grid)):
-            # В каждом узле обходим и суммируем все силы, приложенные в этом узле
-            # Сумма проекций вдоль оси x
-            sum_Fx = sum(F.x for F in self.grid[i].forces)
-            # Сумма проекций вдоль оси y
-            sum_Fy = sum(F.y for F in self.grid[i].forces)
-            # Заполняем вектор столбец
-            vector[i*2] += sum_Fx
-            vector[i*2+1] += sum_Fy
-
-        # Добавляем распределённые нагрузки
-        # Обходим все элементы системы
+    def K(self):
+        """
+        Глобальная матрица жётскости (разреженная)
+        Собирается один раз, дальше обновляется только изменениями
+        конструкции; возвращается копия
+        """
+        size = len(self.grid)*2
+        # Собираем заново, если собранной матрицы нет или элементы
+        # и узлы менялись в обход конструкции
+        if (self._K_cols is None or self._K_count != len(self.items)
+                or len(self._K_cols) > size):
+            self._build_K_rows()
+        self._K_resize()
+        # Сжатые строки склеиваем только после изменений
+        if self._K_cache is None:
+            self._K_cache = matan.SparseMatrix.from_csr(
+                (size, size), [0, *accumulate(map(len, self._K_cols))],
+                chain.from_iterable(self._K_cols), chain.from_iterable(self._K_vals))
+        return self._K_cache.copy()
+
+    def _build_K_rows(self):
+        """Собрать матрицу жёсткости по строкам заново (пакетной сборкой)"""
+        raw = self._get_K_batch('sparse')
+        raw._compress()
+        indptr, indices, data = raw._indptr, raw._indices, raw._data
+        self._K_cols = [indices[indptr[i]:indptr[i+1]] for i in range(raw.rows)]
+        self._K_vals = [data[indptr[i]:indptr[i+1]] for i in range(raw.rows)]
+        self._K_count = len(self.items)
+        self._K_cache = None
         for el in self.items:
-            # Проверяем приложены ли распределёнки в текущем элементе
-            if el.q:
-                # Если они приложены находим индексы узлов элемента
-                N1 = el.n1.pos
-                N2 = el.n2.pos
-                # Проходим все распределённые нагрузки на текущем элементе
-                for q1, q2 in el.q:
-                    # Распределённые нагрузки заменяем на точечные, приложенные
-                    # К узлам элеммента
-                    # Вычисляем нагрузки в начале элемента
-                    f1x = (el.Lx/2)*(q1.x*2/3 + q2.x*1/3)
-                    f1y = (el.Ly/2)*(q1.y*2/3 + q2.y*1/3)
-                    # Вычисляем нагрузки в конце элемента
-                    f2x = (el.Lx/2)*(q1.x*1/3 + q2.x*2/3)
-                    f2y = (el.Ly/2)*(q1.y*1/3 + q2.y*2/3)
-
-                    # Добавляем получаенные усилия к вектору усилий
-                    vector[N1*2] += f1x
-                    vector[N1*2+1] += f1y
-                    vector[N2*2] += f2x
-                    vector[N2*2+1] += f2y
-
-        # Возвращаем вектор известных узловых сил
+            el._owner = self
+            el.n1._owner = self
+            el.n2._owner = self
+
+    @property
+    def f(self):
+        """
+        Вектор известных узловых сил
+        Собирается один раз по плоским массивам нагрузок (load_vector),
+        дальше обновляется только новыми нагрузками: add_point_force,
+        add_linear_distributed_force и присваиванием node.forces или el.q
+        Изменения на месте (node.forces.append(F), F.x = 2, el.q[0][1] = F)
+        конструкция не видит - после них f устарел, пока не вызван invalidate()
+        """
+        if self._f_cache is None or not self._f_cache_valid():
+            if self._loads is None:
+                self._loads = self.gather_loads()
+            x, y = self._node_coordinates()
+            self._f_cache = load_vector(self._loads, x, y, len(self.grid)*2)
+        vector = matan.Matrix(rows=len(self._f_cache), filler=0)
+        vector.set_flat(slice(None), self._f_cache)
         return vector
 
     @f.setter
@@ -538,11 +1604,26 @@ class LineStructure(FiniteElement):
 
     @property
     def q(self):
-        """Вектор неизвестных узловых перемещений"""
+        """
+        Вектор неизвестных узловых перемещений
+        Собирается один раз, дальше обновляется изменениями узлов
+        """
+        if self._q_cache is None or not self._q_cache_valid():
+            self._q_cache = self._build_q().to_list()
+        # Вектор из строк и чисел - храним его списком
+        return matan.Matrix._from_flat(len(self._q_cache), 1, list(self._q_cache))
+
+    def _build_q(self):
+        """Собрать вектор неизвестных узловых перемещений заново"""
         # Заготовка для вектора
-        vector = matan.Matrix(rows=len(self.grid*2), filler=0)
+        vector = matan.Matrix(rows=len(self.grid)*2, filler=0)
         # Обходим все узлы
         for i in range(len(self.grid)):
+            # В заделке перемещения заданы - записываем их значения
+            if self.grid[i].pinned:
+                vector[i*2] = self.grid[i].u
+                vector[i*2+1] = self.grid[i].v
+                continue
             # В каждом узле смотрим на перемещение
             # Если перемещение не нулевое, то есть нет заделки
             if self.grid[i].u != 0:
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""Тесты модуля calc - расчёт конструкций"""
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from fem import LineStructure, Distance, Force
+from fem import FEMComput
+from fem import load_model, save_model
+from fem.calc import ElementOperator
+from fem.columnar import ColumnarStructure
+from fem.matan import Matrix, SparseMatrix, SkylineFactor, find_with_gauss
+
+
+def oleg_model():
+    """Конструкция Олегатора: три стержня и пружинка"""
+    ls = LineStructure()
+    rod1 = ls.add_rod(E=1, A=1, D=Distance(1))
+    rod2 = ls.add_rod(E=1, A=1, n1=rod1.n2, D=Distance(1))
+    rod3 = ls.add_rod(E=1, A=1, n1=rod2.n2, D=Distance(1))
+    spring1 = ls.add_spring(C=2, n1=rod2.n2, D=Distance(1))
+    # Заделки в начале и на конце пружинки
+    ls.add_pinning(rod1.n1)
+    spring1.n2.add_pinning()
+    # Точечные усилия
+    ls.add_point_force(rod1.n2, Force(-2))
+    rod3.n2.add_point_force(Force(3))
+    return ls
+
+
+def shuffled_chain(n=20):
+    """Цепочка стержней с перемешанной нумерацией узлов"""
+    ls = LineStructure()
+    rod = ls.add_rod(E=1, A=1, D=Distance(1))
+    ls.add_pinning(rod.n1)
+    for _ in range(n-1):
+        rod = ls.add_rod(E=1, A=1, n1=rod.n2, D=Distance(1))
+    ls.add_point_force(rod.n2, Force(1))
+    # Нумерация через одного: чётные узлы, потом нечётные
+    ls.grid = ls.grid[::2] + ls.grid[1::2]
+    for i, node in enumerate(ls.grid):
+        node.pos = i
+    return ls
+
+
+class TestFEMComput(unittest.TestCase):
+    """Тестирование расчёта конструкции"""
+
+    def setUp(self):
+        self.comp = FEMComput(oleg_model())
+        self.comp.enter_boundary_conditions()
+
+    def assertVectorsEqual(self, a, b):
+        """Сравнить два вектора столбца с точностью до округления"""
+        for x, y in zip(a.to_list(), b.to_list()):
+            self.assertAlmostEqual(x, y)
+
+    def test_find_q(self):
+        """Перемещения совпадают с методом Гаусса"""
+        res = find_with_gauss(self.comp.K, self.comp.f)
+        self.assertVectorsEqual(self.comp.find_q(), res)
+
+    def test_find_q_other_f(self):
+        """Решение для другого вектора усилий по готовому разложению"""
+        q = self.comp.find_q()
+        f2 = Matrix([x*2 for x in self.comp.f.to_list()])
+        self.assertVectorsEqual(self.comp.find_q(f=f2), q*2)
+        # Кешированное решение не должно измениться
+        self.assertVectorsEqual(self.comp.find_q(), q)
+
+    def test_solvers_agree(self):
+        """LU и LDL^T дают одинаковые перемещения"""
+        q_lu = self.comp.find_q(solver='lu')
+        q_ldlt = self.comp.find_q(solver='ldlt')
+        self.assertVectorsEqual(q_lu, q_ldlt)
+
+    def test_sparse_factor(self):
+        """Разреженная K раскладывается в профиле, а не плотной матрицей"""
+        self.assertIsInstance(self.comp.K, SparseMatrix)
+        q = self.comp.find_q(solver='lu')
+        for solver in ('auto', 'ldlt'):
+            self.assertVectorsEqual(self.comp.find_q(recalculate=True, solver=solver), q)
+            self.assertIsInstance(self.comp._factor, SkylineFactor)
+
+    def test_cg_solver(self):
+        """Метод сопряжённых градиентов совпадает с прямым решением"""
+        q = self.comp.find_q()
+        for precond in ('jacobi', 'ssor', 'ic0'):
+            self.comp.cg_precond = precond
+            q_cg = self.comp.find_q(recalculate=True, solver='cg')
+            self.assertVectorsEqual(q_cg, q)
+            self.assertTrue(self.comp.cg_info['converged'])
+
+    def test_matrix_free(self):
+        """Без сборки K получаются те же перемещения"""
+        comp = FEMComput(oleg_model(), fmt='matrix-free')
+        self.assertIsInstance(comp.K, ElementOperator)
+        comp.enter_boundary_conditions()
+        # Произведение K*x совпадает с собранной матрицей
+        x = list(range(1, comp.height + 1))
+        self.assertVectorsEqual(Matrix(comp.K.matvec(x)),
+                                Matrix(self.comp.K.matvec(x)))
+        self.assertEqual(comp.K.diagonal(), self.comp.K.diagonal())
+        self.assertVectorsEqual(comp.find_q(), self.comp.find_q())
+        with self.assertRaises(Exception):
+            comp.find_q(solver='lu')
+
+    def test_reduce(self):
+        """Исключение закреплённых степеней свободы даёт те же перемещения"""
+        q = self.comp.find_q()
+        for fmt in ('sparse', 'skyline', 'dense'):
+            comp = FEMComput(oleg_model(), fmt=fmt)
+            comp.enter_boundary_conditions(method='reduce')
+            # 10 степеней свободы: 4 закреплены, 3 вертикальных пустые
+            self.assertEqual(comp.K_free.size, 3)
+            for solver in ('auto', 'lu', 'cg'):
+                self.assertVectorsEqual(comp.find_q(recalculate=True, solver=solver), q)
+            # K и f не меняются
+            self.assertEqual(comp.f.to_list(), oleg_model().f.to_list())
+            f2 = Matrix([x*2 for x in comp.f.to_list()])
+            self.assertVectorsEqual(comp.find_q(f=f2), q*2)
+
+    def test_reduce_errors(self):
+        """Неизвестный метод и исключение без сборки K"""
+        with self.assertRaises(Exception):
+            FEMComput(oleg_model()).enter_boundary_conditions(method='penalty')
+        with self.assertRaises(Exception):
+            FEMComput(oleg_model(), fmt='matrix-free').enter_boundary_conditions(method='reduce')
+
+    def test_skyline_format(self):
+        """Профильная матрица даёт те же перемещения"""
+        comp = FEMComput(oleg_model(), fmt='skyline')
+        comp.enter_boundary_conditions()
+        self.assertVectorsEqual(comp.find_q(), self.comp.find_q())
+
+
+def settled_chain(n=4, settlement=0.4):
+    """Цепочка из n стержней: правая опора осела на settlement"""
+    ls = LineStructure()
+    rod = ls.add_rod(E=1, A=1, D=Distance(1))
+    ls.add_pinning(rod.n1)
+    for _ in range(n-1):
+        rod = ls.add_rod(E=1, A=1, n1=rod.n2, D=Distance(1))
+    ls.add_pinning(rod.n2, u=settlement)
+    # Сила во втором узле
+    ls.add_point_force(ls.grid[1], Force(1))
+    return ls
+
+
+class TestPrescribed(unittest.TestCase):
+    """Тестирование заданных ненулевых перемещений (осадки опоры)"""
+
+    def expected(self, n=4, settlement=0.4):
+        """
+        Точное решение: осадка даёт линейное поле перемещений,
+        сила F=1 в узле 1 - u_k = (n-1)/n*k до узла 1 и (n-k)/n после
+        """
+        return [settlement*k/n + (k*(n-1)/n if k <= 1 else (n-k)/n)
+                for k in range(n+1)]
+
+    def assertDisplacements(self, q, expected):
+        q = q.to_list()
+        for k, u in enumerate(expected):
+            self.assertAlmostEqual(q[2*k], u)
+            self.assertEqual(q[2*k+1], 0)
+
+    def test_q_vector(self):
+        """В векторе q заделки - заданные значения"""
+        ls = settled_chain()
+        self.assertEqual(ls.q.to_list()[-2:], [0.4, 0])
+        self.assertEqual(ls.q.to_list(), ls._build_q().to_list())
+        self.assertTrue(ls.grid[-1].pinned)
+        self.assertFalse(ls.grid[1].pinned)
+
+    def test_formats(self):
+        """Все форматы K и оба метода граничных условий"""
+        expected = self.expected()
+        for fmt in ('sparse', 'skyline', 'dense', 'matrix-free'):
+            comp = FEMComput(settled_chain(), fmt=fmt)
+            comp.enter_boundary_conditions()
+            self.assertDisplacements(comp.find_q(), expected)
+            if fmt == 'matrix-free':
+                continue
+            comp = FEMComput(settled_chain(), fmt=fmt)
+            comp.enter_boundary_conditions(method='reduce')
+            self.assertDisplacements(comp.find_q(), expected)
+
+    def test_repeated(self):
+        """Повторный ввод граничных условий не переносит осадку дважды"""
+        expected = self.expected()
+        for fmt in ('sparse', 'skyline', 'dense', 'matrix-free'):
+            methods = (['piano-ayrons', 'piano-ayrons'] if fmt == 'matrix-free' else
+                       ['piano-ayrons', 'piano-ayrons', 'reduce', 'piano-ayrons'])
+            comp = FEMComput(settled_chain(), fmt=fmt)
+            for method in methods:
+                comp.enter_boundary_conditions(method=method)
+                self.assertDisplacements(comp.find_q(recalculate=True), expected)
+
+    def test_other_f(self):
+        """Для другого f осадка тоже учитывается"""
+        for method in ('piano-ayrons', 'reduce'):
+            comp = FEMComput(settled_chain(), fmt='skyline')
+            comp.enter_boundary_conditions(method=method)
+            comp.find_q()
+            f2 = Matrix(rows=comp.height, filler=0)
+            # Без сил остаётся только линейное поле от осадки
+            self.assertDisplacements(comp.find_q(f=f2), [0.1*k for k in range(5)])
+
+    def test_save_load(self):
+        """Осадка сохраняется в файл модели и читается обратно"""
+        file_name = 'settled_model.txt'
+        try:
+            save_model(settled_chain(), file_name)
+            ls = load_model(file_name)
+        finally:
+            os.remove(file_name)
+        self.assertEqual(ls.q.to_list(), settled_chain().q.to_list())
+
+    def test_columnar(self):
+        """Колоночная конструкция хранит заданные перемещения"""
+        cs = ColumnarStructure.from_structure(settled_chain())
+        self.assertEqual(cs.q.to_list(), settled_chain().q.to_list())
+        self.assertEqual(cs.to_structure().q.to_list(), settled_chain().q.to_list())
+
+
+class TestSnapshot(unittest.TestCase):
+    """Тестирование расчёта без копирования конструкции"""
+
+    def test_same_results(self):
+        """Снимок даёт те же результаты, что и расчёт на копии"""
+        def output(comp):
+            buf = io.StringIO()
+            with redirect_stdout(buf):
+                comp.display_results()
+            return buf.getvalue()
+
+        ls = oleg_model()
+        comp = FEMComput(ls)
+        snap = FEMComput(ls, copy=False)
+        self.assertIs(snap.line_struct, ls)
+        self.assertEqual(output(snap), output(comp))
+        self.assertEqual(snap.u, [node.u for node in comp.line_struct.grid])
+        self.assertEqual(snap.v, [node.v for node in comp.line_struct.grid])
+        for el, el_copy in zip(ls.items, comp.line_struct.items):
+            self.assertEqual(snap.aprox_Fx(el), comp.aprox_Fx(el_copy))
+
+    def test_structure_untouched(self):
+        """Перемещения не наносятся на исходную конструкцию"""
+        ls = oleg_model()
+        q = ls.q.to_list()
+        K = ls.K.to_list()
+        snap = FEMComput(ls, copy=False)
+        with self.assertRaises(Exception):
+            snap.aprox_Fx(ls.items[0])
+        snap.enter_boundary_conditions()
+        snap.apply_q_to_structure()
+        self.assertIsNone(ls.grid[1].u)
+        self.assertEqual(ls.q.to_list(), q)
+        self.assertEqual(ls.K.to_list(), K)
+
+
+def add_cases(ls):
+    """Два случая нагружения конструкции Олегатора"""
+    G = ls.add_load_case('G')
+    G.add_point_force(ls.grid[1], Force(1))
+    G.add_linear_distributed_force(ls.items[2], Force(1), Force(2))
+    Q = ls.add_load_case('Q')
+    Q.add_point_force(ls.grid[3], Force(-2))
+    return ls
+
+
+class TestLoadCases(unittest.TestCase):
+    """Тестирование расчёта нескольких случаев нагружения"""
+
+    def single(self, case):
+        """Перемещения и усилия случая отдельным расчётом"""
+        ls = oleg_model()
+        for node in ls.grid:
+            node.forces = []
+        for node, F in case.points:
+            ls.add_point_force(ls.grid[node.pos], F)
+        for el, q1, q2 in case.distributed:
+            ls.add_linear_distributed_force(ls.items[el.pos], q1, q2)
+        comp = FEMComput(ls)
+        comp.enter_boundary_conditions()
+        comp.apply_q_to_structure()
+        return comp.find_q().to_list(), [comp.aprox_Fx(el) for el in comp.line_struct.items]
+
+    def test_same_as_single(self):
+        """Каждый случай совпадает с отдельным расчётом"""
+        ls = add_cases(oleg_model())
+        for fmt, method in (('sparse', 'piano-ayrons'), ('skyline', 'reduce'),
+                            ('dense', 'reduce'), ('matrix-free', 'piano-ayrons')):
+            comp = FEMComput(ls, fmt=fmt, copy=False)
+            comp.enter_boundary_conditions(method=method)
+            results = comp.solve_cases()
+            self.assertIs(results, comp.case_results)
+            self.assertEqual(list(results), ['G', 'Q'])
+            for case in ls.load_cases:
+                q, N = self.single(case)
+                for x, y in zip(results[case.name].q, q):
+                    self.assertAlmostEqual(x, y)
+                for x, y in zip(results[case.name].N, N):
+                    self.assertAlmostEqual(x, y)
+                self.assertEqual(results[case.name].u, results[case.name].q[0::2])
+
+    def test_settlement(self):
+        """Случаи решаются без осадки опоры, осадка - отдельный результат"""
+        ls = settled_chain()
+        G = ls.add_load_case('G')
+        G.add_point_force(ls.grid[1], Force(1))
+        for fmt, method in (('sparse', 'piano-ayrons'), ('skyline', 'reduce'),
+                            ('dense', 'reduce'), ('matrix-free', 'piano-ayrons')):
+            comp = FEMComput(ls, fmt=fmt, copy=False)
+            comp.enter_boundary_conditions(method=method)
+            results = comp.solve_cases()
+            # Сила 1 в узле 1 цепочки из 4 стержней с неподвижными опорами
+            for x, y in zip(results['G'].u, [0, .75, .5, .25, 0]):
+                self.assertAlmostEqual(x, y)
+            # Осадка 0.4 без сил - перемещения по прямой
+            for x, y in zip(comp.settlement.u, [0, .1, .2, .3, .4]):
+                self.assertAlmostEqual(x, y)
+            for x in comp.settlement.N:
+                self.assertAlmostEqual(x, .1)
+        comp = FEMComput(oleg_model())
+        comp.enter_boundary_conditions()
+        comp.solve_cases([add_cases(oleg_model()).load_case('G')])
+        self.assertIsNone(comp.settlement)
+
+    def test_cases_f(self):
+        """Векторы сил случаев - столбцы одной матрицы, в f не входят"""
+        ls = add_cases(oleg_model())
+        F = ls.cases_f()
+        self.assertEqual((F.rows, F.cols), (10, 2))
+        self.assertEqual(F[2, 0], 1)
+        self.assertEqual(F[6, 1], -2)
+        self.assertEqual(ls.f.to_list(), oleg_model().f.to_list())
+
+    def test_errors(self):
+        """Повтор имени, неизвестный случай, расчёт без случаев"""
+        ls = add_cases(oleg_model())
+        with self.assertRaises(Exception):
+            ls.add_load_case('G')
+        with self.assertRaises(Exception):
+            ls.load_case('W')
+        self.assertIs(ls.load_case('Q'), ls.load_cases[1])
+        comp = FEMComput(oleg_model())
+        comp.enter_boundary_conditions()
+        with self.assertRaises(Exception):
+            comp.solve_cases()
+
+
+class TestCombinations(unittest.TestCase):
+    """Тестирование сочетаний нагрузок и огибающих"""
+
+    def setUp(self):
+        self.ls = add_cases(oleg_model())
+        self.comp = FEMComput(self.ls, copy=False)
+        self.comp.enter_boundary_conditions()
+        self.comp.solve_cases()
+
+    def test_combine(self):
+        """Сочетание совпадает с расчётом случая с умноженными нагрузками"""
+        combo = self.comp.combine({'G': 1.35, 'Q': 1.5})
+        self.assertEqual(combo.name, '1.35*G + 1.5*Q')
+        ls = add_cases(oleg_model())
+        case = ls.add_load_case('1.35G+1.5Q')
+        def scaled(F, c):
+            return Force(F.x*c, F.y*c)
+
+        for name, c in (('G', 1.35), ('Q', 1.5)):
+            for node, F in ls.load_case(name).points:
+                case.add_point_force(node, scaled(F, c))
+            for el, q1, q2 in ls.load_case(name).distributed:
+                case.add_linear_distributed_force(el, scaled(q1, c), scaled(q2, c))
+        comp = FEMComput(ls)
+        comp.enter_boundary_conditions()
+        expected = comp.solve_cases([case])['1.35G+1.5Q']
+        for x, y in zip(combo.q, expected.q):
+            self.assertAlmostEqual(x, y)
+        for x, y in zip(combo.N, expected.N):
+            self.assertAlmostEqual(x, y)
+
+    def test_envelope(self):
+        """Огибающие - поэлементные минимумы и максимумы сочетаний"""
+        combinations = {'1': {'G': 1.35, 'Q': 1.5}, '2': {'G': 1.0},
+                        '3': {'G': 1.0, 'Q': -1.5}}
+        env = self.comp.envelope(combinations)
+        self.assertEqual(env.count, 3)
+        results = [self.comp.combine(factors) for factors in combinations.values()]
+        for i in range(len(self.ls.items)):
+            self.assertEqual(env.N_min[i], min(res.N[i] for res in results))
+            self.assertEqual(env.N_max[i], max(res.N[i] for res in results))
+        for i in range(self.comp.height):
+            self.assertEqual(env.q_min[i], min(res.q[i] for res in results))
+            self.assertEqual(env.q_max[i], max(res.q[i] for res in results))
+        # Генератор сочетаний тоже подходит
+        env2 = self.comp.envelope(factors for factors in combinations.values())
+        self.assertEqual(env2, env)
+
+    def test_settlement(self):
+        """Осадка опоры входит в сочетание один раз, без коэффициента"""
+        ls = settled_chain()
+        G = ls.add_load_case('G')
+        G.add_point_force(ls.grid[1], Force(1))
+        for method in ('piano-ayrons', 'reduce'):
+            comp = FEMComput(ls, copy=False)
+            comp.enter_boundary_conditions(method=method)
+            comp.solve_cases()
+            combo = comp.combine({'G': 2.0})
+            # 2*(0.75, 0.5, 0.25) от силы + (0.1, 0.2, 0.3) от осадки
+            for x, y in zip(combo.u, [0, 1.6, 1.2, .8, .4]):
+                self.assertAlmostEqual(x, y)
+            for x, y in zip(combo.N, [1.6, -.4, -.4, -.4]):
+                self.assertAlmostEqual(x, y)
+            env = comp.envelope([{'G': 2.0}, {'G': 0.5}])
+            self.assertAlmostEqual(env.q_min[-2], .4)
+            self.assertAlmostEqual(env.q_max[-2], .4)
+
+    def test_errors(self):
+        """Неизвестный случай, пустые сочетания, нерассчитанные случаи"""
+        with self.assertRaises(Exception):
+            self.comp.combine({'W': 1.0})
+        with self.assertRaises(Exception):
+            self.comp.combine({})
+        with self.assertRaises(Exception):
+            self.comp.envelope([])
+        with self.assertRaises(Exception):
+            FEMComput(self.ls).combine({'G': 1.0})
+
+
+class TestRenumber(unittest.TestCase):
+    """Тестирование перенумерации узлов"""
+
+    def test_rcm_reduces_profile(self):
+        """RCM уменьшает ширину ленты и профиль"""
+        ls = shuffled_chain()
+        report = ls.renumber()
+        self.assertEqual(report['method'], 'rcm')
+        self.assertEqual(report['bandwidth'][1], 3)
+        self.assertLess(report['profile'][1], report['profile'][0])
+        self.assertEqual(report['bandwidth'][1], ls.bandwidth())
+        self.assertEqual(report['profile'][1], ls.profile())
+        # Позиции узлов совпадают с их индексами
+        for i, node in enumerate(ls.grid):
+            self.assertEqual(node.pos, i)
+
+    def test_same_displacements(self):
+        """Перемещения узлов не зависят от нумерации"""
+        def displacements(ls):
+            comp = FEMComput(ls, fmt='skyline')
+            comp.enter_boundary_conditions()
+            comp.find_q()
+            comp.apply_q_to_structure()
+            return {(node.x, node.y): node.u for node in comp.line_struct.grid}
+
+        before = displacements(shuffled_chain())
+        ls = shuffled_chain()
+        ls.renumber()
+        after = displacements(ls)
+        for key, u in before.items():
+            self.assertAlmostEqual(after[key], u)
+
+    def test_unknown_method(self):
+        """Неизвестный метод перенумерации"""
+        with self.assertRaises(Exception):
+            shuffled_chain().renumber(method='amd')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,18 @@
 """Тесты модуля matan"""
 import unittest
 import random
-from fem.matan import Matrix
+from array import array
+from fem import matan
+from fem.matan import Matrix, SparseMatrix
+from fem.matan import find_with_gauss, lu_factor
+from fem.matan import ldlt_factor, is_symmetric
+from fem.matan import SkylineMatrix, skyline_factor
+from fem.matan import cg_solve, CGSolver
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestMatrixOperations(unittest.TestCase):
@@ -190,6 +201,35 @@ class TestMatrixOperations(unittest.TestCase):
         msg = f"\n{m}НЕ РАВНО \n{res}"
         self.assertEqual(m, res, msg)
 
+    def test_div_matrix_by_num(self):
+        """Деление матрицы на число"""
+        m = Matrix([[2, 4], [6, 8]])
+        res = Matrix([[1, 2], [3, 4]])
+        msg = f"\n{m}разделить на 2 НЕ РАВНО\n{res}"
+        self.assertEqual(m / 2, res, msg)
+
+    def test_inplace_operations(self):
+        """Операции на месте не создают новую матрицу"""
+        m = Matrix([[1, 2], [3, 4]])
+        m_id = id(m)
+        m += Matrix([[1, 1], [1, 1]])
+        m -= Matrix([[0, 1], [0, 1]])
+        m *= 3
+        m /= 2
+        res = Matrix([[3, 3], [6, 6]])
+        msg = f"\n{m}НЕ РАВНО \n{res}"
+        self.assertEqual(m, res, msg)
+        self.assertEqual(id(m), m_id)
+
+    def test_inplace_matrix_rows(self):
+        """Операции на месте со строками матрицы"""
+        m = Matrix([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        m[2] -= m[0]
+        m[1] += m[1]
+        res = Matrix([[1, 2, 3], [8, 10, 12], [6, 6, 6]])
+        msg = f"\n{m}НЕ РАВНО \n{res}"
+        self.assertEqual(m, res, msg)
+
     def test_compare_matrix_row_and_separate_row(self):
         """Cравнить строку матрицы и отдельную строку"""
         m = Matrix([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
@@ -319,5 +359,396 @@ class TestMatrixOperations(unittest.TestCase):
                 self.assertEqual(num, m[i, j], msg)
 
 
+@unittest.skipIf(numpy is None, 'numpy не установлен')
+class TestMatrixOperationsNumpy(TestMatrixOperations):
+    """Те же операции с матрицами, но на бэкенде numpy"""
+
+    def setUp(self):
+        # Запоминаем текущий бэкенд и переключаемся на numpy
+        self.backend = matan.get_backend()
+        matan.set_backend('numpy')
+
+    def tearDown(self):
+        # Возвращаем бэкенд, который был до теста
+        matan.set_backend(self.backend)
+
+    def test_numpy_storage(self):
+        """Матрицы хранятся в ndarray, а строки в них тоже можно записать"""
+        m = Matrix([[1, 2], [3, 4]])
+        self.assertIsInstance(m.get_flat(slice(None)), numpy.ndarray)
+        self.assertEqual(m.transpose(), Matrix([[1, 3], [2, 4]]))
+        q = Matrix(rows=2, filler=0)
+        q[1] = 'u1'
+        self.assertEqual(q.to_list(), [0, 'u1'])
+
+
+class TestSparseMatrix(unittest.TestCase):
+    """Тестирование разреженной матрицы"""
+
+    def test_assemble_duplicates(self):
+        """Повторяющиеся позиции при сборке складываются"""
+        m = SparseMatrix(size=3)
+        m.add(0, 0, 1)
+        m.add(2, 1, 5)
+        m.add(0, 0, 2)
+        res = Matrix([[3, 0, 0], [0, 0, 0], [0, 5, 0]])
+        msg = f"\n{m}НЕ РАВНО \n{res}"
+        self.assertEqual(m, res, msg)
+        # Хранятся только ненулевые элементы
+        self.assertEqual(m.nnz, 2)
+
+    def test_to_skyline(self):
+        """Профиль по верхнему треугольнику симметричной матрицы"""
+        m = SparseMatrix([[4, 0, 1], [0, 2, 0], [1, 0, 3]])
+        sky = m.to_skyline()
+        self.assertIsInstance(sky, SkylineMatrix)
+        self.assertEqual(sky.to_list(), m.to_list())
+        self.assertEqual(sky.profile, 5)
+        with self.assertRaises(Exception):
+            SparseMatrix(rows=2, cols=3).to_skyline()
+
+    def test_get_set_element(self):
+        """Получение и присвоение элемента как у Matrix"""
+        m = SparseMatrix([[1, 0], [0, 4]])
+        m[0, 1] = 2
+        m[1][0] = 3
+        m[1, 1] += 1
+        res = Matrix([[1, 2], [3, 5]])
+        msg = f"\n{m}НЕ РАВНО \n{res}"
+        self.assertEqual(m, res, msg)
+        # Присвоение нуля отсутствующему элементу ничего не хранит
+        m2 = SparseMatrix(size=2)
+        m2[0, 1] = 0
+        self.assertEqual(m2.nnz, 0)
+
+    def test_mult_by_col(self):
+        """Умножение разреженной матрицы на столбец"""
+        A = SparseMatrix([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        col = Matrix([1, 2, 3])
+        res = Matrix([14, 32, 50])
+        msg = f"\n{A * col} НЕ РАВНО\n{res}"
+        self.assertEqual(A * col, res, msg)
+
+    def test_mult_sparse_and_num(self):
+        """Умножение разреженных матриц и на число"""
+        A = SparseMatrix([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        res = Matrix([[30, 36, 42], [66, 81, 96], [102, 126, 150]])
+        msg = f"\n{A * A} НЕ РАВНО\n{res}"
+        self.assertEqual(A * A, res, msg)
+        res = Matrix([[2, 4, 6], [8, 10, 12], [14, 16, 18]])
+        self.assertEqual(A * 2, res)
+
+    def test_add_sparse(self):
+        """Сложение разреженных матриц"""
+        A = SparseMatrix([[1, 0], [0, 4]])
+        B = SparseMatrix([[0, 2], [0, -4]])
+        res = Matrix([[1, 2], [0, 0]])
+        self.assertEqual(A + B, res)
+        with self.assertRaises(Exception):
+            # несоразмерные матрицы нельзя складывать
+            A + SparseMatrix(size=3)
+
+
+class TestCompactStorage(unittest.TestCase):
+    """Тестирование компактного хранилища матрицы"""
+
+    def test_array_storage(self):
+        """Матрица поверх array('d') ведёт себя как обычная"""
+        m = Matrix([[1, 2], [3, 4]], storage='array')
+        self.assertEqual(m.storage, 'array')
+        m[0, 1] = 5
+        m[1] *= 2
+        res = Matrix([[1, 5], [6, 8]])
+        msg = f"\n{m}НЕ РАВНО \n{res}"
+        self.assertEqual(m, res, msg)
+
+    def test_from_buffer(self):
+        """Матрица поверх буфера не копирует данные"""
+        buf = array('d', [1, 2, 3, 4])
+        m = Matrix.from_buffer(buf, rows=2, cols=2)
+        m[1, 0] = 7
+        self.assertEqual(buf[2], 7)
+        self.assertEqual(m, Matrix([[1, 2], [7, 4]]))
+
+    def test_flat_access(self):
+        """Доступ к одномерному представлению матрицы"""
+        m = Matrix([[1, 2, 3], [4, 5, 6]], storage='array')
+        self.assertEqual(m.get_flat(4), m[1, 1])
+        m.set_flat(slice(3, 6), [7, 8, 9])
+        self.assertEqual(list(m.get_flat(slice(3, 6))), [7, 8, 9])
+
+    def test_find_with_gauss(self):
+        """Решение системы с нулём на диагонали"""
+        A = Matrix([[0, 2, 1], [1, 1, 0], [2, 0, 3]])
+        Y = Matrix([7, 3, 11])
+        X = find_with_gauss(A, Y)
+        for x, res in zip(X.to_list(), [1, 2, 3]):
+            self.assertAlmostEqual(x, res)
+
+
+class TestLUFactor(unittest.TestCase):
+    """Тестирование LU-разложения"""
+
+    def setUp(self):
+        # Система с нулём на диагонали, решение [1, 2, 3]
+        self.A = Matrix([[0, 2, 1], [1, 1, 0], [2, 0, 3]])
+        self.Y = Matrix([7, 3, 11])
+
+    def test_solve(self):
+        """Решение системы через LU-разложение"""
+        X = lu_factor(self.A).solve(self.Y)
+        for x, res in zip(X.to_list(), [1, 2, 3]):
+            self.assertAlmostEqual(x, res)
+        # Исходная матрица не должна измениться
+        self.assertEqual(self.A, Matrix([[0, 2, 1], [1, 1, 0], [2, 0, 3]]))
+
+    def test_solve_many(self):
+        """Решение сразу для нескольких правых частей"""
+        B = Matrix([[7, 14], [3, 6], [11, 22]])
+        X = lu_factor(self.A).solve_many(B)
+        res = [[1, 2], [2, 4], [3, 6]]
+        for row, row_res in zip(X.to_list(), res):
+            for x, x_res in zip(row, row_res):
+                self.assertAlmostEqual(x, x_res)
+
+    def test_singular(self):
+        """Вырожденную матрицу разложить нельзя"""
+        with self.assertRaises(Exception):
+            lu_factor(Matrix([[1, 2], [2, 4]]))
+
+
+class TestLDLFactor(unittest.TestCase):
+    """Тестирование LDL^T-разложения симметричной матрицы"""
+
+    def setUp(self):
+        # Симметричная положительно определённая система, решение [1, 2, 3]
+        self.A = Matrix([[4, 1, 0], [1, 3, 1], [0, 1, 2]])
+        self.Y = Matrix([6, 10, 8])
+
+    def test_is_symmetric(self):
+        """Проверка симметричности плотной и разреженной матриц"""
+        self.assertTrue(is_symmetric(self.A))
+        self.assertTrue(is_symmetric(SparseMatrix(self.A.to_list())))
+        self.assertFalse(is_symmetric(Matrix([[1, 2], [3, 4]])))
+        self.assertFalse(is_symmetric(SparseMatrix([[1, 2], [0, 4]])))
+
+    def test_solve(self):
+        """Решение системы через LDL^T-разложение"""
+        for A in (self.A, SparseMatrix(self.A.to_list())):
+            X = ldlt_factor(A).solve(self.Y)
+            for x, res in zip(X.to_list(), [1, 2, 3]):
+                self.assertAlmostEqual(x, res)
+
+    def test_reads_upper_triangle(self):
+        """Нижний треугольник матрицы не читается"""
+        A = Matrix([[4, 1, 0], [100, 3, 1], [100, 100, 2]])
+        X = ldlt_factor(A).solve(self.Y)
+        for x, res in zip(X.to_list(), [1, 2, 3]):
+            self.assertAlmostEqual(x, res)
+
+    def test_indefinite(self):
+        """Знаконеопределённая матрица раскладывается на обоих бэкендах"""
+        backend = matan.get_backend()
+        try:
+            for name in ('python', 'numpy'):
+                matan.set_backend(name)
+                # Собственные значения 3, -1, 1 - не положительно определена
+                A = Matrix([[1, 2, 0], [2, 1, 0], [0, 0, 1]])
+                factor = ldlt_factor(A)
+                X = factor.solve(Matrix([5, 4, 3]))
+                for x, res in zip(X.to_list(), [1, 2, 3]):
+                    self.assertAlmostEqual(x, res)
+                X = factor.solve_many(Matrix([[5, 10], [4, 8], [3, 6]]))
+                for x, res in zip(X.get_flat(slice(None)), [1, 2, 2, 4, 3, 6]):
+                    self.assertAlmostEqual(x, res)
+                # Нулевой ведущий элемент - ошибка на обоих бэкендах
+                with self.assertRaises(Exception):
+                    ldlt_factor(Matrix([[0, 1], [1, 0]]))
+        finally:
+            matan.set_backend(backend)
+
+
+class TestSkylineMatrix(unittest.TestCase):
+    """Тестирование профильной матрицы"""
+
+    def setUp(self):
+        # Ленточная симметричная матрица, решение [1, 2, 3, 4]
+        self.dense = Matrix([[2, -1, 0, 0], [-1, 2, -1, 0], [0, -1, 2, -1], [0, 0, -1, 2]])
+        self.Y = Matrix([0, 0, 0, 5])
+        self.A = SkylineMatrix([0, 0, 1, 2])
+        for j in range(4):
+            self.A.add(j, j, 2)
+            if j > 0:
+                self.A.add(j-1, j, -1)
+
+    def test_elements(self):
+        """Элементы профильной матрицы совпадают с плотной"""
+        self.assertEqual(self.A, self.dense)
+        self.assertEqual(self.A.profile, 7)
+        self.assertEqual(self.A.bandwidth, 1)
+        with self.assertRaises(Exception):
+            # Вне профиля ненулевой элемент записать нельзя
+            self.A[0, 3] = 1
+
+    def test_solve(self):
+        """Решение системы в профиле матрицы"""
+        X = skyline_factor(self.A).solve(self.Y)
+        for x, res in zip(X.to_list(), [1, 2, 3, 4]):
+            self.assertAlmostEqual(x, res)
+        self.assertEqual(self.A * X, self.dense * X)
+
+
+class TestSubmatrix(unittest.TestCase):
+    """Тестирование главных подматриц"""
+
+    def setUp(self):
+        # Симметричная матрица 5x5 с пропусками
+        self.dense = Matrix([[4, 1, 0, 2, 0], [1, 5, 3, 0, 0], [0, 3, 6, 0, 1],
+                             [2, 0, 0, 7, 0], [0, 0, 1, 0, 8]])
+        self.index = [0, 2, 3]
+        self.expected = [[4, 0, 2], [0, 6, 0], [2, 0, 7]]
+
+    def test_dense(self):
+        """Плотная матрица"""
+        self.assertEqual(self.dense.submatrix(self.index).to_list(), self.expected)
+
+    def test_sparse(self):
+        """Разреженная матрица"""
+        sparse = SparseMatrix(self.dense.to_list())
+        sub = sparse.submatrix(self.index)
+        self.assertIsInstance(sub, SparseMatrix)
+        self.assertEqual(sub.to_list(), self.expected)
+
+    def test_skyline(self):
+        """Профильная матрица: профиль начинается с первой оставшейся строки"""
+        A = SkylineMatrix([0, 0, 1, 0, 2])
+        for i, j, value in SparseMatrix(self.dense.to_list()).items():
+            if i <= j:
+                A.add(i, j, value)
+        sub = A.submatrix([1, 2, 4])
+        self.assertEqual(sub.to_list(), [[5, 3, 0], [3, 6, 1], [0, 1, 8]])
+        self.assertEqual(sub.profile, 5)
+        self.assertEqual(A.submatrix(self.index).to_list(), self.expected)
+
+
+class TestConstrain(unittest.TestCase):
+    """Тестирование метода Пиана-Айронса внутри матриц"""
+
+    def setUp(self):
+        # Та же симметричная матрица 5x5 с пропусками
+        self.rows = [[4, 1, 0, 2, 0], [1, 5, 3, 0, 0], [0, 3, 6, 0, 1],
+                     [2, 0, 0, 7, 0], [0, 0, 1, 0, 8]]
+        # Закрепляем 0-ю и 2-ю степени свободы
+        self.expected = [[1, 0, 0, 0, 0], [0, 5, 0, 0, 0], [0, 0, 1, 0, 0],
+                         [0, 0, 0, 7, 0], [0, 0, 0, 0, 8]]
+
+    def check(self, A):
+        A.constrain(0)
+        A.constrain(2)
+        self.assertEqual(A.to_list(), self.expected)
+        self.assertEqual(list(A.diagonal()), [1, 5, 1, 7, 8])
+
+    def test_dense(self):
+        """Плотная матрица"""
+        self.check(Matrix(self.rows))
+
+    def test_sparse(self):
+        """Разреженная матрица"""
+        self.check(SparseMatrix(self.rows))
+
+    def test_skyline(self):
+        """Профильная матрица"""
+        A = SkylineMatrix([0, 0, 1, 0, 2])
+        for i, j, value in SparseMatrix(self.rows).items():
+            if i <= j:
+                A.add(i, j, value)
+        self.check(A)
+
+    def test_matvec(self):
+        """Произведение плотной матрицы на вектор"""
+        x = [1, 2, 3, 4, 5]
+        for A in (Matrix(self.rows), SparseMatrix(self.rows)):
+            self.assertEqual(A.matvec(x), [14, 20, 29, 30, 43])
+
+
+class TestCGSolve(unittest.TestCase):
+    """Тестирование метода сопряжённых градиентов"""
+
+    def setUp(self):
+        # Матрица стержневой цепочки 30x30, решение 1, 2, ..., 30
+        n = 30
+        rows, cols, vals = [], [], []
+        for i in range(n):
+            rows.append(i), cols.append(i), vals.append(2 + i % 3)
+            if i > 0:
+                rows += [i, i-1]
+                cols += [i-1, i]
+                vals += [-1, -1]
+        self.A = SparseMatrix.from_coo((n, n), rows, cols, vals)
+        self.X = list(range(1, n+1))
+        self.Y = self.A.matvec(self.X)
+
+    def test_preconditioners(self):
+        """Все предобуславливатели дают одно решение"""
+        for precond in (None, 'jacobi', 'ssor', 'ic0'):
+            X, info = cg_solve(self.A, self.Y, precond=precond)
+            self.assertTrue(info['converged'])
+            self.assertEqual(len(info['residuals']), info['iterations'] + 1)
+            for x, res in zip(X.to_list(), self.X):
+                self.assertAlmostEqual(x, res)
+
+    def test_ic0_exact_for_band(self):
+        """Для трёхдиагональной матрицы IC(0) - точное разложение"""
+        X, info = cg_solve(self.A, self.Y, precond='ic0')
+        self.assertEqual(info['iterations'], 1)
+
+    def test_matvec_object(self):
+        """Работает с любым объектом, у которого есть matvec"""
+        class Operator:
+            rows = self.A.rows
+            matvec = self.A.matvec
+            diagonal = self.A.diagonal
+        X, info = cg_solve(Operator(), self.Y)
+        self.assertTrue(info['converged'])
+        for x, res in zip(X.to_list(), self.X):
+            self.assertAlmostEqual(x, res)
+
+    def test_bare_matvec(self):
+        """Объекту с одним matvec не нужны ни rows, ни diagonal"""
+        class Operator:
+            matvec = self.A.matvec
+        X, info = cg_solve(Operator(), self.Y, precond=None)
+        self.assertTrue(info['converged'])
+        for x, res in zip(X.to_list(), self.X):
+            self.assertAlmostEqual(x, res)
+        X = CGSolver(Operator(), precond=None).solve_many(Matrix(self.Y))
+        for x, res in zip(X.to_list(), self.X):
+            self.assertAlmostEqual(x, res)
+        # Предобуславливателю Якоби нужна диагональ
+        with self.assertRaisesRegex(Exception, 'diagonal'):
+            cg_solve(Operator(), self.Y)
+
+    def test_dense_and_skyline(self):
+        """Плотная и профильная матрицы"""
+        A = Matrix([[4, 1, 0], [1, 3, 1], [0, 1, 2]])
+        X, info = cg_solve(A, Matrix([6, 10, 8]), precond='ssor')
+        for x, res in zip(X.to_list(), [1, 2, 3]):
+            self.assertAlmostEqual(x, res)
+        sky = SkylineMatrix([0, 0, 1])
+        for i in range(3):
+            for j in range(i, 3):
+                if A[i, j]:
+                    sky.add(i, j, A[i, j])
+        X, info = cg_solve(sky, [6, 10, 8], precond='ic0')
+        for x, res in zip(X.to_list(), [1, 2, 3]):
+            self.assertAlmostEqual(x, res)
+
+    def test_maxiter(self):
+        """Если итераций не хватило - converged=False"""
+        X, info = cg_solve(self.A, self.Y, precond=None, maxiter=2)
+        self.assertFalse(info['converged'])
+        self.assertEqual(info['iterations'], 2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""Тесты модуля structure - модели конструкций"""
+import copy
+import pickle
+import unittest
+from fem import structure
+from fem import LineStructure, Distance, Force
+from fem import FEMComput
+from fem.structure import Node, Rod, Spring, LineFE
+from fem.columnar import ColumnarStructure, NodeView
+
+
+class TestElementCache(unittest.TestCase):
+    """Тестирование кеша матриц жёсткости элементов"""
+
+    def setUp(self):
+        self.ls = LineStructure()
+        self.rod = self.ls.add_rod(E=2, A=3, D=Distance(1))
+        self.spring = self.ls.add_spring(C=5, n1=self.rod.n2, D=Distance(0, 2))
+
+    def test_cached(self):
+        """Повторное обращение к K не пересчитывает матрицу"""
+        self.rod.K
+        self.spring.K
+        info = structure.stiffness_cache.info()
+        self.assertEqual(self.rod.K[0, 0], 6)
+        self.assertEqual(self.spring.K[1, 1], 5)
+        # Второй раз матрицы берутся из кеша элементов, общий кеш не нужен
+        self.assertEqual(structure.stiffness_cache.info(), info)
+
+    def test_copy(self):
+        """Изменение выданной K не меняет жёсткость элемента"""
+        ls = lattice()
+        k = ls.items[0].K
+        k *= 2
+        self.assertIsNot(ls.items[0].K, k)
+        self.assertEqual(ls.items[0].K[0, 0], 3)
+        self.assertEqual(ls.get_K(method='loop').to_list(), ls.get_K(method='batch').to_list())
+
+    def test_material_change(self):
+        """Изменение E, A или C сбрасывает кеш"""
+        self.rod.K
+        self.rod.E = 4
+        self.assertEqual(self.rod.K[0, 0], 12)
+        self.rod.A = 1
+        self.assertEqual(self.rod.K[0, 0], 4)
+        self.spring.C = 7
+        self.assertEqual(self.spring.K[1, 1], 7)
+
+    def test_direction_cosines(self):
+        """Направляющие косинусы кешируются и сбрасываются при сдвиге узла"""
+        self.assertEqual((self.rod.cos_a, self.rod.sin_a), (1, 0))
+        # Вертикальная пружинка - точные ноль и единица
+        self.assertEqual((self.spring.cos_a, self.spring.sin_a), (0, 1))
+        self.rod.n2.y = 1
+        self.assertAlmostEqual(self.rod.cos_a, 0.5**0.5)
+        self.assertAlmostEqual(self.rod.sin_a, 0.5**0.5)
+        self.assertAlmostEqual(self.rod.L, 2**0.5)
+
+    def test_node_moved(self):
+        """Перемещение узла сбрасывает кеш, в том числе простой матрицы"""
+        K = self.rod.K
+        version = self.rod.n2.version
+        # Стержень становится вертикальным длиной 2
+        self.rod.n2.x = 0
+        self.rod.n2.y = 2
+        self.assertGreater(self.rod.n2.version, version)
+        self.assertIsNot(self.rod.K, K)
+        self.assertEqual(self.rod.K[0, 0], 0)
+        self.assertEqual(self.rod.K[1, 1], 3)
+        # Пружинка тоже начинается в сдвинутом узле
+        self.assertEqual(self.spring.get_simple_K()[0, 0], 1)
+
+
+def lattice(n=5):
+    """Решётчатая ферма из n панелей со стержнями и пружинками"""
+    ls = LineStructure()
+    bottom = [Node(x=float(i), y=0.0) for i in range(n+1)]
+    top = [Node(x=float(i), y=1.0) for i in range(n+1)]
+    for node in bottom + top:
+        node.pos = len(ls.grid)
+        ls.grid.append(node)
+    for i in range(n):
+        ls.add_rod(E=2, A=1.5, n1=bottom[i], n2=bottom[i+1])
+        ls.add_rod(E=2, A=1.5, n1=top[i], n2=top[i+1])
+        ls.add_rod(E=1, A=1, n1=bottom[i], n2=top[i+1])
+        ls.add_rod(E=3, A=1, n1=bottom[i], n2=top[i])
+        ls.add_spring(C=2, n1=top[i+1], n2=bottom[i])
+    return ls
+
+
+def object_f(ls):
+    """Вектор узловых сил обходом объектов сил - для сравнения со сборкой"""
+    f = [0]*len(ls.grid)*2
+    for node in ls.grid:
+        for F in node.forces:
+            f[2*node.pos] += F.x
+            f[2*node.pos + 1] += F.y
+    for el in ls.items:
+        for q1, q2 in el.q:
+            f1x, f1y, f2x, f2y = el.distributed_forces(q1, q2)
+            f[2*el.n1.pos] += f1x
+            f[2*el.n1.pos + 1] += f1y
+            f[2*el.n2.pos] += f2x
+            f[2*el.n2.pos + 1] += f2y
+    return f
+
+
+class TestStiffnessCache(unittest.TestCase):
+    """Тестирование общего кеша матриц жёсткости элементов"""
+
+    def setUp(self):
+        structure.stiffness_cache.clear()
+
+    def tearDown(self):
+        structure.stiffness_cache.maxsize = 4096
+        structure.stiffness_cache.clear()
+
+    def test_shared(self):
+        """Одинаковые элементы разных конструкций не пересчитывают матрицу"""
+        ls1 = lattice()
+        ls2 = lattice()
+        self.assertEqual(ls1.items[0].K, ls1.items[5].K)
+        self.assertEqual(ls1.items[0].K, ls2.items[0].K)
+        # В ферме 3 разных стержня (нижний и верхний пояса одинаковые)
+        # и одна пружинка; повторно элемент берёт матрицу из своего кеша
+        for el in ls1.items + ls2.items:
+            el.K
+        info = structure.stiffness_cache.info()
+        self.assertEqual(info['misses'], 4)
+        self.assertEqual(info['hits'], 2*len(ls1.items) - 4)
+        self.assertEqual(info['size'], 4)
+        # Элементы хранят саму матрицу кеша, а не свою копию
+        self.assertIs(ls1.items[0]._K, ls1.items[5]._K)
+        self.assertIs(ls1.items[0]._K, ls2.items[0]._K)
+
+    def test_copies(self):
+        """Изменение матрицы одного элемента не затрагивает другие"""
+        ls = lattice()
+        k = ls.items[0].K
+        k *= 2
+        self.assertEqual(ls.items[5].K[0, 0], 3)
+        self.assertEqual(lattice().items[0].K[0, 0], 3)
+
+    def test_material_change(self):
+        """Другой материал - другая матрица"""
+        ls = lattice()
+        K = ls.items[0].K
+        ls.items[0].E = 7
+        self.assertIsNot(ls.items[0].K, K)
+        self.assertEqual(ls.items[0].K[0, 0], 10.5)
+
+    def test_lru(self):
+        """Давно не используемые матрицы вытесняются"""
+        structure.stiffness_cache.maxsize = 2
+        ls = lattice()
+        for el in ls.items:
+            el.K
+        self.assertEqual(structure.stiffness_cache.info()['size'], 2)
+        self.assertEqual(ls.get_K(method='loop').to_list(), ls.get_K().to_list())
+
+    def test_disabled(self):
+        """При maxsize=0 матрицы не кешируются"""
+        structure.stiffness_cache.maxsize = 0
+        ls = lattice()
+        self.assertIsNot(ls.items[0].K, ls.items[5].K)
+        self.assertEqual(structure.stiffness_cache.info()['hits'], 0)
+
+
+class TestSlots(unittest.TestCase):
+    """Тестирование компактных классов без __dict__"""
+
+    def test_no_dict(self):
+        """У узлов, элементов, сил и конструкции нет __dict__"""
+        ls = lattice(1)
+        for obj in (ls, ls.grid[0], ls.items[0], ls.items[-1], Force(1), Distance(1)):
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+        with self.assertRaises(AttributeError):
+            ls.grid[0].weight = 1
+
+    def test_copy(self):
+        """Копия и pickle сохраняют связи и собранные матрицы"""
+        ls = lattice(2)
+        ls.add_point_force(ls.grid[-1], Force(1, 2))
+        ls.K
+        for other in (copy.deepcopy(ls), pickle.loads(pickle.dumps(ls))):
+            self.assertEqual(other.K.to_list(), ls.K.to_list())
+            self.assertEqual(other.f.to_list(), ls.f.to_list())
+            self.assertIs(other.items[0].n1, other.grid[0])
+            self.assertIs(other.grid[0]._owner, other)
+            # Изменение копии не затрагивает оригинал
+            other.grid[-1].y = 5.0
+            self.assertEqual(other.K.to_list(), other.get_K().to_list())
+            self.assertEqual(ls.K.to_list(), ls.get_K().to_list())
+
+
+class TestBatchAssembly(unittest.TestCase):
+    """Тестирование пакетной сборки матрицы жёсткости"""
+
+    def assertSameK(self, ls):
+        """Пакетная сборка совпадает с поэлементной во всех форматах"""
+        for fmt in ('sparse', 'skyline', 'dense'):
+            self.assertEqual(ls.get_K(fmt, method='batch').to_list(),
+                             ls.get_K(fmt, method='loop').to_list())
+
+    def test_batch(self):
+        """Сборка с numpy (если он есть)"""
+        self.assertSameK(lattice())
+
+    def test_batch_python(self):
+        """Сборка циклами python, без numpy"""
+        numpy = structure.numpy
+        structure.numpy = None
+        try:
+            self.assertSameK(lattice())
+        finally:
+            structure.numpy = numpy
+
+    def test_direction_cosines(self):
+        """Косинусы всей конструкции совпадают с косинусами элементов"""
+        ls = lattice()
+        expected = [[el.L for el in ls.items],
+                    [el.cos_a for el in ls.items],
+                    [el.sin_a for el in ls.items]]
+        numpy = structure.numpy
+        for module in (numpy, None):
+            structure.numpy = module
+            try:
+                self.assertEqual([list(values) for values in ls.direction_cosines()],
+                                 expected)
+            finally:
+                structure.numpy = numpy
+
+    def test_unknown_method(self):
+        """Неизвестный метод сборки"""
+        with self.assertRaises(Exception):
+            lattice().get_K(method='fast')
+
+
+class TestPrecision(unittest.TestCase):
+    """Тестирование точности матрицы жёсткости"""
+
+    def setUp(self):
+        self.ls = LineStructure()
+        # Стержень под углом 30 градусов и вертикальная пружинка
+        nodes = [Node(x=0.0, y=0.0), Node(x=3**0.5, y=1.0), Node(x=3**0.5, y=2.0)]
+        for node in nodes:
+            node.pos = len(self.ls.grid)
+            self.ls.grid.append(node)
+        self.rod = self.ls.add_rod(E=1, A=1, n1=nodes[0], n2=nodes[1])
+        self.spring = self.ls.add_spring(C=3, n1=nodes[1], n2=nodes[2])
+
+    def test_full_precision(self):
+        """Косинусы и суммы не округляются"""
+        K = self.ls.K
+        self.assertAlmostEqual(K[0, 0], 0.75/2, places=15)
+        self.assertAlmostEqual(K[0, 1], 3**0.5/8, places=15)
+        self.assertAlmostEqual(K[3, 3], 0.25/2 + 3, places=15)
+        # У вертикальной пружинки косинус - точный ноль
+        self.assertEqual(self.spring.get_simple_K()[0, 1], 0)
+        for fmt in ('sparse', 'skyline', 'dense'):
+            for method in ('batch', 'loop'):
+                self.assertEqual(self.ls.get_K(fmt, method).to_list(), K.to_list())
+
+    def test_rounding(self):
+        """Округление по запросу, как считалось раньше"""
+        for fmt in ('sparse', 'skyline', 'dense'):
+            for method in ('batch', 'loop'):
+                K = self.ls.get_K(fmt, method, ndigits=2)
+                self.assertEqual(K[0, 0], 0.38)
+                self.assertEqual(K[0, 1], 0.22)
+            plan = self.ls.assembly_plan(fmt, ndigits=2)
+            self.assertEqual(self.ls.assemble(plan)[0, 1], 0.22)
+
+    def test_zero_length(self):
+        """У элемента нулевой длины нет направления - ошибка, а не NaN"""
+        node = Node(x=0.0, y=0.0)
+        node.pos = len(self.ls.grid)
+        self.ls.grid.append(node)
+        rod = self.ls.add_rod(E=1, A=1, n1=self.ls.grid[0], n2=node)
+        with self.assertRaisesRegex(Exception, 'Нулевая длина'):
+            rod.cos_a
+        with self.assertRaisesRegex(Exception, 'Нулевая длина'):
+            rod.K
+        numpy = structure.numpy
+        try:
+            for module in (numpy, None):
+                structure.numpy = module
+                with self.assertRaisesRegex(Exception, 'Нулевая длина'):
+                    self.ls.get_K('sparse', 'batch')
+        finally:
+            structure.numpy = numpy
+        cs = ColumnarStructure.from_structure(self.ls)
+        with self.assertRaisesRegex(Exception, 'Нулевая длина'):
+            cs.items[-1].cos_a
+
+
+class TestAssemblyPlan(unittest.TestCase):
+    """Тестирование сборки по готовому плану"""
+
+    def check(self):
+        """План даёт ту же матрицу и после смены материалов"""
+        ls = lattice()
+        for fmt in ('sparse', 'skyline', 'dense'):
+            plan = ls.assembly_plan(fmt)
+            self.assertEqual(ls.assemble(plan).to_list(), ls.get_K(fmt).to_list())
+            # Меняем жёсткость элементов, план остаётся прежним
+            values = [k*1.5 for k in ls.gather_arrays().k]
+            changed = lattice()
+            for el in changed.items:
+                if isinstance(el, Rod):
+                    el.E *= 1.5
+                else:
+                    el.C *= 1.5
+            self.assertEqual(ls.assemble(plan, values).to_list(),
+                             changed.get_K(fmt).to_list())
+
+    def test_plan(self):
+        """Сборка с numpy (если он есть)"""
+        self.check()
+
+    def test_plan_python(self):
+        """Сборка циклами python, без numpy"""
+        numpy = structure.numpy
+        structure.numpy = None
+        try:
+            self.check()
+        finally:
+            structure.numpy = numpy
+
+    def test_wrong_values(self):
+        """Количество жёсткостей не совпадает с планом"""
+        ls = lattice()
+        plan = ls.assembly_plan()
+        with self.assertRaises(Exception):
+            ls.assemble(plan, [1.0])
+        with self.assertRaises(Exception):
+            ls.assembly_plan('band')
+
+
+class TestIncrementalAssembly(unittest.TestCase):
+    """Тестирование поэтапного обновления собранных K, f и q"""
+
+    def assertAssembled(self, ls):
+        """Собранные K, f и q совпадают со сборкой заново"""
+        self.assertEqual(ls.K.to_list(), ls.get_K().to_list())
+        self.assertEqual(ls.f.to_list(), object_f(ls))
+        self.assertEqual(ls.q.to_list(), ls._build_q().to_list())
+
+    def test_add_elements(self):
+        """Новые элементы и нагрузки добавляются к собранным K, f и q"""
+        ls = lattice(2)
+        self.assertAssembled(ls)
+        rod = ls.add_rod(E=2, A=1, n1=ls.grid[-1], D=Distance(1, 1))
+        ls.add_point_force(rod.n2, Force(1, -2))
+        ls.add_linear_distributed_force(rod, Force(0, 1), Force(0, 2))
+        self.assertAssembled(ls)
+        ls.add_pinning(rod.n1)
+        rod.n2.u = 0.5
+        self.assertAssembled(ls)
+
+    def test_changes(self):
+        """Сдвиг узла и смена материала сбрасывают собранную K"""
+        ls = lattice(2)
+        K = ls.K
+        ls.items[0].E = 10
+        self.assertAssembled(ls)
+        ls.grid[-1].y = 3.0
+        self.assertAssembled(ls)
+        self.assertNotEqual(ls.K.to_list(), K.to_list())
+
+    def test_copy(self):
+        """Изменение полученной матрицы не портит собранную"""
+        ls = lattice(2)
+        K = ls.K
+        K[0, 0] = 100
+        self.assertNotEqual(ls.K[0, 0], 100)
+
+    def test_invalidate(self):
+        """После изменения в обход конструкции помогает invalidate"""
+        ls = lattice(2)
+        ls.f
+        ls.grid[0].forces.append(Force(5))
+        ls.invalidate()
+        self.assertAssembled(ls)
+
+    def test_forces_in_place(self):
+        """Силы, изменённые на месте, f видит только после invalidate"""
+        ls = lattice(2)
+        ls.add_point_force(ls.grid[1], Force(1, 1))
+        f = ls.f.to_list()
+        ls.grid[1].forces[-1].x = 3
+        ls.grid[2].forces.append(Force(0, 4))
+        # Конструкция об этих изменениях не знает
+        self.assertEqual(ls.f.to_list(), f)
+        ls.invalidate()
+        self.assertAssembled(ls)
+        self.assertEqual(ls.f[2], f[2] + 2)
+        self.assertEqual(ls.f[5], f[5] + 4)
+        # Присваивание списка сил конструкция видит сама
+        ls.grid[2].forces = []
+        self.assertAssembled(ls)
+
+
+class TestLoadVector(unittest.TestCase):
+    """Тестирование сборки вектора сил по плоским массивам нагрузок"""
+
+    def loaded(self):
+        """Ферма с точечными и распределёнными нагрузками"""
+        ls = lattice(3)
+        for i, node in enumerate(ls.grid):
+            node.add_point_force(Force(i, -1))
+            node.add_point_force(Force(0.5, i/3))
+        for i, el in enumerate(ls.items):
+            el.add_linear_distributed_force(Force(1, i), Force(-i/7, 2))
+        return ls
+
+    def check(self):
+        """Вектор по массивам совпадает с обходом объектов"""
+        ls = self.loaded()
+        self.assertEqual(ls.f.to_list(), object_f(ls))
+        # Сдвиг узла меняет эквивалентные узловые силы
+        ls.grid[-1].x = 7.0
+        self.assertEqual(ls.f.to_list(), object_f(ls))
+        cs = ColumnarStructure.from_structure(ls)
+        self.assertEqual(cs.f.to_list(), ls.f.to_list())
+
+    def test_numpy(self):
+        """Сборка с numpy (если он есть)"""
+        self.check()
+
+    def test_python(self):
+        """Сборка циклами python, без numpy"""
+        numpy = structure.numpy
+        structure.numpy = None
+        try:
+            self.check()
+        finally:
+            structure.numpy = numpy
+
+    def test_cached(self):
+        """Смена материала не сбрасывает f, новая нагрузка - добавляется"""
+        ls = self.loaded()
+        ls.f
+        loads = ls._loads
+        ls.items[0].E = 5
+        self.assertIs(ls._loads, loads)
+        self.assertIsNotNone(ls._f_cache)
+        ls.items[1].add_linear_distributed_force(Force(1), Force(2))
+        ls.grid[2].add_point_force(Force(0, 3))
+        self.assertIs(ls._loads, loads)
+        self.assertEqual(len(loads.node), 2*len(ls.grid) + 1)
+        self.assertEqual(ls.f.to_list(), object_f(ls))
+        # Замена списка сил сбрасывает массивы нагрузок
+        ls.grid[0].forces = []
+        self.assertIsNone(ls._loads)
+        self.assertEqual(ls.f.to_list(), object_f(ls))
+
+
+class TestColumnarStructure(unittest.TestCase):
+    """Тестирование колоночного представления конструкции"""
+
+    def build(self, ls):
+        """Общий код построения: стержни, пружинка, заделки, нагрузки"""
+        rod1 = ls.add_rod(E=1, A=1, D=Distance(1))
+        rod2 = ls.add_rod(E=1, A=1, n1=rod1.n2, D=Distance(1))
+        spring = ls.add_spring(C=2, n1=rod2.n2, D=Distance(1))
+        ls.add_pinning(rod1.n1)
+        spring.n2.add_pinning()
+        ls.add_point_force(rod1.n2, Force(-2))
+        ls.add_linear_distributed_force(rod2, Force(1), Force(1))
+        return ls
+
+    def test_builder(self):
+        """Код построения работает так же, как для обычной конструкции"""
+        cs = self.build(ColumnarStructure())
+        ls = self.build(LineStructure())
+        self.assertEqual(len(cs.grid), 4)
+        self.assertEqual(len(cs.items), 3)
+        self.assertIsInstance(cs.grid[0], NodeView)
+        self.assertIsInstance(cs.items[0], Rod)
+        self.assertIsInstance(cs.items[2], Spring)
+        self.assertIsInstance(cs.items[2], LineFE)
+        self.assertTrue(cs.grid[3].pinned)
+        self.assertIsNone(cs.grid[1].u)
+        self.assertEqual(cs.items[1].n1, cs.items[0].n2)
+        self.assertEqual(cs.K.to_list(), ls.K.to_list())
+        self.assertEqual(cs.f.to_list(), ls.f.to_list())
+        self.assertEqual(cs.q.to_list(), ls.q.to_list())
+
+    def test_conversion(self):
+        """Преобразование туда и обратно не меняет конструкцию"""
+        ls = self.build(LineStructure())
+        cs = ColumnarStructure.from_structure(ls)
+        self.assertEqual(cs, self.build(ColumnarStructure()))
+        back = cs.to_structure()
+        self.assertEqual(back.K.to_list(), ls.K.to_list())
+        self.assertEqual(back.f.to_list(), ls.f.to_list())
+
+    def test_views_write_through(self):
+        """Изменения через представления попадают в таблицы"""
+        cs = self.build(ColumnarStructure())
+        rod = cs.items[0]
+        rod.E = 3
+        self.assertEqual(cs.elements.E[0], 3)
+        node = cs.grid[1]
+        version = node.version
+        node.x = 2
+        self.assertEqual(cs.nodes.x[1], 2)
+        self.assertGreater(cs.grid[1].version, version)
+        node.u = 0.5
+        self.assertEqual(cs.grid[1].u, 0.5)
+
+    def test_solve_and_renumber(self):
+        """Расчёт и перенумерация колоночной конструкции"""
+        ls = self.build(LineStructure())
+        comp = FEMComput(ls)
+        comp.enter_boundary_conditions()
+        cs = self.build(ColumnarStructure())
+        comp_cs = FEMComput(cs)
+        comp_cs.enter_boundary_conditions()
+        self.assertEqual(comp.find_q().to_list(), comp_cs.find_q().to_list())
+        # После перенумерации узлы элементов указывают на те же координаты
+        coords = [(el.n1.x, el.n2.x) for el in cs.items]
+        cs._reorder_nodes([3, 2, 1, 0])
+        self.assertEqual([(el.n1.x, el.n2.x) for el in cs.items], coords)
+        self.assertTrue(cs.grid[0].pinned)
+        self.assertEqual([F.x for F in cs.grid[2].forces], [-2])
+
+
+if __name__ == '__main__':
+    unittest.main()